@@ -10,7 +10,7 @@ import tempfile
 import shutil
 import glob
 import uuid
-import requests
+from http_client import fetch, download_to_file
 import json
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
@@ -61,7 +61,7 @@ async def download_with_requests(url, temp_dir):
         
         # Try to get the webpage and extract media URLs
         page_url = f"https://www.instagram.com/p/{shortcode}/"
-        response = requests.get(page_url, headers=headers, timeout=10)
+        response = await fetch(page_url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             # Look for media URLs in the page content
@@ -82,11 +82,8 @@ async def download_with_requests(url, temp_dir):
                 if 'instagram' in img_url:
                     try:
                         img_url = img_url.replace('\\u0026', '&')
-                        img_response = requests.get(img_url, headers=headers, timeout=15)
-                        if img_response.status_code == 200:
-                            filename = f"{temp_dir}/image_{i+1}.jpg"
-                            with open(filename, 'wb') as f:
-                                f.write(img_response.content)
+                        filename = f"{temp_dir}/image_{i+1}.jpg"
+                        if await download_to_file(img_url, filename, headers, timeout=15):
                             downloaded_files.append(filename)
                     except Exception as e:
                         print(f"Failed to download image {i+1}: {e}")
@@ -96,11 +93,8 @@ async def download_with_requests(url, temp_dir):
                 if 'instagram' in video_url:
                     try:
                         video_url = video_url.replace('\\u0026', '&')
-                        video_response = requests.get(video_url, headers=headers, timeout=30)
-                        if video_response.status_code == 200:
-                            filename = f"{temp_dir}/video_{i+1}.mp4"
-                            with open(filename, 'wb') as f:
-                                f.write(video_response.content)
+                        filename = f"{temp_dir}/video_{i+1}.mp4"
+                        if await download_to_file(video_url, filename, headers, timeout=30):
                             downloaded_files.append(filename)
                     except Exception as e:
                         print(f"Failed to download video {i+1}: {e}")
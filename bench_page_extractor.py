@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: page_extractor.extract_media vs the old regex scraping
+Runs offline over synthetic post and embed pages shaped like Instagram's,
+padded with the kind of script bundles that make real pages megabytes long
+"""
+import json
+import random
+import re
+import string
+import timeit
+from functools import partial
+
+from page_extractor import extract_media, orjson
+
+CDN = "https://scontent-lhr8-1.cdninstagram.com/v/t51.2885-15"
+
+# Instagram serves compact JSON
+dumps = partial(json.dumps, separators=(',', ':'))
+
+
+def _filler(size):
+    """Inline script noise: JS with quotes, braces and JSON-ish fragments"""
+    random.seed(size)
+    chunks = []
+    total = 0
+    while total < size:
+        name = ''.join(random.choices(string.ascii_letters, k=8))
+        chunk = f'<script>__d("{name}",[],function(a,b,c){{var x={{"k":"{name}","v":[1,2,3]}};return x;}});</script>\n'
+        chunks.append(chunk)
+        total += len(chunk)
+    return ''.join(chunks)
+
+
+def _graphql_media(children):
+    edges = [{"node": {"is_video": i % 3 == 2, "display_url": f"{CDN}/{i}.jpg?oe=65A1B2C3",
+                       "video_url": f"{CDN}/{i}.mp4?oe=65A1B2C3" if i % 3 == 2 else None}}
+             for i in range(children)]
+    return {"shortcode": "CxYz123", "display_url": f"{CDN}/0.jpg", "is_video": False,
+            "owner": {"username": "some.creator"},
+            "edge_media_to_caption": {"edges": [{"node": {"text": "hello {world}; </p>"}}]},
+            "edge_sidecar_to_children": {"edges": edges}}
+
+
+def _api_item(children):
+    carousel = [{"image_versions2": {"candidates": [{"url": f"{CDN}/{i}_1080.jpg", "width": 1080},
+                                                    {"url": f"{CDN}/{i}_640.jpg", "width": 640}]},
+                 "video_versions": [{"url": f"{CDN}/{i}.mp4"}] if i % 4 == 3 else None}
+                for i in range(children)]
+    return {"items": [{"code": "CxYz123", "carousel_media": carousel, "user": {"username": "some.creator"},
+                       "caption": {"text": "hi"}}]}
+
+
+def shared_data_page(padding):
+    data = {"entry_data": {"PostPage": [{"graphql": {"shortcode_media": _graphql_media(8)}}]}}
+    return (f"<html><head>{_filler(padding)}</head><body>"
+            f"<script>window._sharedData = {dumps(data)};</script>{_filler(padding // 4)}</body></html>")
+
+
+def xdt_page(padding):
+    blob = {"require": [["ScheduledServerJS", "handle", None,
+                         [{"__bbox": {"result": {"data": {
+                             "xdt_api__v1__media__shortcode__web_info": _api_item(8)}}}}]]]}
+    return (f"<html><head>{_filler(padding)}</head><body>"
+            f'<script type="application/json" data-sjs>{dumps(blob)}</script>{_filler(padding // 4)}</body></html>')
+
+
+def embed_page(padding):
+    context = {"context": {"type": "GraphImage"}, "gql_data": {"shortcode_media": _graphql_media(4)}}
+    extra = {"shortcode_media": None, "contextJSON": dumps(context)}
+    return (f"<html><body>{_filler(padding)}"
+            f'<img class="EmbeddedMediaImage" src="{CDN}/0.jpg?a=1&amp;b=2">'
+            f"<script>window.__additionalDataLoaded('extra',{dumps(extra)});</script></body></html>")
+
+
+IMG_PATTERNS = [r'"display_src":"([^"]+)"', r'"src":"([^"]*\.cdninstagram[^"]*\.jpg[^"]*)"',
+                r'content="([^"]*scontent[^"]*\.jpg[^"]*)"', r'"display_url":"([^"]+)"']
+VIDEO_PATTERNS = [r'"video_url":"([^"]+)"', r'"src":"([^"]*\.cdninstagram[^"]*\.mp4[^"]*)"']
+
+
+def old_scrape(content):
+    """try_embed_download's regexes plus try_page_scraping's _sharedData regex"""
+    items = []
+    for kind, patterns in (('image', IMG_PATTERNS), ('video', VIDEO_PATTERNS)):
+        for pattern in patterns:
+            for url in re.findall(pattern, content):
+                if (url, kind) not in items:
+                    items.append((url, kind))
+    match = re.search(r'window\._sharedData\s*=\s*({.*?});', content)
+    if match:
+        try:
+            json.loads(match.group(1))
+        except ValueError:
+            pass
+    return items
+
+
+FIXTURES = {
+    '_sharedData post page': shared_data_page(2_000_000),
+    'xdt_api post page': xdt_page(2_000_000),
+    'embed page': embed_page(200_000),
+}
+
+
+if __name__ == "__main__":
+    print(f"JSON parser for slices: {'orjson' if orjson else 'json'}\n")
+    for name, html in FIXTURES.items():
+        media = extract_media(html)
+        old_items = old_scrape(html)
+        number = 20
+        old = min(timeit.repeat(lambda: old_scrape(html), number=number, repeat=3)) / number * 1000
+        new = min(timeit.repeat(lambda: extract_media(html), number=number, repeat=3)) / number * 1000
+        print(f"{name} ({len(html) / 1e6:.1f} MB)")
+        print(f"  old regexes: {old:8.2f} ms, {len(old_items)} urls")
+        print(f"  extractor:   {new:8.2f} ms, {len(media.items) if media else 0} items via {media.source if media else None}"
+              f" ({old / new:.0f}x)")
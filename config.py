@@ -14,6 +14,78 @@ class Config:
     S = "0"
     STATUS = set(int(x) for x in (S).split())
     L=Instaloader()
+
+    # Shared HTTP client pool (http_client.py)
+    HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+    HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_MAX_PER_HOST = int(os.environ.get("HTTP_MAX_PER_HOST", "8"))
+    MAX_DOWNLOAD_BYTES = int(os.environ.get("MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+
+    # Seconds before the next anonymous resolver joins the race (strategy_race.py)
+    RACE_STAGGER = float(os.environ.get("RACE_STAGGER", "1.5"))
+
+    # Local caches; set a *_DB variable to "" to keep that cache in memory only
+    CACHE_DIR = os.environ.get("CACHE_DIR", "cache")
+    RESOLVE_CACHE_ENTRIES = int(os.environ.get("RESOLVE_CACHE_ENTRIES", "2000"))
+    RESOLVE_CACHE_BYTES = int(os.environ.get("RESOLVE_CACHE_BYTES", str(8 * 1024 * 1024)))
+    RESOLVE_CACHE_TTL = int(os.environ.get("RESOLVE_CACHE_TTL", "3600"))
+    RESOLVE_CACHE_DB = os.environ.get("RESOLVE_CACHE_DB", os.path.join(CACHE_DIR, "resolutions.db"))
+    FILE_ID_DB = os.environ.get("FILE_ID_DB", os.path.join(CACHE_DIR, "file_ids.db"))
+    FILE_ID_MAX_ENTRIES = int(os.environ.get("FILE_ID_MAX_ENTRIES", "10000"))
+    PROFILE_CACHE_TTL = int(os.environ.get("PROFILE_CACHE_TTL", "300"))
+    PROFILE_CACHE_ENTRIES = int(os.environ.get("PROFILE_CACHE_ENTRIES", "500"))
+    SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(CACHE_DIR, "snapshots"))
+    # Every Nth sync of a list pages all of it, catching changes deep in the list
+    SNAPSHOT_FULL_SYNC_EVERY = int(os.environ.get("SNAPSHOT_FULL_SYNC_EVERY", "10"))
+    # Next to the /tmp job directories so files can be hard-linked; 0 bytes disables it
+    MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", "/tmp/media_cache")
+    MEDIA_CACHE_BYTES = int(os.environ.get("MEDIA_CACHE_BYTES", str(1024 * 1024 * 1024)))
+    SESSION_DB = os.environ.get("SESSION_DB", os.path.join(CACHE_DIR, "sessions.db"))
+    SESSION_REFRESH_INTERVAL = float(os.environ.get("SESSION_REFRESH_INTERVAL", str(6 * 3600)))
+
+    # URL handler job queue (job_queue.py)
+    DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "3"))
+    UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "2"))
+    JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "50"))
+    JOB_QUEUE_PER_USER = int(os.environ.get("JOB_QUEUE_PER_USER", "5"))
+
+    # Thread pool for blocking Instaloader calls (insta_executor.py)
+    INSTALOADER_THREADS = int(os.environ.get("INSTALOADER_THREADS", "4"))
+    INSTALOADER_TIMEOUT = float(os.environ.get("INSTALOADER_TIMEOUT", "60"))
+    # Separate threads for bulk commands, so they never take the ones above
+    INSTALOADER_BULK_THREADS = int(os.environ.get("INSTALOADER_BULK_THREADS", "2"))
+    # Whole-call limits for post downloads (all retries) and bulk commands
+    INSTALOADER_DOWNLOAD_TIMEOUT = float(os.environ.get("INSTALOADER_DOWNLOAD_TIMEOUT", "600"))
+    INSTALOADER_BULK_TIMEOUT = float(os.environ.get("INSTALOADER_BULK_TIMEOUT", "3600"))
+
+    # Outgoing Telegram message limits, adapted on FloodWait (rate_limiter.py)
+    TG_GLOBAL_RATE = float(os.environ.get("TG_GLOBAL_RATE", "30"))
+    TG_CHAT_RATE = float(os.environ.get("TG_CHAT_RATE", "1"))
+    TG_CHAT_BURST = float(os.environ.get("TG_CHAT_BURST", "3"))
+    TG_EDIT_RATE = float(os.environ.get("TG_EDIT_RATE", "10"))
+
+    # Instagram request budget per session and endpoint class (ig_governor.py)
+    IG_BUDGET_WINDOW = float(os.environ.get("IG_BUDGET_WINDOW", "660"))
+    IG_GRAPHQL_BUDGET = int(os.environ.get("IG_GRAPHQL_BUDGET", "200"))
+    IG_WEB_BUDGET = int(os.environ.get("IG_WEB_BUDGET", "150"))
+    IG_CDN_BUDGET = int(os.environ.get("IG_CDN_BUDGET", "2000"))
+    IG_BACKOFF_BASE = float(os.environ.get("IG_BACKOFF_BASE", "30"))
+    IG_BACKOFF_MAX = float(os.environ.get("IG_BACKOFF_MAX", "900"))
+
+    # Directory of extra Instaloader "session-<username>" files for the session pool (session_pool.py)
+    SESSION_DIR = os.environ.get("SESSION_DIR", "sessions")
+    # Seconds a checkpointed session sits out before it is verified again
+    SESSION_CHECKPOINT_COOLDOWN = float(os.environ.get("SESSION_CHECKPOINT_COOLDOWN", "1800"))
+
+    # Minimum seconds between edits of one status message (progress.py)
+    PROGRESS_INTERVAL = float(os.environ.get("PROGRESS_INTERVAL", "3"))
+
+    # Files a bulk download may keep on disk awaiting upload (pipeline.py)
+    PIPELINE_WINDOW = int(os.environ.get("PIPELINE_WINDOW", "20"))
+
+    # Format of long user lists sent as a file: txt, csv or jsonl (list_export.py)
+    LIST_EXPORT_FORMAT = os.environ.get("LIST_EXPORT_FORMAT", "txt")
+    LIST_EXPORT_GZIP = os.environ.get("LIST_EXPORT_GZIP", "False").lower() in ("1", "true", "yes")
     HELP="""
 You can Download almost anything From your Instagram Account.
 
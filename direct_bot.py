@@ -13,6 +13,7 @@ import glob
 import uuid
 import threading
 from config import Config
+from url_router import route
 
 BOT_TOKEN = Config.BOT_TOKEN
 TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
@@ -85,17 +86,8 @@ class TelegramBot:
     
     def extract_shortcode(self, url):
         """Extract shortcode from Instagram URL"""
-        patterns = [
-            r'instagram\.com/p/([A-Za-z0-9_-]+)',
-            r'instagram\.com/reel/([A-Za-z0-9_-]+)',
-            r'instagram\.com/tv/([A-Za-z0-9_-]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
+        link = route(url)
+        return link.shortcode if link else None
     
     def download_instagram_content(self, url, temp_dir):
         """Download Instagram content"""
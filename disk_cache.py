@@ -0,0 +1,129 @@
+"""
+Content-addressed on-disk media cache
+Downloaded media is kept under a key derived from the CDN asset (path and
+size variant, not the expiring signature), hard-linked into job
+directories instead of copied, published with an atomic rename and
+evicted least-recently-used first once the cache outgrows its size cap
+"""
+
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+from config import Config
+from http_client import download_to_file
+
+
+def media_key(url):
+    """Cache key for a CDN URL: same asset and size variant -> same key"""
+    if url.startswith('//'):
+        url = 'https:' + url
+    parsed = urlparse(url)
+    # stp= selects the size/crop variant; oe/oh/_nc_* only sign the request
+    variant = parse_qs(parsed.query).get('stp', [''])[0]
+    return hashlib.sha1(f"{parsed.path}?{variant}".encode()).hexdigest()
+
+
+class MediaCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        if max_bytes:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load(self):
+        """Rebuild the index from disk, oldest access first"""
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    os.remove(path)  # left over from an interrupted store
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def link_into(self, key, dest):
+        """Place a cached file at dest; False on a miss"""
+        if key not in self.entries:
+            return False
+        path = self._path(key)
+        if not os.path.exists(path):
+            self._drop(key)  # removed behind our back
+            return False
+        try:
+            if os.path.lexists(dest):
+                os.remove(dest)  # os.link won't overwrite, copyfile may hit the same inode
+            _link_or_copy(path, dest)
+        except OSError as e:
+            # A problem with dest, not with the cached file: keep the entry
+            print(f"Media cache could not place {dest}: {e}")
+            return False
+        os.utime(path)  # mtime doubles as last access across restarts
+        self.entries.move_to_end(key)
+        return True
+
+    def store(self, key, source):
+        """Add a finished download to the cache (source stays where it is)"""
+        if not self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            _link_or_copy(source, tmp)
+            os.replace(tmp, path)  # readers see the whole file or nothing
+        except OSError as e:
+            print(f"Media cache store failed: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        size = os.path.getsize(path)
+        self.total_bytes += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+        self._evict()
+
+    def _drop(self, key):
+        self.total_bytes -= self.entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            self._drop(next(iter(self.entries)))
+
+
+def _link_or_copy(source, dest):
+    try:
+        os.link(source, dest)
+    except OSError:
+        # Different filesystem or no hard link support
+        shutil.copyfile(source, dest)
+
+
+media_cache = MediaCache(Config.MEDIA_CACHE_DIR, Config.MEDIA_CACHE_BYTES)
+
+
+async def cached_download(url, filename, headers=None, **kwargs):
+    """download_to_file() that answers repeats from the media cache"""
+    key = media_key(url)
+    if media_cache.link_into(key, filename):
+        return True
+    if not await download_to_file(url, filename, headers, **kwargs):
+        return False
+    media_cache.store(key, filename)
+    return True
@@ -0,0 +1,75 @@
+"""
+Persistent index of Telegram file_ids for already uploaded Instagram media
+Keyed by shortcode and media index, so repeat requests are answered by
+re-sending the file_id with no download and no upload
+"""
+
+import os
+import sqlite3
+import time
+
+from config import Config
+
+
+class FileIdIndex:
+    """SQLite-backed shortcode -> [(kind, file_id), ...] map, LRU-evicted per shortcode"""
+
+    def __init__(self, db_path, max_entries):
+        self.max_entries = max_entries
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS file_ids ("
+            "shortcode TEXT NOT NULL, idx INTEGER NOT NULL, kind TEXT NOT NULL, "
+            "file_id TEXT NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (shortcode, idx))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS file_ids_last_used ON file_ids (last_used)")
+        self.db.commit()
+
+    def get(self, shortcode):
+        """Return the ordered (kind, file_id) list for a shortcode, or None"""
+        if not shortcode:
+            return None
+        rows = self.db.execute(
+            "SELECT kind, file_id FROM file_ids WHERE shortcode = ? ORDER BY idx",
+            (shortcode,)
+        ).fetchall()
+        if not rows:
+            return None
+        self.db.execute("UPDATE file_ids SET last_used = ? WHERE shortcode = ?", (time.time(), shortcode))
+        self.db.commit()
+        return rows
+
+    def put(self, shortcode, entries):
+        """Store the (kind, file_id) list produced by uploading a shortcode"""
+        if not shortcode or not entries:
+            return
+        now = time.time()
+        self.db.execute("DELETE FROM file_ids WHERE shortcode = ?", (shortcode,))
+        self.db.executemany(
+            "INSERT INTO file_ids (shortcode, idx, kind, file_id, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(shortcode, i, kind, file_id, now) for i, (kind, file_id) in enumerate(entries)]
+        )
+        self._evict()
+        self.db.commit()
+
+    def forget(self, shortcode):
+        """Drop a shortcode, e.g. after Telegram rejected one of its file_ids"""
+        self.db.execute("DELETE FROM file_ids WHERE shortcode = ?", (shortcode,))
+        self.db.commit()
+
+    def _evict(self):
+        # Whole shortcodes are evicted so a re-send is never partial
+        count = self.db.execute("SELECT COUNT(DISTINCT shortcode) FROM file_ids").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.db.execute(
+                "DELETE FROM file_ids WHERE shortcode IN "
+                "(SELECT shortcode FROM file_ids GROUP BY shortcode ORDER BY MAX(last_used) LIMIT ?)",
+                (excess,)
+            )
+
+
+file_id_index = FileIdIndex(Config.FILE_ID_DB or ":memory:", Config.FILE_ID_MAX_ENTRIES)
@@ -0,0 +1,80 @@
+"""
+Follower / followee analytics for /fans and /notfollowing
+Both lists are delta-synced through the snapshot store, then followees
+are classified against the follower set in one linear pass; the sync
+diff gives the changes since the last run for free
+"""
+
+from insta_engine import with_profile
+from snapshot_store import snapshot_store
+
+
+class FollowerReport:
+    def __init__(self, followers, followees, mutuals, not_following_back, new_followers, unfollowers, first_run):
+        self.followers = followers
+        self.followees = followees
+        self.mutual_ids = mutuals                         # followees who follow back
+        self.not_following_back_ids = not_following_back  # followees who don't
+        self.new_followers = new_followers
+        self.unfollowers = unfollowers
+        self.first_run = first_run                        # no previous snapshot to compare
+
+    @property
+    def mutuals(self):
+        """Usernames of mutual_ids, looked up lazily"""
+        return snapshot_store.iter_usernames(self.mutual_ids)
+
+    @property
+    def not_following_back(self):
+        """Usernames of not_following_back_ids, looked up lazily"""
+        return snapshot_store.iter_usernames(self.not_following_back_ids)
+
+
+def build_report(profile):
+    """Sync followers and followees and classify them (blocking)"""
+    followers = snapshot_store.sync(profile, "followers")
+    followees = snapshot_store.sync(profile, "followees")
+
+    follower_ids = set(followers.ids)
+    mutuals = []
+    not_following_back = []
+    for uid in followees.ids:
+        if uid in follower_ids:
+            mutuals.append(uid)
+        else:
+            not_following_back.append(uid)
+
+    return FollowerReport(
+        len(followers.ids), len(followees.ids),
+        mutuals,
+        not_following_back,
+        snapshot_store.usernames(followers.added) if not followers.first_run else [],
+        snapshot_store.usernames(followers.removed),
+        followers.first_run
+    )
+
+
+async def follower_report(username):
+    """build_report() on a session that can see the profile (bulk timeout, lists can be huge)"""
+    return await with_profile(username, build_report)
+
+
+def changes_text(report):
+    """One-line summary of follower changes since the previous run"""
+    if report.first_run:
+        return ""
+    return (
+        f"\n\n📈 {len(report.new_followers)} new followers, "
+        f"📉 {len(report.unfollowers)} unfollowers since last check."
+    )
+
+
+async def fetch_usernames(username, kind):
+    """Current followers or followees of a profile, newest first
+
+    The list is synced on a session that can see the profile; usernames
+    are then looked up a chunk at a time as the returned iterator is
+    consumed.
+    """
+    ids = await with_profile(username, lambda profile: snapshot_store.sync(profile, kind).ids)
+    return snapshot_store.iter_usernames(ids)
@@ -0,0 +1,198 @@
+"""
+Shared async HTTP client for all Instagram page and media fetches
+One pooled keep-alive connection pool per process instead of a fresh
+blocking requests.get() (and TCP+TLS handshake) per call
+"""
+
+import asyncio
+import os
+from urllib.parse import urlparse
+
+import httpx
+
+from config import Config
+from ig_governor import governor, endpoint_class
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx when installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+CHUNK_SIZE = 64 * 1024
+
+_client = None
+_host_slots = {}
+
+
+def get_client():
+    """Return the process-wide pooled client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=httpx.Timeout(15.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30.0
+            )
+        )
+    return _client
+
+
+def _host_slot(url):
+    """Semaphore limiting concurrent requests to a single host"""
+    host = urlparse(url).netloc
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = asyncio.Semaphore(Config.HTTP_MAX_PER_HOST)
+        _host_slots[host] = slot
+    return slot
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After', '')
+    return int(value) if value.isdigit() else None
+
+
+def _account(response, endpoint):
+    """Feed the response status back into the governor lane it came from"""
+    if response.status_code == 429:
+        governor.throttled(retry_after=_retry_after(response), endpoint=endpoint)
+    else:
+        governor.succeeded(endpoint=endpoint)
+
+
+async def fetch(url, headers=None, timeout=15):
+    """GET a URL through the shared client and return the buffered response"""
+    if url.startswith('//'):
+        url = 'https:' + url
+    endpoint = endpoint_class(url)
+    await governor.wait(endpoint)
+    async with _host_slot(url):
+        response = await get_client().get(url, headers=headers, timeout=timeout)
+    _account(response, endpoint)
+    return response
+
+
+async def download_to_file(url, filename, headers=None, timeout=30, max_bytes=None, min_bytes=0, retries=2):
+    """Stream a URL to disk in fixed-size chunks; return True on success
+
+    Data goes to ``filename + '.part'`` and is renamed into place once
+    complete, so memory stays at one chunk regardless of file size.
+    Interrupted transfers are resumed with a Range request.
+    """
+    if url.startswith('//'):
+        url = 'https:' + url
+    max_bytes = max_bytes or Config.MAX_DOWNLOAD_BYTES
+    part = filename + '.part'
+    endpoint = endpoint_class(url)
+
+    # Only this call's retries resume; a part left over from an earlier
+    # call may belong to a different URL
+    _discard(part)
+    try:
+        for attempt in range(retries + 1):
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            request_headers = dict(headers or {})
+            # Byte counts (Content-Length, Range) must refer to what we write
+            request_headers['Accept-Encoding'] = 'identity'
+            if offset:
+                request_headers['Range'] = f'bytes={offset}-'
+
+            try:
+                await governor.wait(endpoint)
+                async with _host_slot(url):
+                    async with get_client().stream('GET', url, headers=request_headers, timeout=timeout) as response:
+                        _account(response, endpoint)
+                        if response.status_code == 206 and offset:
+                            mode = 'ab'
+                        elif response.status_code == 200:
+                            offset, mode = 0, 'wb'
+                        else:
+                            print(f"Download of {url} returned {response.status_code}")
+                            _discard(part)
+                            return False
+
+                        length = response.headers.get('Content-Length')
+                        expected = offset + int(length) if length and length.isdigit() else None
+                        if expected is not None and expected > max_bytes:
+                            print(f"Skipping {url}: {expected} bytes exceeds cap of {max_bytes}")
+                            _discard(part)
+                            return False
+
+                        written = offset
+                        with open(part, mode) as f:
+                            async for chunk in response.aiter_raw(CHUNK_SIZE):
+                                written += len(chunk)
+                                if written > max_bytes:
+                                    print(f"Aborting {url}: exceeded cap of {max_bytes} bytes")
+                                    f.close()
+                                    _discard(part)
+                                    return False
+                                f.write(chunk)
+
+                if expected is not None and written < expected:
+                    print(f"Short read on {url} ({written}/{expected}), attempt {attempt + 1}/{retries + 1}")
+                    continue
+            except httpx.HTTPError as e:
+                print(f"Failed to download {url}: {e}, attempt {attempt + 1}/{retries + 1}")
+                continue
+
+            if written < min_bytes:
+                _discard(part)
+                return False
+            os.replace(part, filename)
+            return True
+
+    except BaseException:
+        # OSError, cancellation or a cap abort must not leave the part behind
+        _discard(part)
+        raise
+
+    _discard(part)
+    return False
+
+
+async def probe(url, headers=None, timeout=10):
+    """Size in bytes of a remote file, from a one-byte Range request; None if unknown
+
+    Only the headers are read, so a probe costs a round trip, not a download.
+    """
+    if url.startswith('//'):
+        url = 'https:' + url
+    request_headers = dict(headers or {})
+    request_headers['Accept-Encoding'] = 'identity'
+    request_headers['Range'] = 'bytes=0-0'
+    endpoint = endpoint_class(url)
+    try:
+        await governor.wait(endpoint)
+        async with _host_slot(url):
+            async with get_client().stream('GET', url, headers=request_headers, timeout=timeout) as response:
+                _account(response, endpoint)
+                if response.status_code == 206:
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    return int(total) if total.isdigit() else None
+                if response.status_code == 200:
+                    length = response.headers.get('Content-Length', '')
+                    return int(length) if length.isdigit() else None
+                return None
+    except httpx.HTTPError as e:
+        print(f"Probe of {url} failed: {e}")
+        return None
+
+
+def _discard(path):
+    """Remove a partial download if present"""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def close_client():
+    """Close the shared client and drop its pooled connections"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,161 @@
+"""
+Central governor for requests to Instagram
+Keeps a rolling request budget per endpoint class (graphql, web, cdn)
+for every session - a logged-in account, or "anonymous" for this IP -
+and hands out paced request slots inside it. A 429 puts the session's
+graphql and web requests (or, for a CDN 429, its CDN downloads) into one
+shared, jittered backoff instead of every caller retrying on its own
+schedule. Thread-safe: Instaloader calls it from
+the executor threads, the scrapers from the event loop.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from instaloader import RateController
+
+from config import Config
+
+ANONYMOUS = "anonymous"
+CDN_HOSTS = ('cdninstagram.com', 'fbcdn.net')
+
+
+class Budget:
+    def __init__(self, count, window, spacing):
+        self.count = count      # requests allowed per rolling window
+        self.window = window    # seconds
+        self.spacing = spacing  # minimum gap between two requests
+
+
+def endpoint_class(url):
+    """Classify an Instagram URL as graphql, web or cdn"""
+    parsed = urlparse(url)
+    if parsed.netloc.endswith(CDN_HOSTS):
+        return 'cdn'
+    if '/graphql' in parsed.path or parsed.path.startswith('/api/'):
+        return 'graphql'
+    return 'web'
+
+
+def lane(endpoint):
+    """Backoff lane: graphql and web pages share Instagram's limiter, the CDN has its own"""
+    return 'cdn' if endpoint == 'cdn' else 'api'
+
+
+class InstagramGovernor:
+    def __init__(self, budgets, backoff_base, backoff_max):
+        self.budgets = budgets
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.slots = {}       # (session, class) -> deque of granted request times
+        self.backoff = {}     # (session, lane) -> (until, level)
+
+    def reserve(self, endpoint, session=ANONYMOUS):
+        """Book the next request slot; return how long to wait for it"""
+        budget = self.budgets[endpoint]
+        with self.lock:
+            now = time.monotonic()
+            slots = self.slots.setdefault((session, endpoint), deque())
+            while slots and slots[0] <= now - budget.window:
+                slots.popleft()
+            start = max(now, self.backoff.get((session, lane(endpoint)), (0, 0))[0])
+            if slots:
+                start = max(start, slots[-1] + budget.spacing)
+            if len(slots) >= budget.count:
+                # Window full: wait until the oldest booked request falls out
+                start = max(start, slots[len(slots) - budget.count] + budget.window)
+            slots.append(start)
+            return start - now
+
+    def wait_sync(self, endpoint, session=ANONYMOUS):
+        delay = self.reserve(endpoint, session)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait(self, endpoint, session=ANONYMOUS):
+        delay = self.reserve(endpoint, session)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def throttled(self, session=ANONYMOUS, retry_after=None, endpoint='graphql'):
+        """Record a 429: every request of this session's lane backs off together"""
+        key = (session, lane(endpoint))
+        with self.lock:
+            now = time.monotonic()
+            until, level = self.backoff.get(key, (0, 0))
+            if until > now:
+                return until - now  # already backing off, don't stack
+            delay = min(self.backoff_max, self.backoff_base * 2 ** level)
+            delay *= random.uniform(0.75, 1.25)
+            if retry_after:
+                delay = max(delay, retry_after)
+            self.backoff[key] = (now + delay, level + 1)
+            print(f"Instagram throttled {session} ({key[1]}): backing off {delay:.0f}s")
+            return delay
+
+    def succeeded(self, session=ANONYMOUS, endpoint='graphql'):
+        """A response came back without a 429: let the backoff level decay"""
+        key = (session, lane(endpoint))
+        with self.lock:
+            until, level = self.backoff.get(key, (0, 0))
+            if level and until <= time.monotonic():
+                self.backoff[key] = (until, level - 1)
+
+    def backing_off(self, session=ANONYMOUS, endpoint='graphql'):
+        """Seconds left in the session's backoff for this endpoint class"""
+        until, _ = self.backoff.get((session, lane(endpoint)), (0, 0))
+        return max(0, until - time.monotonic())
+
+
+governor = InstagramGovernor(
+    {
+        'graphql': Budget(Config.IG_GRAPHQL_BUDGET, Config.IG_BUDGET_WINDOW, 1.0),
+        'web': Budget(Config.IG_WEB_BUDGET, Config.IG_BUDGET_WINDOW, 1.0),
+        'cdn': Budget(Config.IG_CDN_BUDGET, Config.IG_BUDGET_WINDOW, 0.0),
+    },
+    Config.IG_BACKOFF_BASE,
+    Config.IG_BACKOFF_MAX
+)
+
+
+def session_of(context):
+    return context.username or ANONYMOUS
+
+
+class GovernedRateController(RateController):
+    """Instaloader rate controller that also goes through the governor"""
+
+    def wait_before_query(self, query_type):
+        super().wait_before_query(query_type)
+        endpoint = 'web' if query_type in ('other', 'iphone') else 'graphql'
+        session = session_of(self._context)
+        governor.wait_sync(endpoint, session)
+
+    def handle_429(self, query_type):
+        # The shared backoff replaces Instaloader's per-caller wait
+        self.sleep(governor.throttled(session_of(self._context)))
+
+
+def install(loader):
+    """Route an Instaloader's queries through the governor"""
+    context = loader.context
+    if isinstance(context._rate_controller, GovernedRateController):
+        return loader
+    context._rate_controller = GovernedRateController(context)
+    get_json = context.get_json
+
+    def governed_get_json(*args, _attempt=1, **kwargs):
+        # A 429 retries through this wrapper with _attempt + 1; only the
+        # outermost call returning means a response got through
+        result = get_json(*args, _attempt=_attempt, **kwargs)
+        if _attempt == 1:
+            governor.succeeded(session_of(context))
+        return result
+
+    context.get_json = governed_get_json
+    return loader
@@ -0,0 +1,43 @@
+"""
+In-flight registry for identical concurrent links
+The first request for a shortcode leads: it downloads and uploads as
+usual. Requests for the same shortcode arriving meanwhile wait for it
+and then re-send the leader's Telegram file_ids, so N identical links
+cost one download and one upload
+"""
+
+import asyncio
+
+
+class InFlight:
+    def __init__(self):
+        self.flights = {}  # key -> future resolved with True when the leader succeeded
+
+    async def wait_or_lead(self, key):
+        """Wait out a running flight for key; return True if the caller must lead
+
+        Returns False when there is nothing to coordinate (no key) or when
+        another request just finished successfully - its results are then
+        in the file_id index. If that request failed, the next waiter
+        takes over as leader.
+        """
+        if not key:
+            return False
+        while key in self.flights:
+            # shield: a cancelled waiter must not cancel the flight for everyone
+            if await asyncio.shield(self.flights[key]):
+                return False
+        self.flights[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def land(self, key, ok):
+        """Finish the flight led by the caller and wake up its waiters"""
+        future = self.flights.pop(key, None)
+        if future and not future.done():
+            future.set_result(ok)
+
+    def waiting(self, key):
+        return key in self.flights
+
+
+inflight = InFlight()
@@ -0,0 +1,230 @@
+"""
+In-process Instaloader download engine
+Replaces spawning the ``instaloader`` CLI for every command: downloads run
+in the Instaloader thread pool on an already logged-in session from the
+session pool, so there is no interpreter startup, no re-login from the
+session file and each account keeps one HTTP session
+"""
+
+import asyncio
+import os
+import time
+from itertools import islice
+
+from instaloader import Instaloader, Profile, Post
+
+from config import Config
+from insta_executor import run_blocking, bulk_executor
+from profile_cache import profile_cache
+from session_pool import session_pool
+
+# Bulk jobs beyond the bulk pool's size wait here, holding neither a session
+# nor a thread, and their timeout only starts once they run
+_bulk_slots = asyncio.Semaphore(Config.INSTALOADER_BULK_THREADS)
+
+
+def make_loader(dirname, pictures=True, videos=True, context=None):
+    """Instaloader configured like the bot's CLI flags, sharing a pooled session
+
+    Equivalent to ``--no-metadata-json --no-compress-json --no-captions
+    --no-video-thumbnails --dirname-pattern dirname`` plus ``--no-pictures``
+    or ``--no-videos`` when requested. ``context`` is the session's
+    InstaloaderContext (default Config.L's).
+    """
+    loader = Instaloader(
+        quiet=True,
+        dirname_pattern=dirname,
+        download_pictures=pictures,
+        download_videos=videos,
+        download_video_thumbnails=False,
+        download_geotags=False,
+        download_comments=False,
+        save_metadata=False,
+        compress_json=False,
+        post_metadata_txt_pattern="",
+        storyitem_metadata_txt_pattern="",
+        resume_prefix=None
+    )
+    loader.context = context or Config.L.context
+    return loader
+
+
+async def _run(job, username=None, own=False, logged_in=False):
+    """Run ``job(context)`` in the bulk thread pool on a session from the pool
+
+    Jobs about a private profile go to a session that follows it;
+    ``logged_in`` jobs (stories, highlights) skip anonymous sessions.
+    Raises asyncio.TimeoutError after INSTALOADER_BULK_TIMEOUT seconds.
+    """
+    private = False
+    if username and username.lower() == session_pool.primary.name.lower():
+        own = True  # the bot's own account, private or not
+    if username and not own:
+        profile = await profile_cache.get(username)
+        private = profile.is_private and not profile.followed_by_viewer
+    async with _bulk_slots:
+        async with session_pool.use(username, private, logged_in, own) as session:
+            return await run_blocking(
+                job, session.context,
+                timeout=Config.INSTALOADER_BULK_TIMEOUT, pool=bulk_executor
+            )
+
+
+async def with_profile(username, job):
+    """Run ``job(profile)`` on the session that can see ``username``
+
+    A private profile is looked up again on the follower session's
+    context, so everything the job walks (followers, followees) is
+    fetched by an account that is allowed to see it.
+    """
+    cached = await profile_cache.get(username)
+
+    def on_session(context):
+        profile = cached if cached._context is context else Profile.from_username(context, username)
+        return job(profile)
+
+    return await _run(on_session, username)
+
+
+MEDIA_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.mp4', '.mov')
+
+
+def _new_files(dirname, seen):
+    """Media files in dirname that haven't been reported yet, oldest first"""
+    if not os.path.isdir(dirname):
+        return []
+    paths = []
+    for name in os.listdir(dirname):
+        path = os.path.join(dirname, name)
+        if path not in seen and name.lower().endswith(MEDIA_EXTENSIONS):
+            seen.add(path)
+            paths.append(path)
+    return sorted(paths)
+
+
+class _Reporter:
+    """Hands each post's fresh files to ``on_files`` right after it's saved"""
+
+    def __init__(self, dirname, on_files):
+        self.dirname = dirname
+        self.on_files = on_files
+        self.seen = set()
+        self.deadline = time.monotonic() + Config.INSTALOADER_BULK_TIMEOUT
+
+    def __call__(self):
+        # Past the deadline run_blocking has given up on us: stop walking
+        # instead of downloading on in an abandoned thread
+        if time.monotonic() > self.deadline:
+            raise TimeoutError(f"Stopped {self.dirname} after {Config.INSTALOADER_BULK_TIMEOUT:.0f}s")
+        if self.on_files:
+            paths = _new_files(self.dirname, self.seen)
+            if paths:
+                self.on_files(paths)
+
+
+def _save_posts(loader, posts, target, count=None, report=None):
+    """Download posts from an iterator (first ``count`` only, like --count)"""
+    downloaded = 0
+    for post in islice(posts, count):
+        if loader.download_post(post, target):
+            downloaded += 1
+        if report:
+            report()
+    return downloaded
+
+
+def _save_story_items(loader, containers, target, report=None):
+    """Download every item of each Story or Highlight"""
+    downloaded = 0
+    for container in containers:
+        for item in container.get_items():
+            if loader.download_storyitem(item, target):
+                downloaded += 1
+            if report:
+                report()
+    return downloaded
+
+
+async def download_profile_posts(username, dirname, pictures=True, videos=True, count=None, on_files=None):
+    """All posts of a profile (``instaloader -- username``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, pictures, videos, context=context)
+        profile = Profile.from_username(loader.context, username)
+        return _save_posts(loader, profile.get_posts(), username, count, report=report)
+    return await _run(job, username)
+
+
+async def download_igtv(username, dirname, on_files=None):
+    """IGTV videos of a profile (``--no-posts --igtv``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        profile = Profile.from_username(loader.context, username)
+        return _save_posts(loader, profile.get_igtv_posts(), username, report=report)
+    return await _run(job, username)
+
+
+async def download_tagged(username, dirname, on_files=None):
+    """Posts a profile is tagged in (``--no-posts --tagged``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        profile = Profile.from_username(loader.context, username)
+        return _save_posts(loader, profile.get_tagged_posts(), username, report=report)
+    return await _run(job, username)
+
+
+async def download_feed(dirname, count=None, on_files=None):
+    """Posts from the logged-in account's feed (``:feed``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        return _save_posts(loader, loader.get_feed_posts(), ":feed", count, report=report)
+    return await _run(job, own=True)
+
+
+async def download_saved(dirname, count=None, on_files=None):
+    """The logged-in account's saved posts (``:saved``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        profile = Profile.own_profile(loader.context)
+        return _save_posts(loader, profile.get_saved_posts(), ":saved", count, report=report)
+    return await _run(job, own=True)
+
+
+async def download_stories(dirname, username=None, on_files=None):
+    """Stories of one profile (``--stories``), or of all followees (``:stories``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        if username:
+            profile = Profile.from_username(loader.context, username)
+            stories = loader.get_stories(userids=[profile.userid])
+        else:
+            stories = loader.get_stories()
+        return _save_story_items(loader, stories, username or ":stories", report=report)
+    return await _run(job, username, own=not username, logged_in=True)
+
+
+async def download_highlights(username, dirname, on_files=None):
+    """All highlights of a profile (``--no-posts --highlights``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        profile = Profile.from_username(loader.context, username)
+        return _save_story_items(loader, loader.get_highlights(profile), username, report=report)
+    return await _run(job, username, logged_in=True)
+
+
+async def download_shortcode(shortcode, dirname, on_files=None):
+    """A single post, reel or IGTV video (``-- -shortcode``)"""
+    def job(context):
+        report = _Reporter(dirname, on_files)
+        loader = make_loader(dirname, context=context)
+        post = Post.from_shortcode(loader.context, shortcode)
+        downloaded = 1 if loader.download_post(post, shortcode) else 0
+        report()
+        return downloaded
+    return await _run(job)
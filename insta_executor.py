@@ -0,0 +1,37 @@
+"""
+Dedicated thread pools for blocking Instaloader calls
+Instaloader does synchronous HTTP; running it here keeps the Pyrogram
+event loop (and every other chat) responsive while a call is in flight.
+Long bulk downloads get their own pool so they can't starve short lookups
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+executor = ThreadPoolExecutor(
+    max_workers=Config.INSTALOADER_THREADS,
+    thread_name_prefix="instaloader"
+)
+
+bulk_executor = ThreadPoolExecutor(
+    max_workers=Config.INSTALOADER_BULK_THREADS,
+    thread_name_prefix="instaloader-bulk"
+)
+
+
+async def run_blocking(fn, *args, timeout=Config.INSTALOADER_TIMEOUT, pool=None, **kwargs):
+    """Run ``fn(*args, **kwargs)`` in the Instaloader pool and await its result
+
+    ``pool`` picks another executor (e.g. bulk_executor) than the default.
+    Raises asyncio.TimeoutError after ``timeout`` seconds (None = no limit).
+    On timeout or cancellation a call that has not started yet is dropped;
+    one that is already running finishes in the background and its result
+    is discarded, since threads can't be interrupted.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(pool or executor, functools.partial(fn, *args, **kwargs))
+    # wait_for cancels the executor future on timeout and on cancellation
+    return await asyncio.wait_for(future, timeout)
@@ -0,0 +1,202 @@
+"""
+Bounded job queue for the download -> upload pipeline of URL handlers
+A fixed pool of download workers and upload workers, round-robin between
+users so one user's burst of links can't starve everybody else, and
+backpressure once the queue is full
+"""
+
+import asyncio
+from collections import deque
+
+from config import Config
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit() when no more work can be accepted"""
+
+
+class Job:
+    def __init__(self, user_id, download, upload, cleanup=None, on_position=None, on_error=None):
+        self.user_id = user_id
+        self.download = download
+        self.upload = upload
+        self.cleanup = cleanup
+        self.on_position = on_position
+        self.on_error = on_error
+        self.position = None
+
+
+class JobQueue:
+    """Two-stage worker pool: ``download()`` then ``upload(result)``
+
+    A job whose download returns a falsy result skips the upload stage.
+    ``cleanup()`` always runs once the job is finished.
+    """
+
+    def __init__(self, download_workers, upload_workers, max_pending, max_per_user):
+        self.download_workers = download_workers
+        self.upload_workers = upload_workers
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self.user_jobs = {}      # user_id -> deque of waiting jobs
+        self.rotation = deque()  # users with waiting jobs, in round-robin order
+        self.active = {}         # user_id -> jobs submitted and not yet finished
+        self.pending = 0
+        self.idle_downloaders = 0
+        self.has_work = None
+        self.freed = None        # set whenever a job leaves the queue or finishes
+        self.upload_queue = None
+        self.workers = []
+
+    def start(self):
+        """Spawn the worker tasks on the running loop (idempotent)"""
+        if self.workers:
+            return
+        self.has_work = asyncio.Event()
+        self.freed = asyncio.Event()
+        # Bounded so finished downloads wait on disk instead of piling up
+        self.upload_queue = asyncio.Queue(maxsize=self.upload_workers * 2)
+        self.idle_downloaders = self.download_workers
+        for _ in range(self.download_workers):
+            self.workers.append(asyncio.ensure_future(self._download_worker()))
+        for _ in range(self.upload_workers):
+            self.workers.append(asyncio.ensure_future(self._upload_worker()))
+
+    def submit(self, user_id, download, upload, cleanup=None, on_position=None, on_error=None):
+        """Queue a job and return its queue position (0 = starting now)
+
+        Raises QueueFull when the queue or the user's share of it is full.
+        """
+        self.start()
+        if self.pending >= self.max_pending:
+            raise QueueFull("The download queue is full")
+        if self.active.get(user_id, 0) >= self.max_per_user:
+            raise QueueFull(f"You already have {self.max_per_user} downloads in progress")
+
+        job = Job(user_id, download, upload, cleanup, on_position, on_error)
+        queue = self.user_jobs.setdefault(user_id, deque())
+        if not queue:
+            self.rotation.append(user_id)
+        queue.append(job)
+        self.pending += 1
+        self.active[user_id] = self.active.get(user_id, 0) + 1
+        self.has_work.set()
+
+        if self.pending <= self.idle_downloaders:
+            return 0
+        job.position = self._position(job)
+        return job.position
+
+    def has_room(self, user_id):
+        return self.pending < self.max_pending and self.active.get(user_id, 0) < self.max_per_user
+
+    async def submit_when_ready(self, user_id, download, upload, cleanup=None, on_position=None, on_error=None):
+        """submit(), but wait for room in the queue instead of raising QueueFull"""
+        self.start()
+        while not self.has_room(user_id):
+            self.freed.clear()
+            await self.freed.wait()
+        return self.submit(user_id, download, upload, cleanup, on_position, on_error)
+
+    def _position(self, job):
+        """1-based position of a waiting job under round-robin scheduling"""
+        depth = self.user_jobs[job.user_id].index(job)
+        position = depth + 1
+        ahead = True
+        for user_id in self.rotation:
+            if user_id == job.user_id:
+                ahead = False
+                continue
+            # Earlier users in the rotation also get their turn in this job's round
+            position += min(len(self.user_jobs[user_id]), depth + 1 if ahead else depth)
+        return position
+
+    def _next_job(self):
+        user_id = self.rotation.popleft()
+        queue = self.user_jobs[user_id]
+        job = queue.popleft()
+        if queue:
+            self.rotation.append(user_id)
+        else:
+            del self.user_jobs[user_id]
+        self.pending -= 1
+        if not self.pending:
+            self.has_work.clear()
+        self.freed.set()
+        return job
+
+    async def _announce_positions(self):
+        for queue in list(self.user_jobs.values()):
+            for job in list(queue):
+                if not job.on_position:
+                    continue
+                position = self._position(job)
+                if position != job.position:
+                    job.position = position
+                    try:
+                        await job.on_position(position)
+                    except Exception as e:
+                        print(f"Queue position update failed: {e}")
+
+    async def _download_worker(self):
+        while True:
+            await self.has_work.wait()
+            if not self.pending:
+                continue
+            job = self._next_job()
+            self.idle_downloaders -= 1
+            try:
+                await self._announce_positions()
+                try:
+                    result = await job.download()
+                except Exception as e:
+                    await self._fail(job, e)
+                    continue
+                if result:
+                    await self.upload_queue.put((job, result))
+                else:
+                    await self._finish(job)
+            finally:
+                self.idle_downloaders += 1
+
+    async def _upload_worker(self):
+        while True:
+            job, result = await self.upload_queue.get()
+            try:
+                await job.upload(result)
+            except Exception as e:
+                await self._fail(job, e)
+                continue
+            finally:
+                self.upload_queue.task_done()
+            await self._finish(job)
+
+    async def _fail(self, job, error):
+        print(f"Job for user {job.user_id} failed: {error}")
+        if job.on_error:
+            try:
+                await job.on_error(error)
+            except Exception as e:
+                print(f"Error handler failed: {e}")
+        await self._finish(job)
+
+    async def _finish(self, job):
+        self.active[job.user_id] -= 1
+        if not self.active[job.user_id]:
+            del self.active[job.user_id]
+        self.freed.set()
+        if job.cleanup:
+            try:
+                result = job.cleanup()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"Job cleanup failed: {e}")
+
+
+jobs = JobQueue(
+    Config.DOWNLOAD_WORKERS,
+    Config.UPLOAD_WORKERS,
+    Config.JOB_QUEUE_SIZE,
+    Config.JOB_QUEUE_PER_USER
+)
@@ -0,0 +1,193 @@
+"""
+Multi-link messages
+Collects every Instagram link in a message (text, caption and hidden
+text_link entities) once each, downloads them concurrently through the
+job queue and reports the whole batch on one consolidated status message
+"""
+
+import asyncio
+import os
+import shutil
+import uuid
+
+from pyrogram import filters
+
+from file_id_cache import file_id_index
+from inflight import inflight
+from job_queue import jobs
+from progress import ProgressReporter
+from upload_planner import media_files, send_planned, send_file_ids
+from url_router import find_links, resolve
+
+FINAL_STATES = ('done', 'failed')
+
+# Background batches; the event loop only keeps weak references to tasks
+_running = set()
+
+
+def message_links(message):
+    """Instagram links in a message, in order and without duplicates"""
+    text = message.text or message.caption or ""
+    # text_link entities hide their URL behind the visible text
+    entities = message.entities or message.caption_entities or []
+    hidden = [e.url for e in entities if getattr(e, 'url', None)]
+    links = []
+    for link in find_links(" ".join([text] + hidden)):
+        if link not in links:
+            links.append(link)
+    return links
+
+
+async def resolve_links(links):
+    """Resolve /share/ links concurrently and drop what's left unusable or repeated"""
+    resolved = []
+    for link in await asyncio.gather(*(resolve(link) for link in links)):
+        if link and link.kind != 'share' and link not in resolved:
+            resolved.append(link)
+    return resolved
+
+
+# Matches messages with a link the plain text regex can't see (captions, text_link)
+has_links = filters.create(lambda _, __, message: bool(message_links(message)))
+
+
+def link_label(link):
+    if link.shortcode:
+        return f"{link.kind} {link.shortcode}"
+    return f"{link.kind} @{link.username}" if link.username else f"{link.kind} {link.media_id}"
+
+
+class BatchStatus:
+    """One status message for many links, edited through a ProgressReporter"""
+
+    def __init__(self, status_msg, links):
+        self.status = ProgressReporter(status_msg)
+        self.links = links
+        self.states = {link: 'queued' for link in links}
+        self.notes = {}
+        self.files = 0
+
+    def text(self):
+        count = {}
+        for state in self.states.values():
+            count[state] = count.get(state, 0) + 1
+        finished = count.get('done', 0) + count.get('failed', 0)
+        lines = [f"📦 **{finished}/{len(self.links)} links finished** - {self.files} files sent"]
+        for state, icon in (('downloading', '📥'), ('uploading', '📤'), ('queued', '⏳'), ('failed', '❌')):
+            if count.get(state):
+                lines.append(f"{icon} {state}: {count[state]}")
+        failed = [link for link in self.links if self.states[link] == 'failed']
+        for link in failed[:10]:
+            note = self.notes.get(link)
+            lines.append(f"• {link_label(link)}" + (f": {note}" if note else ""))
+        return "\n".join(lines)
+
+    async def update(self, link, state, files=0, note=None):
+        if self.states[link] in FINAL_STATES:
+            return
+        self.states[link] = state
+        self.files += files
+        if note:
+            self.notes[link] = note
+        await self.status.edit_text(self.text())
+
+    async def finish(self):
+        await self.status.finish(self.text())
+
+
+async def _fetch_link(client, message, link, batch, download, captions):
+    """Queue one link of a batch; returns once it is finished"""
+    shortcode = link.shortcode
+    leading = await inflight.wait_or_lead(shortcode)
+
+    cached = file_id_index.get(shortcode)
+    if cached:
+        try:
+            sent = await send_file_ids(client, message.chat.id, cached, captions)
+        except Exception as e:
+            print(f"Cached re-send failed, downloading again: {e}")
+            file_id_index.forget(shortcode)
+        else:
+            if sent < len(cached):
+                file_id_index.forget(shortcode)  # a stale file_id: the next request re-uploads
+            if leading:
+                inflight.land(shortcode, True)
+            await batch.update(link, 'done', sent)
+            return
+
+    temp_dir = f"/tmp/{message.from_user.id}_{uuid.uuid4().hex[:8]}"
+    finished = asyncio.get_running_loop().create_future()
+
+    async def note(text):
+        # Per-link messages become the failure reason instead of status edits
+        batch.notes[link] = text.splitlines()[0][:80]
+
+    async def job_download():
+        os.makedirs(temp_dir, exist_ok=True)
+        await batch.update(link, 'downloading')
+        return await download(link, temp_dir, note)
+
+    async def job_upload(success):
+        await batch.update(link, 'uploading')
+        file_ids = await send_planned(client, message.chat.id, media_files(temp_dir), captions)
+        if file_ids and all(file_ids):
+            file_id_index.put(shortcode, file_ids)
+        sent = sum(1 for f in file_ids if f)
+        if sent:
+            await batch.update(link, 'done', sent)
+        else:
+            await batch.update(link, 'failed', note="nothing could be sent")
+
+    async def on_error(e):
+        await batch.update(link, 'failed', note=str(e)[:80])
+
+    async def cleanup():
+        try:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if leading:
+                inflight.land(shortcode, bool(file_id_index.get(shortcode)))
+            await batch.update(link, 'failed')  # no-op once done
+        finally:
+            # A failed status edit must not leave fetch_links waiting forever
+            if not finished.done():
+                finished.set_result(None)
+
+    try:
+        # Links beyond the user's share of the queue wait for their own jobs to finish
+        await jobs.submit_when_ready(message.from_user.id, job_download, job_upload, cleanup, on_error=on_error)
+    except BaseException:
+        if leading:
+            inflight.land(shortcode, False)
+        raise
+    await finished
+
+
+async def fetch_links(client, message, status_msg, links, download, captions=None):
+    """Download and send every link of a message concurrently
+
+    ``download(link, temp_dir, say)`` is the bot's own downloader; it
+    returns True once media is in temp_dir. At most the user's share of
+    the job queue is submitted at once (counting jobs the user already
+    had queued), the rest follows as jobs finish. Each link is sent as
+    its own carousel-ordered albums.
+    """
+    batch = BatchStatus(status_msg, links)
+    await batch.status.edit_text(batch.text())
+
+    async def one(link):
+        try:
+            await _fetch_link(client, message, link, batch, download, captions)
+        except Exception as e:
+            await batch.update(link, 'failed', note=str(e)[:80])
+
+    await asyncio.gather(*(one(link) for link in links))
+    await batch.finish()
+    return batch
+
+
+def start_batch(client, message, status_msg, links, download, captions=None):
+    """Run fetch_links() in the background, referenced until it finishes"""
+    task = asyncio.ensure_future(fetch_links(client, message, status_msg, links, download, captions))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return task
@@ -0,0 +1,98 @@
+"""
+Streaming export of username lists (followers, followees, fans...)
+Rows go into the inline message until it would pass Telegram's length
+limit, then everything is streamed to a txt/csv/jsonl file (optionally
+gzipped) that is sent as a document, so the list is walked only once
+and at most one message worth of rows is held in memory
+"""
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from config import Config
+
+MAX_MESSAGE_LENGTH = 4096
+FORMATS = ('txt', 'csv', 'jsonl')
+
+
+def profile_url(username):
+    return f"www.instagram.com/{username}"
+
+
+class ListExporter:
+    """Writes one row per username straight to disk"""
+
+    def __init__(self, path, title, fmt='txt', compress=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown list format: {fmt}")
+        self.fmt = fmt
+        self.rows = 0
+        if compress:
+            self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+        if fmt == 'csv':
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(['username', 'profile_url'])
+        elif fmt == 'txt':
+            self.file.write(f"{title}\n\n")
+
+    def write(self, username):
+        self.rows += 1
+        if self.fmt == 'csv':
+            self.csv.writerow([username, profile_url(username)])
+        elif self.fmt == 'jsonl':
+            self.file.write(json.dumps({'username': username, 'profile_url': profile_url(username)}) + "\n")
+        else:
+            self.file.write(f"\nName: {username} :     Link to Profile: {profile_url(username)}")
+
+    def close(self):
+        self.file.close()
+
+
+async def send_user_list(bot, chat_id, title, usernames, basename, caption, note="",
+                         fmt=Config.LIST_EXPORT_FORMAT, compress=Config.LIST_EXPORT_GZIP):
+    """Send ``usernames`` inline if they fit in one message, else as a document
+
+    ``usernames`` may be any iterable; it is consumed once. ``note`` is
+    shown under the title of the inline message, or under the caption
+    of the document.
+    """
+    text = f"**{title}**{note}\n\n"
+    inline = []
+    exporter = None
+    workdir = None
+    try:
+        for username in usernames:
+            if exporter:
+                exporter.write(username)
+                continue
+            line = f"\n[{username}]({profile_url(username)})"
+            if len(text) + len(line) <= MAX_MESSAGE_LENGTH:
+                text += line
+                inline.append(username)
+                continue
+            # Too long for a message: switch to a file, replaying what we have
+            workdir = tempfile.mkdtemp(prefix="list_")
+            path = os.path.join(workdir, f"{basename}.{fmt}" + (".gz" if compress else ""))
+            exporter = ListExporter(path, title, fmt, compress)
+            for previous in inline:
+                exporter.write(previous)
+            exporter.write(username)
+            inline = None
+
+        if not exporter:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return len(inline)
+        exporter.close()
+        await bot.send_document(chat_id=chat_id, document=path, caption=caption + note)
+        return exporter.rows
+    finally:
+        if exporter:
+            exporter.close()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
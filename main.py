@@ -4,7 +4,6 @@ Downloads Instagram content from URLs sent by users
 """
 
 import os
-import re
 import asyncio
 import tempfile
 import shutil
@@ -14,6 +13,19 @@ from pyrogram import Client, filters, idle
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
 from pyrogram.errors import FloodWait
 from config import Config
+from file_id_cache import file_id_index
+from inflight import inflight
+from http_client import close_client
+from upload_planner import media_files, send_planned, send_file_ids, report_upload
+from progress import ProgressReporter
+from url_router import route
+from link_batch import message_links, resolve_links, start_batch, has_links
+from job_queue import jobs, QueueFull
+from rate_limiter import install as install_rate_limiter
+from insta_executor import run_blocking
+from ig_governor import governor, session_of, install as install_governor
+from profile_cache import profile_cache
+from session_store import session_store
 from instaloader import Instaloader, Profile, Post
 from instaloader.exceptions import ProfileNotExistsException, LoginRequiredException, ConnectionException
 import time
@@ -25,6 +37,7 @@ app = Client(
     api_hash=Config.API_HASH,
     bot_token=Config.BOT_TOKEN
 )
+install_rate_limiter(app)
 
 # Global instances
 L = Instaloader(
@@ -38,54 +51,66 @@ L = Instaloader(
     dirname_pattern="{target}",
     filename_pattern="{date_utc}_UTC"
 )
+install_governor(L)
+profile_cache.context = L.context
 
 # Try to load session if available
 session_loaded = False
 
-def load_instagram_session():
-    """Load Instagram session from environment or file"""
+async def load_instagram_session():
+    """Restore the Instagram session saved by an earlier run"""
     global session_loaded
     if session_loaded:
         return True
-        
-    # Try to load from environment variable (Heroku)
-    session_file_id = Config.INSTA_SESSIONFILE_ID
-    if session_file_id and Config.USER:
-        try:
-            # In production, you'd download the session file using the file_id
-            # For now, we'll try to load from local file
-            if os.path.exists(Config.USER):
+
+    if Config.USER:
+        # Local store first, then the INSTA_SESSIONFILE_ID document on Telegram
+        session_loaded = await session_store.restore(L, Config.USER, app) \
+            and await session_store.verify(L, Config.USER)
+        if not session_loaded and os.path.exists(Config.USER):
+            try:
                 L.load_session_from_file(Config.USER)
-                print(f"✅ Instagram session loaded for {Config.USER}")
-                session_loaded = True
-                return True
-        except Exception as e:
-            print(f"❌ Failed to load session: {e}")
-    
-    # Try to login with username if provided but no session
-    if Config.USER and not session_loaded:
+                session_loaded = await session_store.verify(L, Config.USER)
+                if session_loaded:
+                    await session_store.save(L, upload=False)
+                    print(f"✅ Instagram session loaded for {Config.USER}")
+            except Exception as e:
+                print(f"❌ Failed to load session: {e}")
+
+    if session_loaded:
+        session_store.start_refresh(L, app)
+    elif Config.USER:
         print(f"⚠️ No session found for {Config.USER}. Authentication required for some content.")
-    
+
     return session_loaded
 
 async def download_with_retry(post, temp_dir, max_retries=3):
     """Download post with retry logic and better error handling"""
+    deadline = time.monotonic() + Config.INSTALOADER_DOWNLOAD_TIMEOUT
     for attempt in range(max_retries):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"Giving up on {post.shortcode}: out of time after {attempt} attempts")
+            return False
         try:
-            L.download_post(post, temp_dir)
+            await run_blocking(L.download_post, post, temp_dir, timeout=remaining)
             return True
+        except asyncio.TimeoutError:
+            # The abandoned worker may still be writing into temp_dir: no retry
+            print(f"Download of {post.shortcode} timed out")
+            return False
         except ConnectionException as e:
-            if "401 Unauthorized" in str(e) or "429" in str(e):
-                print(f"Rate limited or unauthorized, attempt {attempt + 1}/{max_retries}")
+            if "429" in str(e) or "Please wait" in str(e):
+                print(f"Rate limited, attempt {attempt + 1}/{max_retries}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)  # Exponential backoff
+                    # Shared backoff: every request on this session waits it out together
+                    governor.throttled(session_of(L.context))
+                    await governor.wait('graphql', session_of(L.context))
                     continue
                 return False
-            elif "Please wait" in str(e):
-                print(f"Instagram rate limit, waiting... Attempt {attempt + 1}/{max_retries}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(10)  # Wait longer for rate limits
-                    continue
+            elif "401 Unauthorized" in str(e):
+                # Login required or private content: waiting won't change that
+                print(f"Unauthorized: {e}")
                 return False
             else:
                 print(f"Connection error: {e}")
@@ -100,10 +125,17 @@ async def download_with_retry(post, temp_dir, max_retries=3):
 
 async def download_profile_pic_with_retry(profile, temp_dir, max_retries=3):
     """Download profile picture with retry logic"""
+    deadline = time.monotonic() + Config.INSTALOADER_DOWNLOAD_TIMEOUT
     for attempt in range(max_retries):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
         try:
-            L.download_profilepic(profile, temp_dir)
+            await run_blocking(L.download_profilepic, profile, temp_dir, timeout=remaining)
             return True
+        except asyncio.TimeoutError:
+            print("Profile pic download timed out")
+            return False
         except Exception as e:
             print(f"Profile pic download error: {e}")
             if attempt < max_retries - 1:
@@ -114,51 +146,27 @@ async def download_profile_pic_with_retry(profile, temp_dir, max_retries=3):
 
 def extract_shortcode(url):
     """Extract shortcode from Instagram URL"""
-    patterns = [
-        r'instagram\.com/p/([A-Za-z0-9_-]+)',
-        r'instagram\.com/reel/([A-Za-z0-9_-]+)',
-        r'instagram\.com/tv/([A-Za-z0-9_-]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
+    link = route(url)
+    return link.shortcode if link else None
 
 def extract_username(url):
     """Extract username from Instagram profile URL"""
-    match = re.search(r'instagram\.com/([A-Za-z0-9_.]+)/?$', url)
-    return match.group(1) if match else None
+    link = route(url)
+    return link.username if link and link.kind == 'profile' else None
 
-async def upload_files(client, chat_id, temp_dir, status_msg):
-    """Upload downloaded files to Telegram"""
+async def upload_files(client, chat_id, temp_dir, status_msg, shortcode=None):
+    """Upload downloaded files to Telegram as carousel-ordered albums"""
     try:
-        images = glob.glob(f"{temp_dir}/*.jpg") + glob.glob(f"{temp_dir}/*.jpeg")
-        videos = glob.glob(f"{temp_dir}/*.mp4")
-        
-        total = len(images) + len(videos)
-        if total == 0:
+        files = media_files(temp_dir)
+        if not files:
             await status_msg.edit_text("❌ No files found to upload.")
             return
-            
-        uploaded = 0
         
-        # Upload images
-        if len(images) == 1:
-            await client.send_photo(chat_id, images[0])
-            uploaded += 1
-        elif len(images) > 1:
-            for i in range(0, len(images), 10):
-                chunk = images[i:i + 10]
-                media = [InputMediaPhoto(img) for img in chunk]
-                await client.send_media_group(chat_id, media)
-                uploaded += len(chunk)
-                
-        # Upload videos
-        for video in videos:
-            await client.send_video(chat_id, video)
-            uploaded += 1
+        sent_file_ids = await send_planned(client, chat_id, files, on_progress=report_upload(status_msg))
+        uploaded = sum(1 for f in sent_file_ids if f)
+        
+        if all(sent_file_ids):
+            file_id_index.put(shortcode, sent_file_ids)
             
         await status_msg.edit_text(f"✅ Uploaded {uploaded} files successfully!")
         
@@ -235,77 +243,129 @@ async def status_cmd(client, message):
         text = "🔒 **Status: Not logged in**\n\nCan only download public content. Some downloads may fail due to Instagram restrictions."
     await message.reply_text(text)
 
-@app.on_message(filters.regex(r'instagram\.com'))
+async def download_link(link, temp_dir, say):
+    """Download a post/reel/IGTV or a profile picture into temp_dir
+
+    ``say(text)`` reports progress and the reason of a failure.
+    """
+    if link.shortcode:
+        await say("📥 Downloading post/reel...")
+        try:
+            post = await run_blocking(Post.from_shortcode, L.context, link.shortcode)
+            
+            # Show post details
+            caption_preview = (post.caption[:100] + "...") if post.caption and len(post.caption) > 100 else (post.caption or "No caption")
+            await say(f"📥 Downloading post by @{post.owner_username}\n\n📝 {caption_preview}")
+            
+            success = await download_with_retry(post, temp_dir)
+            if not success:
+                if not session_loaded:
+                    await say("❌ Download failed. This content may be private or Instagram is rate-limiting.\n\n💡 **Tip:** Owner can use /login to access private content.")
+                else:
+                    await say("❌ Download failed. Content may be unavailable or there's a temporary issue.")
+            return success
+        except Exception as e:
+            error_msg = str(e)
+            if "401 Unauthorized" in error_msg or "Please wait" in error_msg:
+                await say("❌ Instagram is blocking requests. This usually happens due to:\n\n• Rate limiting\n• Content is private\n• Instagram API restrictions\n\n⏰ Try again in a few minutes.")
+            elif "not found" in error_msg.lower():
+                await say("❌ Post not found. The link may be incorrect or the post was deleted.")
+            else:
+                await say(f"❌ Download failed: {error_msg}")
+            return False
+    
+    # Profile URL: download the profile picture
+    await say(f"📥 Downloading profile picture for @{link.username}...")
+    try:
+        profile = await profile_cache.get(link.username)
+        success = await download_profile_pic_with_retry(profile, temp_dir)
+        if not success:
+            await say("❌ Failed to download profile picture. Profile may be private or not exist.")
+        return success
+    except ProfileNotExistsException:
+        await say("❌ Profile not found. Please check the username.")
+        return False
+    except Exception as e:
+        await say(f"❌ Profile download failed: {str(e)}")
+        return False
+
+@app.on_message(filters.regex(r'instagram\.com|instagr\.am') | has_links)
 async def handle_url(client, message):
-    url = message.text.strip()
-    status = await message.reply_text("🔄 Processing Instagram URL...")
+    status = ProgressReporter(await message.reply_text("🔄 Processing Instagram URL..."))
+    
+    # Every post/reel/IGTV or profile link in the text, caption and entities
+    links = [link for link in await resolve_links(message_links(message)) if link.shortcode or link.kind == 'profile']
+    if not links:
+        await status.edit_text("❌ Invalid Instagram URL format.\n\n✅ **Supported formats:**\n• instagram.com/p/ABC123/\n• instagram.com/reel/XYZ789/\n• instagram.com/username/")
+        return
+    if len(links) > 1:
+        # Runs in the background so this update worker is free again
+        start_batch(client, message, status.message, links, download_link)
+        return
+    link = links[0]
+    shortcode = link.shortcode
+    
+    # Same post already being fetched for someone else: wait and share its upload
+    if inflight.waiting(shortcode):
+        await status.edit_text("⏳ This post is already being downloaded, sharing it with you...")
+    leading = await inflight.wait_or_lead(shortcode)
+    
+    cached = file_id_index.get(shortcode)
+    if cached:
+        try:
+            sent = await send_file_ids(client, message.chat.id, cached)
+        except Exception as e:
+            print(f"Cached re-send failed, downloading again: {e}")
+            file_id_index.forget(shortcode)
+        else:
+            if sent < len(cached):
+                file_id_index.forget(shortcode)  # a stale file_id: the next request re-uploads
+            if leading:
+                inflight.land(shortcode, True)
+            await status.edit_text(f"✅ Uploaded {sent} files successfully!")
+            return
     
     temp_dir = f"/tmp/{message.from_user.id}_{uuid.uuid4().hex[:8]}"
-    os.makedirs(temp_dir, exist_ok=True)
     
-    try:
-        # Try to extract shortcode for posts/reels/IGTV
-        shortcode = extract_shortcode(url)
-        if shortcode:
-            await status.edit_text("📥 Downloading post/reel...")
-            try:
-                post = Post.from_shortcode(L.context, shortcode)
-                
-                # Show post details
-                caption_preview = (post.caption[:100] + "...") if post.caption and len(post.caption) > 100 else (post.caption or "No caption")
-                await status.edit_text(f"📥 Downloading post by @{post.owner_username}\n\n📝 {caption_preview}")
-                
-                success = await download_with_retry(post, temp_dir)
-                if success:
-                    await upload_files(client, message.chat.id, temp_dir, status)
-                else:
-                    if not session_loaded:
-                        await status.edit_text("❌ Download failed. This content may be private or Instagram is rate-limiting.\n\n💡 **Tip:** Owner can use /login to access private content.")
-                    else:
-                        await status.edit_text("❌ Download failed. Content may be unavailable or there's a temporary issue.")
-                return
-            except Exception as e:
-                error_msg = str(e)
-                if "401 Unauthorized" in error_msg or "Please wait" in error_msg:
-                    await status.edit_text("❌ Instagram is blocking requests. This usually happens due to:\n\n• Rate limiting\n• Content is private\n• Instagram API restrictions\n\n⏰ Try again in a few minutes.")
-                elif "not found" in error_msg.lower():
-                    await status.edit_text("❌ Post not found. The link may be incorrect or the post was deleted.")
-                else:
-                    await status.edit_text(f"❌ Download failed: {error_msg}")
-                return
-        
-        # Try to extract username for profile
-        username = extract_username(url)
-        if username:
-            await status.edit_text(f"📥 Downloading profile picture for @{username}...")
-            try:
-                profile = Profile.from_username(L.context, username)
-                success = await download_profile_pic_with_retry(profile, temp_dir)
-                if success:
-                    await upload_files(client, message.chat.id, temp_dir, status)
-                else:
-                    await status.edit_text("❌ Failed to download profile picture. Profile may be private or not exist.")
-                return
-            except ProfileNotExistsException:
-                await status.edit_text("❌ Profile not found. Please check the username.")
-                return
-            except Exception as e:
-                await status.edit_text(f"❌ Profile download failed: {str(e)}")
-                return
-                
-        await status.edit_text("❌ Invalid Instagram URL format.\n\n✅ **Supported formats:**\n• instagram.com/p/ABC123/\n• instagram.com/reel/XYZ789/\n• instagram.com/username/")
-        
-    except Exception as e:
+    async def download():
+        os.makedirs(temp_dir, exist_ok=True)
+        return await download_link(link, temp_dir, status.edit_text)
+    
+    async def upload(success):
+        await upload_files(client, message.chat.id, temp_dir, status, shortcode)
+    
+    async def on_error(e):
         await status.edit_text(f"❌ Unexpected error: {str(e)}")
-    finally:
+    
+    async def cleanup():
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
-
-if __name__ == "__main__":
-    print("🚀 Starting Instagram Bot...")
+        if leading:
+            inflight.land(shortcode, bool(file_id_index.get(shortcode)))
+        await status.finish()
     
-    # Try to load Instagram session
-    load_instagram_session()
+    async def on_position(position):
+        await status.edit_text(f"⏳ Queued - position {position}")
     
+    try:
+        position = jobs.submit(message.from_user.id, download, upload, cleanup, on_position, on_error)
+    except QueueFull as e:
+        if leading:
+            inflight.land(shortcode, False)
+        await status.edit_text(f"⏳ Bot is busy: {e}. Please try again in a few minutes.")
+        return
+    if position:
+        await on_position(position)
+
+async def run():
+    await app.start()
+    # Try to load Instagram session (needs the client to fetch it from Telegram)
+    await load_instagram_session()
     print("✅ Bot is ready!")
-    app.run()
\ No newline at end of file
+    await idle()
+    await app.stop()
+    await close_client()
+
+if __name__ == "__main__":
+    print("🚀 Starting Instagram Bot...")
+    app.run(run())
\ No newline at end of file
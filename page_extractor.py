@@ -0,0 +1,175 @@
+"""
+Structured-data extractor for Instagram post and embed pages
+Finds the embedded JSON blobs (_sharedData, __additionalDataLoaded, the
+xdt_api web_info payload, shortcode_media, the embed's contextJSON) by
+their markers with str.find and parses only those slices, instead of
+running regexes over megabytes of HTML
+"""
+
+import json
+from collections import namedtuple
+
+from variant_select import variant, best_known
+
+try:
+    import orjson  # faster parsing of the sliced blobs when installed
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# items: [(url, kind)] in carousel order, kind is 'image' or 'video' - the best
+# variant the page's own hints point to; variants: every candidate URL found
+ExtractedMedia = namedtuple('ExtractedMedia', ['items', 'owner', 'caption', 'source', 'variants'])
+
+_decoder = json.JSONDecoder()
+
+# (source, marker, end marker or None) - the JSON value follows the marker;
+# without an end marker it is decoded up to its own closing brace
+MARKERS = (
+    ('xdt_api', '"xdt_api__v1__media__shortcode__web_info":', None),
+    ('shared_data', 'window._sharedData = ', ';</script>'),
+    ('additional_data', 'window.__additionalDataLoaded(', ');</script>'),
+    ('shortcode_media', '"shortcode_media":', None),
+    ('embed_context', '"contextJSON":', None),
+)
+
+
+def _decode_at(html, start, end_marker):
+    """Parse the JSON value starting at html[start]"""
+    if end_marker:
+        end = html.find(end_marker, start)
+        if end != -1:
+            try:
+                return _loads(html[start:end])
+            except ValueError:
+                pass  # end marker inside a string: fall back to a bounded decode
+    value, _ = _decoder.raw_decode(html, start)
+    return value
+
+
+def _blobs(html):
+    """(source, parsed JSON) for every marker found in the page"""
+    for source, marker, end_marker in MARKERS:
+        pos = html.find(marker)
+        while pos != -1:
+            start = pos + len(marker)
+            if source == 'additional_data':
+                start = html.find(',', start) + 1  # skip the path argument
+            while html[start:start + 1].isspace():
+                start += 1
+            opener = html[start:start + 1]
+            if opener and opener in '{"':
+                try:
+                    value = _decode_at(html, start, end_marker)
+                    if isinstance(value, str):
+                        value = _loads(value)  # contextJSON is JSON inside a JSON string
+                    yield source, value
+                except ValueError:
+                    pass
+            pos = html.find(marker, pos + len(marker))
+
+
+def _find(node, key, depth=0):
+    """First value for key anywhere in a parsed blob"""
+    if depth > 12:
+        return None
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = _find(child, key, depth + 1)
+        if found is not None:
+            return found
+    return None
+
+
+def _graphql_items(media):
+    """Variants of a GraphQL shortcode_media node"""
+    # Instagram sends explicit nulls, so every nested get falls back with `or`
+    edges = (media.get('edge_sidecar_to_children') or {}).get('edges') or []
+    children = [edge.get('node') or {} for edge in edges if edge]
+    variants = []
+    for i, node in enumerate(children or [media]):
+        asset = node.get('id') or node.get('shortcode') or str(i)
+        dimensions = node.get('dimensions') or {}
+        if node.get('is_video') and node.get('video_url'):
+            variants.append(variant(node['video_url'], 'video', asset, dimensions.get('width'), dimensions.get('height')))
+            continue
+        for resource in node.get('display_resources') or []:
+            variants.append(variant(resource['src'], 'image', asset, resource.get('config_width'), resource.get('config_height')))
+        if node.get('display_url'):
+            variants.append(variant(node['display_url'], 'image', asset, dimensions.get('width'), dimensions.get('height')))
+    owner = (media.get('owner') or {}).get('username')
+    captions = (media.get('edge_media_to_caption') or {}).get('edges') or []
+    caption = ((captions[0] or {}).get('node') or {}).get('text') if captions else None
+    return variants, owner, caption
+
+
+def _api_items(media):
+    """Variants of a v1 API (xdt_api) media item"""
+    variants = []
+    for i, node in enumerate(media.get('carousel_media') or [media]):
+        node = node or {}
+        asset = str(node.get('pk') or node.get('id') or i)
+        videos = node.get('video_versions')
+        if videos:
+            for v in videos:
+                variants.append(variant(v['url'], 'video', asset, v.get('width'), v.get('height'), v.get('bandwidth')))
+            continue
+        for image in (node.get('image_versions2') or {}).get('candidates') or []:
+            variants.append(variant(image['url'], 'image', asset, image.get('width'), image.get('height')))
+    owner = (media.get('user') or {}).get('username')
+    caption = (media.get('caption') or {}).get('text')
+    return variants, owner, caption
+
+
+def _media_from(blob):
+    api_item = _find(blob, 'items')
+    if isinstance(api_item, list) and api_item and isinstance(api_item[0], dict) and (
+            'image_versions2' in api_item[0] or 'carousel_media' in api_item[0]):
+        return _api_items(api_item[0])
+    media = blob if 'display_url' in blob else _find(blob, 'shortcode_media')
+    if isinstance(media, dict):
+        return _graphql_items(media)
+    return None
+
+
+def _embed_image(html):
+    """Last resort for embed pages without JSON: the EmbeddedMediaImage tag"""
+    pos = html.find('class="EmbeddedMediaImage"')
+    if pos == -1:
+        return None
+    tag_start = html.rfind('<img', 0, pos)
+    tag_end = html.find('>', pos)
+    tag = html[tag_start:tag_end]
+    src = tag.find('src="')
+    if src == -1:
+        return None
+    url = tag[src + 5:tag.find('"', src + 5)].replace('&amp;', '&')
+    variants = [variant(url, 'image')]
+    srcset = tag.find('srcset="')
+    if srcset != -1:
+        # "url 640w,url 1080w": every width is a variant of the same picture
+        for entry in tag[srcset + 8:tag.find('"', srcset + 8)].replace('&amp;', '&').split(','):
+            parts = entry.split()
+            if len(parts) == 2 and parts[1][:-1].isdigit():
+                variants.append(variant(parts[0], 'image', variants[0].asset, int(parts[1][:-1]), int(parts[1][:-1])))
+    return ExtractedMedia(best_known(variants), None, None, 'embed_image', variants)
+
+
+def extract_media(html):
+    """ExtractedMedia for a post or embed page, or None"""
+    for source, blob in _blobs(html):
+        if not isinstance(blob, dict):
+            continue
+        found = _media_from(blob)
+        if found and found[0]:
+            variants, owner, caption = found
+            return ExtractedMedia(best_known(variants), owner, caption, source, variants)
+    return _embed_image(html)
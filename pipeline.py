@@ -0,0 +1,140 @@
+"""
+Streaming download -> upload pipeline for the bulk commands
+Each post is queued for upload as soon as Instaloader saves it, so uploads
+overlap with downloads; at most a window of files waits on disk and every
+file is deleted once Telegram has confirmed it
+"""
+
+import asyncio
+import os
+import shutil
+import threading
+
+from config import Config
+from progress import ProgressReporter
+from rate_limiter import install as install_rate_limiter
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+
+
+class PipelineClosed(Exception):
+    """Raised in the download thread once the uploader has given up"""
+
+
+class UploadPipeline:
+    """Bounded hand-off between a download thread and the Telegram uploader"""
+
+    def __init__(self, bot, chat_id, status_msg, window):
+        # The plugins' client may not have been wrapped yet; _send relies on it
+        self.bot = install_rate_limiter(bot)
+        self.chat_id = chat_id
+        self.status_msg = status_msg
+        self.window = window
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.room = threading.Condition()
+        self.waiting = 0        # files handed off and not yet deleted
+        self.closed = False
+        self.sent = 0
+        self.failed = 0
+        self.downloaded = 0
+
+    def hand_off(self, paths):
+        """Queue freshly saved files; called from the download thread
+
+        Blocks while the window is full, so downloads never run more than
+        one post ahead of it.
+        """
+        with self.room:
+            if self.closed:
+                raise PipelineClosed("Upload stopped")
+            self.waiting += len(paths)
+            self.downloaded += len(paths)
+        for path in paths:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, path)
+        with self.room:
+            while self.waiting >= self.window and not self.closed:
+                self.room.wait()
+
+    def _done_with(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        with self.room:
+            self.waiting -= 1
+            self.room.notify()
+
+    def close(self):
+        with self.room:
+            self.closed = True
+            self.room.notify_all()
+
+    async def _send(self, path):
+        # FloodWait is retried in one place only: the rate limiter installed in __init__
+        name = path.lower()
+        if name.endswith(PHOTO_EXTENSIONS):
+            return await self.bot.send_photo(self.chat_id, path)
+        if name.endswith(VIDEO_EXTENSIONS):
+            return await self.bot.send_video(self.chat_id, path)
+        return await self.bot.send_document(self.chat_id, path)
+
+    async def _progress(self):
+        await self.status_msg.edit(f"📤 Uploaded {self.sent}/{self.downloaded} files so far...")
+
+    async def upload_worker(self):
+        """Send queued files until the None sentinel arrives"""
+        try:
+            while True:
+                path = await self.queue.get()
+                if path is None:
+                    return
+                try:
+                    await self._send(path)
+                    self.sent += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Failed to upload {path}: {e}")
+                finally:
+                    self._done_with(path)
+                await self._progress()
+        finally:
+            # Unblocks (and stops) the download thread if we bail out early
+            self.close()
+
+
+async def stream_download(status_msg, bot, chat_id, dirname, download, *args, **kwargs):
+    """Run an insta_engine download and upload its files while it runs
+
+    ``download(*args, on_files=..., **kwargs)`` is one of the insta_engine
+    coroutines. Returns the number of files sent.
+    """
+    status_msg = ProgressReporter(status_msg)
+    pipe = UploadPipeline(bot, chat_id, status_msg, Config.PIPELINE_WINDOW)
+    uploader = asyncio.ensure_future(pipe.upload_worker())
+    error = None
+    try:
+        await download(*args, on_files=pipe.hand_off, **kwargs)
+    except PipelineClosed:
+        pass
+    except Exception as e:
+        error = e
+        print(f"Download failed: {e}")
+    finally:
+        pipe.queue.put_nowait(None)
+        await uploader
+        shutil.rmtree(dirname, ignore_errors=True)
+
+    if error and not pipe.sent:
+        await status_msg.finish(f"❌ Download failed: {error}")
+    elif not pipe.sent:
+        await status_msg.finish("❌ No content found to upload.")
+    else:
+        text = f"✅ Uploaded {pipe.sent} files."
+        if pipe.failed:
+            text += f"\n⚠️ {pipe.failed} files could not be sent."
+        if error:
+            text += f"\n⚠️ Download stopped early: {error}"
+        await status_msg.finish(text)
+    return pipe.sent
@@ -25,9 +25,14 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from pyrogram import Client, filters
 from config import Config
 from utils import *
+from insta_executor import run_blocking
+from profile_cache import profile_cache
+import insta_engine
+from pipeline import stream_download
+from follower_graph import fetch_usernames
+from list_export import send_user_list
 import os
 from instaloader import Profile
-from pyrogram.errors.exceptions.bad_request_400 import MessageTooLong
 
 HELP=Config.HELP
 session=f"./{USER}"
@@ -39,13 +44,14 @@ insta = Config.L
 @Client.on_callback_query()
 async def cb_handler(bot: Client, query: CallbackQuery):
     cmd, username = query.data.split("#")
-    profile = Profile.from_username(insta.context, username)
-    mediacount = profile.mediacount
-    name = profile.full_name
-    profilepic = profile.profile_pic_url
-    igtvcount = profile.igtvcount
-    followers = profile.followers
-    folllowing = profile.followees
+    if cmd not in ("help", "no"):
+        profile = await profile_cache.get(username)
+        mediacount = profile.mediacount
+        name = profile.full_name
+        profilepic = profile.profile_pic_url
+        igtvcount = profile.igtvcount
+        followers = profile.followers
+        folllowing = profile.followees
     
     if query.data.startswith("help"):
         await query.message.edit_text(
@@ -67,7 +73,6 @@ async def cb_handler(bot: Client, query: CallbackQuery):
     
     
     elif query.data.startswith("ppic"):
-        profile = Profile.from_username(insta.context, username)
         profilepichd = profile.profile_pic_url
         await query.answer()
         await bot.send_document(chat_id=query.from_user.id, document=profilepichd, file_name=f"{username}.jpg", force_document=True)
@@ -98,22 +103,8 @@ async def cb_handler(bot: Client, query: CallbackQuery):
             return
         m= await query.edit_message_text("Starting Downloading..\nThis may take time depending upon number of Posts.")      
         dir=f"{query.from_user.id}/{username}"
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-videos",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "-f", session,
-            "--dirname-pattern", dir,
-            "--", username
-            ]
-        await download_insta(command, m, dir)
         chat_id=query.from_user.id
-        await upload(m, bot, chat_id, dir)
+        await stream_download(m, bot, chat_id, dir, insta_engine.download_profile_posts, username, dir, videos=False)
     
 
 
@@ -123,22 +114,8 @@ async def cb_handler(bot: Client, query: CallbackQuery):
             return
         m= await query.edit_message_text("Starting Downloading..\nThis may take longer time Depending upon number of posts.")    
         dir=f"{query.from_user.id}/{username}"
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-pictures",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "-f", session,
-            "--dirname-pattern", dir,
-            "--", username
-            ]
-        await download_insta(command, m, dir)
         chat_id=query.from_user.id
-        await upload(m, bot, chat_id, dir)
+        await stream_download(m, bot, chat_id, dir, insta_engine.download_profile_posts, username, dir, pictures=False)
 
     elif query.data.startswith("igtv"):
         await query.message.delete()
@@ -161,23 +138,8 @@ async def cb_handler(bot: Client, query: CallbackQuery):
         m= await query.edit_message_text("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
         dir=f"{query.from_user.id}/{username}"
 
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-posts",
-            "--igtv",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "-f", session,
-            "--dirname-pattern", dir,
-            "--", username
-            ]
-        await download_insta(command, m, dir)
         chat_id=query.from_user.id
-        await upload(m, bot, chat_id, dir)
+        await stream_download(m, bot, chat_id, dir, insta_engine.download_igtv, username, dir)
 
 
 
@@ -185,23 +147,11 @@ async def cb_handler(bot: Client, query: CallbackQuery):
         await query.message.delete()
         chat_id=query.from_user.id
         m=await bot.send_message(chat_id, f"Fetching Followers List of {name}")
-        f = profile.get_followers()
-        followers=f"**Followers List for {name}**\n\n"
-        for p in f:
-            followers += f"\n[{p.username}](www.instagram.com/{p.username})"
-        try:
-            await m.delete()
-            await bot.send_message(chat_id=chat_id, text=followers)
-        except MessageTooLong:
-            followers=f"**Followers List for {name}**\n\n"
-            f = profile.get_followers()
-            for p in f:
-                followers += f"\nName: {p.username} :     Link to Profile: www.instagram.com/{p.username}"
-            text_file = open(f"{username}'s followers.txt", "w")
-            text_file.write(followers)
-            text_file.close()
-            await bot.send_document(chat_id=chat_id, document=f"./{username}'s followers.txt", caption=f"{name}'s followers\n\nA Project By [XTZ_Bots](https://t.me/subin_works)")
-            os.remove(f"./{username}'s followers.txt")
+        await m.delete()
+        await send_user_list(
+            bot, chat_id, f"Followers List for {name}", await fetch_usernames(username, "followers"),
+            f"{username}'s followers", f"{name}'s followers\n\nA Project By [XTZ_Bots](https://t.me/subin_works)"
+        )
     
 
 
@@ -212,23 +162,11 @@ async def cb_handler(bot: Client, query: CallbackQuery):
         chat_id=query.from_user.id
         m=await bot.send_message(chat_id, f"Fetching Followees of {name}")
         
-        f = profile.get_followees()
-        followees=f"**Followees List for {name}**\n\n"
-        for p in f:
-            followees += f"\n[{p.username}](www.instagram.com/{p.username})"
-        try:
-            await m.delete()
-            await bot.send_message(chat_id=chat_id, text=followees)
-        except MessageTooLong:
-            followees=f"**Followees List for {name}**\n\n"
-            f = profile.get_followees()
-            for p in f:
-                followees += f"\nName: {p.username} :     Link to Profile: www.instagram.com/{p.username}"
-            text_file = open(f"{username}'s followees.txt", "w")
-            text_file.write(followees)
-            text_file.close()
-            await bot.send_document(chat_id=chat_id, document=f"./{username}'s followees.txt", caption=f"{name}'s followees\n\nA Project By [XTZ_Bots](https://t.me/subin_works)")
-            os.remove(f"./{username}'s followees.txt")
+        await m.delete()
+        await send_user_list(
+            bot, chat_id, f"Followees List for {name}", await fetch_usernames(username, "followees"),
+            f"{username}'s followees", f"{name}'s followees\n\nA Project By [XTZ_Bots](https://t.me/subin_works)"
+        )
 
 
 
@@ -246,96 +184,14 @@ async def cb_handler(bot: Client, query: CallbackQuery):
         m= await bot.send_message(chat_id, "Starting Downloading..\nThis may take longer time Depending upon number of posts.") 
         cmd, username = query.data.split("#")   
         if cmd == "feed":
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-profile-pic",
-                "--no-posts",
-                "--no-captions",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "--sessionfile", session,
-                "--dirname-pattern", dir,
-                ":feed"
-                ]
-            await download_insta(command, m, dir)
+            await stream_download(m, bot, chat_id, dir, insta_engine.download_feed, dir)
         elif cmd=="saved":
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-profile-pic",
-                "--no-posts",
-                "--no-captions",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "-f", session,
-                "--dirname-pattern", dir,
-                ":saved"
-                ]
-            await download_insta(command, m, dir)
+            await stream_download(m, bot, chat_id, dir, insta_engine.download_saved, dir)
         elif cmd=="tagged":
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-profile-pic",
-                "--no-posts",
-                "--tagged",
-                "--no-captions",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "-f", session,
-                "--dirname-pattern", dir,
-                "--", username
-                ]
-            await download_insta(command, m, dir)
+            await stream_download(m, bot, chat_id, dir, insta_engine.download_tagged, username, dir)
         elif cmd=="stories":
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-profile-pic",
-                "--no-posts",
-                "--stories",
-                "--no-captions",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "-f", session,
-                "--dirname-pattern", dir,
-                "--", username
-                ]
-            await download_insta(command, m, dir)
+            await stream_download(m, bot, chat_id, dir, insta_engine.download_stories, dir, username)
         elif cmd=="fstories":
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-profile-pic",
-                "--no-captions",
-                "--no-posts",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "-f", session,
-                "--dirname-pattern", dir,
-                ":stories"
-                ]
-            await download_insta(command, m, dir)
+            await stream_download(m, bot, chat_id, dir, insta_engine.download_stories, dir)
         elif cmd=="highlights":
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-profile-pic",
-                "--no-posts",
-                "--highlights",
-                "--no-captions",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "-f", session,
-                "--dirname-pattern", dir,
-                "--", username
-                ]
-            await download_insta(command, m, dir)
-        await upload(m, bot, chat_id, dir)
+            await stream_download(m, bot, chat_id, dir, insta_engine.download_highlights, username, dir)
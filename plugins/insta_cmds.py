@@ -24,9 +24,15 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from pyrogram import Client, filters
 from config import Config
 from instaloader import Profile
-from pyrogram.errors.exceptions.bad_request_400 import MessageTooLong
 import os
 from utils import *
+from insta_executor import run_blocking
+from profile_cache import profile_cache
+from session_pool import session_pool
+import insta_engine
+from pipeline import stream_download
+from follower_graph import follower_report, changes_text, fetch_usernames
+from list_export import send_user_list
 
 USER=Config.USER
 OWNER=Config.OWNER
@@ -74,10 +80,10 @@ async def post(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
     await bot.send_message(
@@ -110,14 +116,14 @@ async def igtv(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
     m=await message.reply_text(f"Fetching IGTV from <code>@{username}</code>")
-    profile = Profile.from_username(insta.context, username)
+    profile = await profile_cache.get(username)
     igtvcount = profile.igtvcount
     await m.edit(
         text = f"Do you Want to download all IGTV posts?\nThere are {igtvcount} posts.",
@@ -149,33 +155,21 @@ async def followers(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
-    profile = Profile.from_username(insta.context, username)
+    profile = await profile_cache.get(username)
     name=profile.full_name
     m=await message.reply_text(f"Fetching Followers list of <code>@{username}</code>")
     chat_id=message.from_user.id
-    f = profile.get_followers()
-    followers=f"**Followers List for {name}**\n\n"
-    for p in f:
-        followers += f"\n[{p.username}](www.instagram.com/{p.username})"
-    try:
-        await m.delete()
-        await bot.send_message(chat_id=chat_id, text=followers)
-    except MessageTooLong:
-        followers=f"**Followers List for {name}**\n\n"
-        f = profile.get_followers()
-        for p in f:
-            followers += f"\nName: {p.username} :     Link to Profile: www.instagram.com/{p.username}"
-        text_file = open(f"{username}'s followers.txt", "w")
-        text_file.write(followers)
-        text_file.close()
-        await bot.send_document(chat_id=chat_id, document=f"./{username}'s followers.txt", caption=f"{name}'s followers\n\nA Project By [XTZ_Bots](https://t.me/subin_works)")
-        os.remove(f"./{username}'s followers.txt")
+    await m.delete()
+    await send_user_list(
+        bot, chat_id, f"Followers List for {name}", await fetch_usernames(username, "followers"),
+        f"{username}'s followers", f"{name}'s followers\n\nA Project By [XTZ_Bots](https://t.me/subin_works)"
+    )
 
 
 @Client.on_message(filters.command("followees") & filters.private)
@@ -194,33 +188,21 @@ async def followees(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
-    profile = Profile.from_username(insta.context, username)
+    profile = await profile_cache.get(username)
     name=profile.full_name
     m=await message.reply_text(f"Fetching Followees list of <code>@{username}</code>")
     chat_id=message.from_user.id
-    f = profile.get_followees()
-    followees=f"**Followees List for {name}**\n\n"
-    for p in f:
-        followees += f"\n[{p.username}](www.instagram.com/{p.username})"
-    try:
-        await m.delete()
-        await bot.send_message(chat_id=chat_id, text=followees)
-    except MessageTooLong:
-        followees=f"**Followees List for {name}**\n\n"
-        f = profile.get_followees()
-        for p in f:
-            followees += f"\nName: {p.username} :     Link to Profile: www.instagram.com/{p.username}"
-        text_file = open(f"{username}'s followees.txt", "w")
-        text_file.write(followees)
-        text_file.close()
-        await bot.send_document(chat_id=chat_id, document=f"./{username}'s followees.txt", caption=f"{name}'s followees\n\nA Project By [XTZ_Bots](https://t.me/subin_works)")
-        os.remove(f"./{username}'s followees.txt")
+    await m.delete()
+    await send_user_list(
+        bot, chat_id, f"Followees List for {name}", await fetch_usernames(username, "followees"),
+        f"{username}'s followees", f"{name}'s followees\n\nA Project By [XTZ_Bots](https://t.me/subin_works)"
+    )
 
 
 
@@ -241,45 +223,23 @@ async def fans(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
-    profile = Profile.from_username(insta.context, username)
+    profile = await profile_cache.get(username)
     name=profile.full_name
     m=await message.reply_text(f"Fetching list of followees of <code>@{username}</code> who follows <code>@{username}</code>.")
     chat_id=message.from_user.id
-    f = profile.get_followers()
-    fl = profile.get_followees()
-    flist=[]
-    fmlist=[]
-    for fn in f:
-        u=fn.username
-        flist.append(u)
-    for fm in fl:
-        n=fm.username
-        fmlist.append(n)
-
-    fans = [value for value in fmlist if value in flist]
-    print(len(fans))
-    followers=f"**Fans List for {name}**\n\n"
-    for p in fans:
-        followers += f"\n[{p}](www.instagram.com/{p})"
-    try:
-        await m.delete()
-        await bot.send_message(chat_id=chat_id, text=followers)
-    except MessageTooLong:
-        followers=f"**Fans List for {name}**\n\n"
-        
-        for p in fans:
-            followers += f"\nName: {p} :     Link to Profile: www.instagram.com/{p}"
-        text_file = open(f"{username}'s fans.txt", "w")
-        text_file.write(followers)
-        text_file.close()
-        await bot.send_document(chat_id=chat_id, document=f"./{username}'s fans.txt", caption=f"{name}'s fans\n\nA Project By [XTZ_Bots](https://t.me/subin_works)")
-        os.remove(f"./{username}'s fans.txt")
+    report = await follower_report(username)
+    print(len(report.mutual_ids))
+    await m.delete()
+    await send_user_list(
+        bot, chat_id, f"Fans List for {name}", report.mutuals,
+        f"{username}'s fans", f"{name}'s fans\n\nA Project By [XTZ_Bots](https://t.me/subin_works)", note=changes_text(report)
+    )
 
 
 @Client.on_message(filters.command("notfollowing") & filters.private)
@@ -298,44 +258,24 @@ async def nfans(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
-    profile = Profile.from_username(insta.context, username)
+    profile = await profile_cache.get(username)
     name=profile.full_name
     m=await message.reply_text(f"Fetching list of followees of <code>@{username}</code> who is <b>not</b> following <code>@{username}</code>.")
     chat_id=message.from_user.id
-    f = profile.get_followers()
-    fl = profile.get_followees()
-    flist=[]
-    fmlist=[]
-    for fn in f:
-        u=fn.username
-        flist.append(u)
-    for fm in fl:
-        n=fm.username
-        fmlist.append(n)
-
-    fans = list(set(fmlist) - set(flist))
-    print(len(fans))
-    followers=f"**Followees of <code>@{username}</code> who is <b>not</b> following <code>@{username}</code>**\n\n"
-    for p in fans:
-        followers += f"\n[{p}](www.instagram.com/{p})"
-    try:
-        await m.delete()
-        await bot.send_message(chat_id=chat_id, text=followers)
-    except MessageTooLong:
-        followers=f"Followees of <code>@{username}</code> who is <b>not</b> following <code>@{username}</code>\n\n"
-        for p in fans:
-            followers += f"\nName: {p} :     Link to Profile: www.instagram.com/{p}"
-        text_file = open(f"{username}'s Non_followers.txt", "w")
-        text_file.write(followers)
-        text_file.close()
-        await bot.send_document(chat_id=chat_id, document=f"./{username}'s Non_followers.txt", caption=f"{name}'s Non_followers\n\nA Project By [XTZ_Bots](https://t.me/subin_works)")
-        os.remove(f"./{username}'s Non_followers.txt")
+    report = await follower_report(username)
+    print(len(report.not_following_back_ids))
+    await m.delete()
+    await send_user_list(
+        bot, chat_id, f"Followees of <code>@{username}</code> who is <b>not</b> following <code>@{username}</code>",
+        report.not_following_back, f"{username}'s Non_followers",
+        f"{name}'s Non_followers\n\nA Project By [XTZ_Bots](https://t.me/subin_works)", note=changes_text(report)
+    )
 
 
 
@@ -362,38 +302,7 @@ async def feed(bot, message):
     chat_id=message.from_user.id
     dir=f"{chat_id}/{username}"
     await m.edit("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
-    if count:
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-posts",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "--sessionfile", session,
-            "--dirname-pattern", dir,
-            ":feed",
-            "--count", count
-            ]
-    else:
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-posts",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "--sessionfile", session,
-            "--dirname-pattern", dir,
-            ":feed"
-            ]
-
-    await download_insta(command, m, dir)
-    await upload(m, bot, chat_id, dir)
+    await stream_download(m, bot, chat_id, dir, insta_engine.download_feed, dir, int(count) if count else None)
 
 
 
@@ -418,37 +327,7 @@ async def saved(bot, message):
     chat_id=message.from_user.id
     dir=f"{chat_id}/{username}"
     await m.edit("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
-    if count:
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-posts",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "-f", session,
-            "--dirname-pattern", dir,
-            ":saved",
-            "--count", count
-            ]
-    else:
-        command = [
-            "instaloader",
-            "--no-metadata-json",
-            "--no-compress-json",
-            "--no-profile-pic",
-            "--no-posts",
-            "--no-captions",
-            "--no-video-thumbnails",
-            "--login", USER,
-            "-f", session,
-            "--dirname-pattern", dir,
-            ":saved"
-            ]
-    await download_insta(command, m, dir)
-    await upload(m, bot, chat_id, dir)
+    await stream_download(m, bot, chat_id, dir, insta_engine.download_saved, dir, int(count) if count else None)
 
 
 
@@ -469,32 +348,17 @@ async def tagged(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
     m=await message.reply_text(f"Fetching the posts in which <code>@{username}</code> is tagged.")
     chat_id=message.from_user.id
     dir=f"{chat_id}/{username}"
     await m.edit("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
-    command = [
-        "instaloader",
-        "--no-metadata-json",
-        "--no-compress-json",
-        "--no-profile-pic",
-        "--no-posts",
-        "--tagged",
-        "--no-captions",
-        "--no-video-thumbnails",
-        "--login", USER,
-        "-f", session,
-        "--dirname-pattern", dir,
-        "--", username
-        ]
-    await download_insta(command, m, dir)
-    await upload(m, bot, chat_id, dir)
+    await stream_download(m, bot, chat_id, dir, insta_engine.download_tagged, username, dir)
 
 
 
@@ -514,32 +378,17 @@ async def story(bot, message):
         return
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
     m=await message.reply_text(f"Fetching stories of <code>@{username}</code>")
     chat_id=message.from_user.id
     dir=f"{chat_id}/{username}"
     await m.edit("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
-    command = [
-        "instaloader",
-        "--no-metadata-json",
-        "--no-compress-json",
-        "--no-profile-pic",
-        "--no-posts",
-        "--stories",
-        "--no-captions",
-        "--no-video-thumbnails",
-        "--login", USER,
-        "-f", session,
-        "--dirname-pattern", dir,
-        "--", username
-        ]
-    await download_insta(command, m, dir)
-    await upload(m, bot, chat_id, dir)
+    await stream_download(m, bot, chat_id, dir, insta_engine.download_stories, dir, username)
 
 
 
@@ -560,21 +409,7 @@ async def stories(bot, message):
     chat_id=message.from_user.id
     dir=f"{chat_id}/{username}"
     await m.edit("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
-    command = [
-        "instaloader",
-        "--no-metadata-json",
-        "--no-compress-json",
-        "--no-profile-pic",
-        "--no-captions",
-        "--no-posts",
-        "--no-video-thumbnails",
-        "--login", USER,
-        "-f", session,
-        "--dirname-pattern", dir,
-        ":stories"
-        ]
-    await download_insta(command, m, dir)
-    await upload(m, bot, chat_id, dir)
+    await stream_download(m, bot, chat_id, dir, insta_engine.download_stories, dir)
 
 
 
@@ -595,30 +430,15 @@ async def highlights(bot, message):
     text=message.text
     if " " in text:
         cmd, username = text.split(' ')
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         is_followed = yes_or_no(profile.followed_by_viewer) 
         type = acc_type(profile.is_private)
-        if type == "🔒Private🔒" and is_followed == "No":
+        if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
             await message.reply_text("Sorry!\nI can't fetch details from that account.\nSince its a Private account and you are not following <code>@{username}</code>.")
             return
     m=await message.reply_text(f"Fetching highlights from profile <code>@{username}</code>")
     chat_id=message.from_user.id
     dir=f"{chat_id}/{username}"
     await m.edit("Starting Downloading..\nThis may take longer time Depending upon number of posts.")
-    command = [
-        "instaloader",
-        "--no-metadata-json",
-        "--no-compress-json",
-        "--no-profile-pic",
-        "--no-posts",
-        "--highlights",
-        "--no-captions",
-        "--no-video-thumbnails",
-        "--login", USER,
-        "-f", session,
-        "--dirname-pattern", dir,
-        "--", username
-        ]
-    await download_insta(command, m, dir)
-    await upload(m, bot, chat_id, dir)
+    await stream_download(m, bot, chat_id, dir, insta_engine.download_highlights, username, dir)
 
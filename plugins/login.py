@@ -24,6 +24,9 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from pyrogram import Client, filters
 from config import Config
 from utils import *
+from insta_executor import run_blocking
+from profile_cache import profile_cache
+from session_store import session_store
 import os
 from instaloader import Profile, TwoFactorAuthRequiredException, BadCredentialsException
 from asyncio.exceptions import TimeoutError
@@ -62,9 +65,15 @@ async def login(bot, message):
 		)
         return
     username=USER
+    if 1 not in STATUS and await session_store.restore(insta, username, bot) \
+            and await session_store.verify(insta, username):
+        # Saved by an earlier run: no password round trip needed
+        STATUS.add(1)
+        profile_cache.invalidate()
+        session_store.start_refresh(insta, bot)
     if 1 in STATUS:
         m=await bot.send_message(message.from_user.id, "Fetching details from Instagram")
-        profile = Profile.own_profile(insta.context)
+        profile = await profile_cache.own()
         mediacount = profile.mediacount
         name = profile.full_name
         bio = profile.biography
@@ -88,19 +97,14 @@ async def login(bot, message):
         passw=password.text
         break
     try:
-        insta.login(username, passw)
-        insta.save_session_to_file(filename=f"./{username}")
-        f=await bot.send_document(
-            chat_id=message.from_user.id,
-            document=f"./{username}",
-            file_name=str(message.from_user.id),
-            caption="⚠️ KEEP THIS SESSION FILE SAFE AND DO NOT SHARE WITH ANYBODY"
-            )
-        file_id=f.document.file_id
+        await run_blocking(insta.login, username, passw)
+        file_id=await session_store.save(insta, bot)
+        session_store.start_refresh(insta, bot)
         await bot.send_message(message.from_user.id, f"Now go to [Heroku](https://dashboard.heroku.com/apps) and set Environment variable.\n\n\n**KEY**: <code>INSTA_SESSIONFILE_ID</code>\n\n**VALUE**: <code>{file_id}</code>\n\nIf you do not set this you may need to Login again When Heroku restarts.", disable_web_page_preview=True)
         STATUS.add(1)
+        profile_cache.invalidate()
         m=await bot.send_message(message.from_user.id, "Fetching details from Instagram")
-        profile = Profile.from_username(insta.context, username)
+        profile = await profile_cache.get(username)
         mediacount = profile.mediacount
         name = profile.full_name
         bio = profile.biography
@@ -129,19 +133,14 @@ async def login(bot, message):
                 await bot.send_message(message.from_user.id, "OTP Should be Integer")
                 continue
         try:
-            insta.two_factor_login(codei)
-            insta.save_session_to_file(filename=f"./{username}")
-            f=await bot.send_document(
-                chat_id=message.from_user.id,
-                document=f"./{username}",
-                file_name=str(message.from_user.id),
-                caption="⚠️ KEEP THIS SESSION FILE SAFE AND DO NOT SHARE WITH ANYBODY"
-                )
-            file_id=f.document.file_id
+            await run_blocking(insta.two_factor_login, codei)
+            file_id=await session_store.save(insta, bot)
+            session_store.start_refresh(insta, bot)
             await bot.send_message(message.from_user.id, f"Now go to [Heroku](https://dashboard.heroku.com/apps) and set Environment variable.\n\n\n**KEY**: <code>INSTA_SESSIONFILE_ID</code>\n\n**VALUE**: <code>{file_id}</code>\n\nIf you do not set this you may need to Login again When Heroku restarts.", disable_web_page_preview=True)
             STATUS.add(1)
+            profile_cache.invalidate()
             m=await bot.send_message(message.from_user.id, "Fetching details from Instagram")
-            profile = Profile.from_username(insta.context, username)
+            profile = await profile_cache.get(username)
             mediacount = profile.mediacount
             name = profile.full_name
             bio = profile.biography
@@ -192,6 +191,9 @@ async def logout(bot, message):
     if 1 in STATUS:
         await message.reply_text("Succesfully Logged Out")
         STATUS.remove(1)
-        os.remove(f"./{USER}")
+        profile_cache.invalidate()
+        session_store.forget(USER)
+        if os.path.exists(f"./{USER}"):
+            os.remove(f"./{USER}")
     else:
         await message.reply_text("You are not Logged in\nUse /login first")
@@ -20,11 +20,16 @@
 #OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #SOFTWARE.
 
-import re
 from config import Config
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from utils import *
+from insta_executor import run_blocking
+from profile_cache import profile_cache
+from session_pool import session_pool
+from url_router import route, resolve
+import insta_engine
+from pipeline import stream_download
 from instaloader import Profile
 
 USER=Config.USER
@@ -68,7 +73,7 @@ async def account(bot, message):
     if 1 in STATUS:
         m=await message.reply_text("Getting Your data")
         try:
-            profile = Profile.own_profile(insta.context)
+            profile = await profile_cache.own()
             mediacount = profile.mediacount
             name = profile.full_name
             bio = profile.biography
@@ -153,46 +158,29 @@ async def _insta_post_batch(bot, message):
     m = await message.reply_text("Fetching data from Instagram🔗")
     chat_id= message.from_user.id
     username=message.text
-    if "https://instagram.com/stories/" in username:
+    link = await resolve(route(username))
+    if link and link.kind in ('story', 'highlight'):
         await m.edit("Stories from links are not yet supported🥴\n\nYou can download stories from Username.")
         return
+    if link and link.kind == 'profile':
+        username = link.username
 
-    link = r'^https://www\.instagram\.com/([A-Za-z0-9._]+/)?(p|tv|reel)/([A-Za-z0-9\-_]*)'
-    result = re.search(link, username)
-    
-    if result:
+    if link and link.shortcode:
         Post_type = {
-            'p': 'POST',
-            'tv': 'IGTV',
+            'post': 'POST',
+            'igtv': 'IGTV',
             'reel': 'REELS'
         }
-        supported = Post_type.get(result.group(2))
+        supported = Post_type.get(link.kind)
         if not supported:
             await m.edit('Unsupported Format')
             return
         sent = await m.edit(f'`Fetching {supported} Content from Instagram.`')
-        shortcode = result.group(3)
-        try:
-            userid=str(message.from_user.id)
-            dir=f"{userid}/{shortcode}"
-            chat_id=message.from_user.id
-            command = [
-                "instaloader",
-                "--no-metadata-json",
-                "--no-compress-json",
-                "--no-captions",
-                "--no-video-thumbnails",
-                "--login", USER,
-                "-f", session,
-                "--dirname-pattern", dir,
-                "--", f"-{shortcode}"
-                ]
-            await download_insta(command, sent, dir)
-            await upload(sent, bot, chat_id, dir)
-        except Exception as e:
-            print(e)
-            await bot.send_message(chat_id=message.from_user.id, text=e)
-            pass
+        shortcode = link.shortcode
+        userid=str(message.from_user.id)
+        dir=f"{userid}/{shortcode}"
+        chat_id=message.from_user.id
+        await stream_download(sent, bot, chat_id, dir, insta_engine.download_shortcode, shortcode, dir)
     elif "https://" in username:
         await m.edit('Unsupported Format')
         return
@@ -200,7 +188,7 @@ async def _insta_post_batch(bot, message):
     else:
         await m.edit(f"Fetching details for <code>@{username}</code>")
         try:
-            profile = Profile.from_username(insta.context, username)
+            profile = await profile_cache.get(username)
             mediacount = profile.mediacount
             name = profile.full_name
             profilepic = profile.profile_pic_url
@@ -211,7 +199,7 @@ async def _insta_post_batch(bot, message):
             is_followed = yes_or_no(profile.followed_by_viewer) 
             is_following = yes_or_no(profile.follows_viewer)
             type = acc_type(profile.is_private)
-            if type == "🔒Private🔒" and is_followed == "No":
+            if type == "🔒Private🔒" and is_followed == "No" and not await session_pool.follows(username):
                 print("reached")
                 reply_markup=InlineKeyboardMarkup(
                     [
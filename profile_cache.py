@@ -0,0 +1,76 @@
+"""
+Process-wide cache of Instagram Profile objects
+Keyed by username and by user id with a short TTL, and concurrent lookups
+of the same profile share one GraphQL request
+"""
+
+import time
+from collections import OrderedDict
+
+from instaloader import Profile
+
+from config import Config
+from insta_executor import run_blocking
+from singleflight import SingleFlight
+
+
+class ProfileCache:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires, Profile)
+        self.flights = SingleFlight()
+        self.context = None  # Instaloader context to query; None = Config.L's
+
+    def _lookup(self, key):
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, profile):
+        expires = time.monotonic() + self.ttl
+        for key in (('name', profile.username.lower()), ('id', profile.userid)):
+            self.entries[key] = (expires, profile)
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return profile
+
+    async def _load(self, loader, *args):
+        profile = await run_blocking(loader, self.context or Config.L.context, *args)
+        return self._store(profile)
+
+    async def get(self, username):
+        """Profile for a username, from cache or one shared lookup"""
+        key = ('name', username.lower())
+        return self._lookup(key) or await self.flights.do(key, self._load, Profile.from_username, username)
+
+    async def get_by_id(self, userid):
+        key = ('id', int(userid))
+        return self._lookup(key) or await self.flights.do(key, self._load, Profile.from_id, int(userid))
+
+    async def own(self):
+        """Profile of the logged-in account"""
+        username = (self.context or Config.L.context).username
+        if username:
+            cached = self._lookup(('name', username.lower()))
+            if cached:
+                return cached
+        return await self.flights.do(('own',), self._load, Profile.own_profile)
+
+    def invalidate(self, username=None):
+        """Forget one profile (e.g. after login/logout), or everything"""
+        if username is None:
+            self.entries.clear()
+            return
+        entry = self.entries.pop(('name', username.lower()), None)
+        if entry:
+            self.entries.pop(('id', entry[1].userid), None)
+
+
+profile_cache = ProfileCache(Config.PROFILE_CACHE_TTL, Config.PROFILE_CACHE_ENTRIES)
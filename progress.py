@@ -0,0 +1,70 @@
+"""
+Debounced status-message editing
+A ProgressReporter stands in for a status Message: it keeps only the
+latest text, edits at most once per interval, skips edits that wouldn't
+change anything and always delivers the last state
+"""
+
+import asyncio
+import time
+
+from config import Config
+
+
+class ProgressReporter:
+    """Wraps a pyrogram Message; ``edit_text``/``edit`` are debounced"""
+
+    def __init__(self, message, interval=None):
+        self.message = message
+        self.interval = Config.PROGRESS_INTERVAL if interval is None else interval
+        self.latest = None          # (text, kwargs) waiting to be shown
+        self.shown = getattr(message, 'text', None)
+        self.last_edit = 0
+        self.flusher = None
+        self.edits = 0
+
+    async def edit_text(self, text, **kwargs):
+        self.latest = (text, kwargs)
+        if self.flusher:
+            return  # the scheduled edit will pick up this text
+        wait = self.last_edit + self.interval - time.monotonic()
+        if wait <= 0:
+            await self._send()
+        else:
+            # Trailing edit, so the last update is never lost
+            self.flusher = asyncio.ensure_future(self._send_later(wait))
+
+    edit = edit_text
+
+    async def finish(self, text=None, **kwargs):
+        """Show the final state right away"""
+        if text is not None:
+            self.latest = (text, kwargs)
+        if self.flusher:
+            self.flusher.cancel()
+            self.flusher = None
+        await self._send()
+
+    async def _send_later(self, wait):
+        await asyncio.sleep(wait)
+        self.flusher = None
+        await self._send()
+
+    async def _send(self):
+        if not self.latest:
+            return
+        text, kwargs = self.latest
+        self.latest = None
+        if text == self.shown:
+            return
+        self.last_edit = time.monotonic()
+        try:
+            await self.message.edit_text(text, **kwargs)
+            self.shown = text
+            self.edits += 1
+        except Exception as e:
+            print(f"Status update failed: {e}")
+
+    def __getattr__(self, name):
+        # delete(), chat, id... come from the wrapped message
+        return getattr(self.message, name)
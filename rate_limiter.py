@@ -0,0 +1,172 @@
+"""
+Adaptive rate limiter for outgoing Telegram messages
+Every message-sending API call takes a token from a global bucket, a
+bucket per chat and a bucket per method. A FloodWait blocks the bucket
+it hit for the requested time and halves that bucket's rate, which then
+creeps back up on success. Status edits yield to media sends.
+"""
+
+import asyncio
+import time
+
+from pyrogram.errors import FloodWait
+
+from config import Config
+
+# Raw API methods that count against Telegram's message limits
+LIMITED_METHODS = {
+    'SendMessage', 'SendMedia', 'SendMultiMedia', 'EditMessage', 'ForwardMessages'
+}
+LOW_PRIORITY_METHODS = {'EditMessage'}
+MAX_FLOOD_RETRIES = 3
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 = now)"""
+        self._refill(now)
+        blocked = max(0, self.blocked_until - now)
+        if self.tokens >= 1:
+            return blocked
+        return max(blocked, (1 - self.tokens) / self.rate)
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def flood(self, seconds, now):
+        """Telegram said wait: honour it and slow this bucket down"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.rate = max(self.base_rate / 16, self.rate / 2)
+        self.tokens = 0
+
+    def succeed(self):
+        # Additive recovery towards the configured rate
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+
+class TelegramRateLimiter:
+    def __init__(self, global_rate, chat_rate, chat_burst, method_rates):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chats = {}
+        self.methods = {name: TokenBucket(rate, max(1, rate)) for name, rate in method_rates.items()}
+        self.urgent_waiting = 0  # high-priority calls currently waiting for tokens
+
+    def _buckets(self, chat, method):
+        buckets = [self.global_bucket]
+        if chat is not None:
+            bucket = self.chats.get(chat)
+            if bucket is None:
+                bucket = self.chats[chat] = TokenBucket(self.chat_rate, self.chat_burst)
+            buckets.append(bucket)
+        if method in self.methods:
+            buckets.append(self.methods[method])
+        return buckets
+
+    async def acquire(self, chat, method, low_priority=False):
+        buckets = self._buckets(chat, method)
+        if not low_priority:
+            self.urgent_waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                wait = max(b.wait_time(now) for b in buckets)
+                # Edits only go when no media send is queued up behind the limits
+                if low_priority and self.urgent_waiting:
+                    wait = max(wait, 0.05)
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.take(now)
+                    return buckets
+                await asyncio.sleep(wait)
+        finally:
+            if not low_priority:
+                self.urgent_waiting -= 1
+
+    def flood(self, buckets, seconds):
+        now = time.monotonic()
+        # Blame the narrowest bucket (per chat / per method), not everyone
+        target = buckets[1:] or buckets
+        for bucket in target:
+            bucket.flood(seconds, now)
+
+    def succeed(self, buckets):
+        for bucket in buckets:
+            bucket.succeed()
+
+    def prune(self, idle=600):
+        """Forget per-chat buckets that have been idle for a while"""
+        cutoff = time.monotonic() - idle
+        for chat in [c for c, b in self.chats.items() if b.updated < cutoff and b.rate == b.base_rate]:
+            del self.chats[chat]
+
+
+def _peer_id(data):
+    peer = getattr(data, 'peer', None) or getattr(data, 'to_peer', None)
+    if peer is None:
+        return None
+    for attr in ('user_id', 'chat_id', 'channel_id'):
+        value = getattr(peer, attr, None)
+        if value is not None:
+            return value
+    return 'self'
+
+
+def install(client, limiter=None):
+    """Route client's message-sending raw calls through the limiter
+
+    Safe to call again on the same client: it is only wrapped once.
+    """
+    if getattr(client, 'rate_limiter', None):
+        return client
+    limiter = limiter or telegram_limiter
+    raw_send = client.send
+
+    async def send(data, *args, **kwargs):
+        method = type(data).__name__
+        if method not in LIMITED_METHODS:
+            return await raw_send(data, *args, **kwargs)
+        # We handle every FloodWait ourselves so the limiter can learn from it
+        kwargs['sleep_threshold'] = 0
+        chat = _peer_id(data)
+        for attempt in range(MAX_FLOOD_RETRIES + 1):
+            buckets = await limiter.acquire(chat, method, method in LOW_PRIORITY_METHODS)
+            try:
+                result = await raw_send(data, *args, **kwargs)
+            except FloodWait as e:
+                print(f"FloodWait {e.x}s on {method} for chat {chat}")
+                limiter.flood(buckets, e.x)
+                if attempt == MAX_FLOOD_RETRIES:
+                    raise
+                continue
+            limiter.succeed(buckets)
+            if len(limiter.chats) > 1000:
+                limiter.prune()
+            return result
+
+    client.send = send
+    client.rate_limiter = limiter
+    return client
+
+
+telegram_limiter = TelegramRateLimiter(
+    Config.TG_GLOBAL_RATE,
+    Config.TG_CHAT_RATE,
+    Config.TG_CHAT_BURST,
+    {'EditMessage': Config.TG_EDIT_RATE}
+)
@@ -0,0 +1,133 @@
+"""
+Shortcode -> resolved media cache
+Keeps the CDN URLs, media types, owner and caption of recently resolved
+posts so repeat links skip Instagram until the signed URLs expire
+"""
+
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+from config import Config
+
+# Drop entries a little before the CDN signature runs out
+EXPIRY_MARGIN = 300
+
+
+def url_expiry(url):
+    """Expiry timestamp from a signed CDN URL's hex ``oe=`` parameter, or None"""
+    try:
+        oe = parse_qs(urlparse(url).query).get('oe')
+        return int(oe[0], 16) if oe else None
+    except ValueError:
+        return None
+
+
+def media_descriptor(shortcode, items, owner=None, caption=None):
+    """Build the cached description of a post from its (url, kind) items"""
+    expiries = [e for e in (url_expiry(url) for url, kind in items) if e]
+    if expiries:
+        expires = min(expiries) - EXPIRY_MARGIN
+    else:
+        expires = time.time() + Config.RESOLVE_CACHE_TTL
+    return {
+        'shortcode': shortcode,
+        'items': [list(item) for item in items],
+        'owner': owner,
+        'caption': caption,
+        'expires': expires,
+    }
+
+
+class ResolutionCache:
+    """LRU cache bounded by entry count and bytes, with optional SQLite backing"""
+
+    def __init__(self, max_entries, max_bytes, db_path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # shortcode -> (descriptor, size)
+        self.total_bytes = 0
+        self.db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS resolutions "
+                "(shortcode TEXT PRIMARY KEY, descriptor TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM resolutions WHERE expires <= ?", (time.time(),))
+            self.db.commit()
+
+    def get(self, shortcode):
+        """Return the live descriptor for a shortcode, or None"""
+        now = time.time()
+        cached = self.entries.get(shortcode)
+        if cached:
+            descriptor = cached[0]
+            if descriptor['expires'] > now:
+                self.entries.move_to_end(shortcode)
+                return descriptor
+            self._drop(shortcode)
+            return None
+
+        if self.db:
+            row = self.db.execute(
+                "SELECT descriptor FROM resolutions WHERE shortcode = ? AND expires > ?",
+                (shortcode, now)
+            ).fetchone()
+            if row:
+                descriptor = json.loads(row[0])
+                self._remember(shortcode, descriptor, row[0])
+                return descriptor
+        return None
+
+    def put(self, shortcode, descriptor):
+        """Cache a descriptor built by media_descriptor()"""
+        if descriptor['expires'] <= time.time():
+            return
+        encoded = json.dumps(descriptor)
+        if len(encoded) > self.max_bytes:
+            return  # would be evicted straight away, so don't persist it either
+        self._remember(shortcode, descriptor, encoded)
+        if self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO resolutions (shortcode, descriptor, expires) VALUES (?, ?, ?)",
+                (shortcode, encoded, descriptor['expires'])
+            )
+            self.db.commit()
+
+    def invalidate(self, shortcode):
+        """Forget a descriptor whose URLs stopped working before they expired"""
+        if shortcode in self.entries:
+            self._drop(shortcode)
+        elif self.db:
+            self.db.execute("DELETE FROM resolutions WHERE shortcode = ?", (shortcode,))
+            self.db.commit()
+
+    def _remember(self, shortcode, descriptor, encoded):
+        if shortcode in self.entries:
+            self._drop(shortcode, persistent=False)
+        size = len(encoded)
+        self.entries[shortcode] = (descriptor, size)
+        self.total_bytes += size
+        while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            # Only expiry and invalidate() delete rows; LRU just trims memory
+            oldest = next(iter(self.entries))
+            self._drop(oldest, persistent=False)
+
+    def _drop(self, shortcode, persistent=True):
+        descriptor, size = self.entries.pop(shortcode)
+        self.total_bytes -= size
+        if persistent and self.db:
+            self.db.execute("DELETE FROM resolutions WHERE shortcode = ?", (shortcode,))
+            self.db.commit()
+
+
+resolution_cache = ResolutionCache(
+    Config.RESOLVE_CACHE_ENTRIES,
+    Config.RESOLVE_CACHE_BYTES,
+    Config.RESOLVE_CACHE_DB or None
+)
@@ -0,0 +1,189 @@
+"""
+Pool of Instagram sessions
+Besides the primary loader (Config.L, the /login account) any number of
+saved Instaloader session files can be loaded. Each request goes to the
+least-loaded healthy session; rate-limited sessions sit out their
+governor backoff, checkpointed ones sit out a cool-down and are verified
+again before they come back, and requests for a private profile are
+pinned to a session that follows it.
+"""
+
+import glob
+import os
+import time
+from contextlib import asynccontextmanager
+
+from instaloader import Instaloader, Profile
+from instaloader.exceptions import AbortDownloadException, TooManyRequestsException
+
+from config import Config
+from ig_governor import governor, session_of, install
+from insta_executor import run_blocking
+from session_store import session_store
+
+
+class PooledSession:
+    def __init__(self, loader):
+        self.loader = loader
+        self.context = loader.context
+        self.in_flight = 0
+        self.checkpointed_until = None  # set while a checkpoint cools down
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def name(self):
+        return session_of(self.context)
+
+    @property
+    def logged_in(self):
+        return self.context.is_logged_in
+
+    @property
+    def checkpointed(self):
+        return self.checkpointed_until is not None
+
+    def healthy(self):
+        if self.checkpointed:
+            return False
+        return not governor.backing_off(self.name)
+
+    def load(self):
+        """In-flight requests plus graphql slots already booked ahead"""
+        booked = governor.slots.get((self.name, 'graphql'), ())
+        now = time.monotonic()
+        return self.in_flight + sum(1 for t in booked if t > now)
+
+
+class SessionPool:
+    def __init__(self):
+        self.sessions = []
+        self.pins = {}  # private target username -> session name that follows it
+
+    def add(self, loader):
+        install(loader)
+        session = PooledSession(loader)
+        self.sessions.append(session)
+        return session
+
+    def load_saved(self, directory):
+        """Load every ``session-<username>`` file Instaloader saved in directory"""
+        known = {s.name for s in self.sessions}
+        for path in sorted(glob.glob(os.path.join(directory, "session-*"))):
+            username = os.path.basename(path)[len("session-"):]
+            if not username or username in known:
+                continue
+            loader = Instaloader(quiet=True)
+            try:
+                loader.load_session_from_file(username, path)
+            except Exception as e:
+                print(f"Could not load session {path}: {e}")
+                continue
+            self.add(loader)
+            known.add(username)
+            print(f"✅ Session pool: loaded {username}")
+
+    @property
+    def primary(self):
+        return self.sessions[0]
+
+    async def _recheck(self):
+        """Verify checkpointed sessions whose cool-down is over"""
+        now = time.monotonic()
+        for session in self.sessions:
+            if not session.checkpointed or session.checkpointed_until > now:
+                continue
+            name = session.name
+            # Pushed forward first so concurrent picks don't verify it twice
+            session.checkpointed_until = now + Config.SESSION_CHECKPOINT_COOLDOWN
+            try:
+                alive = await session_store.verify(session.loader, name)
+            except Exception as e:
+                print(f"Session {name} still failing its check: {e}")
+                continue
+            # A dead login was reset to anonymous by verify(): usable either way
+            session.checkpointed_until = None
+            print(f"✅ Session {name} back in rotation{'' if alive else ' (logged out)'}")
+
+    def _candidates(self, logged_in=False):
+        pool = [s for s in self.sessions if s.healthy() and (s.logged_in or not logged_in)]
+        return sorted(pool, key=lambda s: s.load())
+
+    async def _follower_of(self, target):
+        """A healthy logged-in session that follows a private target, or None"""
+        pinned = self.pins.get(target.lower())
+        for session in self._candidates(logged_in=True):
+            if session.name == pinned:
+                return session
+        for session in self._candidates(logged_in=True):
+            if session is self.primary:
+                continue  # callers only ask once the primary's own view says no
+            try:
+                profile = await run_blocking(Profile.from_username, session.context, target)
+            except Exception as e:
+                print(f"Session {session.name} can't see {target}: {e}")
+                continue
+            if not profile.is_private or profile.followed_by_viewer:
+                self.pins[target.lower()] = session.name
+                return session
+        return None
+
+    async def follows(self, target):
+        """Whether any session in the pool can see a private target"""
+        return await self._follower_of(target) is not None
+
+    async def pick(self, target=None, private=False, logged_in=False, own=False):
+        """Choose a session; ``private`` targets are pinned to a follower
+
+        ``own`` requests (feed, saved posts, all stories) always belong to
+        the primary account.
+        """
+        await self._recheck()
+        if own:
+            return self.primary
+        if target and private:
+            session = await self._follower_of(target)
+            if session:
+                return session
+        candidates = self._candidates(logged_in=logged_in)
+        # Nothing healthy: fall back to the primary and let the governor queue us
+        return candidates[0] if candidates else self.primary
+
+    @asynccontextmanager
+    async def use(self, target=None, private=False, logged_in=False, own=False):
+        """``async with pool.use(...) as session`` - tracks load and health"""
+        session = await self.pick(target, private, logged_in, own)
+        session.in_flight += 1
+        session.requests += 1
+        try:
+            yield session
+        except Exception as e:
+            self.report(session, e)
+            raise
+        finally:
+            session.in_flight -= 1
+
+    def report(self, session, error):
+        """Update a session's state after a failed request"""
+        session.errors += 1
+        text = str(error).lower()
+        if isinstance(error, TooManyRequestsException) or "429" in text or "please wait" in text:
+            governor.throttled(session.name)
+        elif isinstance(error, AbortDownloadException):
+            # Instaloader's explicit checkpoint/challenge/logged-out signal;
+            # LoginRequiredException also means "private or unavailable target"
+            session.checkpointed_until = time.monotonic() + Config.SESSION_CHECKPOINT_COOLDOWN
+            self.pins = {t: s for t, s in self.pins.items() if s != session.name}
+            print(f"⚠️ Session {session.name} hit a checkpoint, out of rotation for a while")
+
+    def summary(self):
+        return [
+            f"{s.name}: {'✅' if s.healthy() else '⛔'} load {s.load()}, {s.requests} requests, {s.errors} errors"
+            for s in self.sessions
+        ]
+
+
+session_pool = SessionPool()
+session_pool.add(Config.L)
+if Config.SESSION_DIR:
+    session_pool.load_saved(Config.SESSION_DIR)
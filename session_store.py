@@ -0,0 +1,195 @@
+"""
+Persistent store for Instagram sessions
+A session (Instaloader's cookie dict) is kept in a local SQLite table and,
+because Heroku's disk doesn't survive a restart, also as a Telegram
+document whose file_id does. At startup the session is restored from the
+first backend that has it, so there is no login round trip, and a
+background task re-checks it and saves cookies Instagram has rotated.
+"""
+
+import asyncio
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+
+from config import Config
+from insta_executor import run_blocking
+
+
+class SQLiteSessionBackend:
+    """username -> cookies (+ the file_id of the latest Telegram copy)"""
+
+    def __init__(self, db_path):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "username TEXT PRIMARY KEY, cookies TEXT, file_id TEXT, saved_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def load(self, username):
+        row = self.db.execute("SELECT cookies FROM sessions WHERE username = ?", (username,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save(self, username, cookies):
+        self.db.execute(
+            "INSERT INTO sessions (username, cookies, saved_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET cookies = excluded.cookies, saved_at = excluded.saved_at",
+            (username, json.dumps(cookies, sort_keys=True), time.time())
+        )
+        self.db.commit()
+
+    def file_id(self, username):
+        row = self.db.execute("SELECT file_id FROM sessions WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def set_file_id(self, username, file_id):
+        self.db.execute(
+            "INSERT INTO sessions (username, file_id, saved_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET file_id = excluded.file_id",
+            (username, file_id, time.time())
+        )
+        self.db.commit()
+
+    def forget(self, username):
+        self.db.execute("DELETE FROM sessions WHERE username = ?", (username,))
+        self.db.commit()
+
+
+class TelegramSessionBackend:
+    """Session files kept as documents in a Telegram chat, addressed by file_id
+
+    The files use Instaloader's own session file format (a pickled cookie
+    dict), so a document sent by an older /login still restores.
+    """
+
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+
+    async def load(self, client, file_id):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = await client.download_media(file_id, file_name=os.path.join(tmp, "session"))
+            if not path:
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+
+    async def save(self, client, username, cookies, caption):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, username)
+            with open(path, 'wb') as f:
+                pickle.dump(cookies, f)
+            sent = await client.send_document(
+                self.chat_id, path, file_name=username, caption=caption, disable_notification=True
+            )
+        return sent.document.file_id
+
+
+class SessionStore:
+    def __init__(self, local, telegram, default_file_id=None, refresh_interval=21600):
+        self.local = local
+        self.telegram = telegram
+        self.default_file_id = default_file_id  # INSTA_SESSIONFILE_ID from the environment
+        self.refresh_interval = refresh_interval
+        self.refreshers = {}
+
+    async def restore(self, loader, username, client=None):
+        """Load a saved session into loader; True if one was found
+
+        The local store is tried first; with a client the Telegram copy
+        is the fallback, and is cached locally once downloaded.
+        """
+        if not username:
+            return False
+        cookies = self.local.load(username)
+        source = "local store"
+        if cookies is None and client:
+            file_id = self.local.file_id(username) or self.default_file_id
+            if file_id:
+                try:
+                    cookies = await self.telegram.load(client, file_id)
+                    source = "Telegram"
+                except Exception as e:
+                    print(f"Could not fetch session file from Telegram: {e}")
+            if cookies:
+                self.local.save(username, cookies)
+        if not cookies:
+            return False
+        try:
+            loader.load_session(username, cookies)
+        except Exception as e:
+            print(f"❌ Saved session for {username} is unusable: {e}")
+            return False
+        print(f"✅ Instagram session for {username} restored from {source}")
+        return True
+
+    async def verify(self, loader, username):
+        """Check a restored session with Instagram; forget it if it is dead"""
+        if await run_blocking(loader.test_login):
+            return True
+        print(f"⚠️ Saved session for {username} has expired, a new /login is needed")
+        self.forget(username)
+        # Don't keep sending the dead cookies with anonymous requests
+        loader.context._session = loader.context.get_anonymous_session()
+        loader.context.username = None
+        return False
+
+    async def save(self, loader, client=None, upload=True):
+        """Persist loader's current session; returns the new Telegram file_id, if uploaded"""
+        username = loader.context.username
+        cookies = loader.save_session()
+        self.local.save(username, cookies)
+        if not (client and upload):
+            return None
+        file_id = await self.telegram.save(
+            client, username, cookies, "⚠️ KEEP THIS SESSION FILE SAFE AND DO NOT SHARE WITH ANYBODY"
+        )
+        self.local.set_file_id(username, file_id)
+        return file_id
+
+    def forget(self, username):
+        self.local.forget(username)
+        refresher = self.refreshers.pop(username, None)
+        if refresher:
+            refresher.cancel()
+
+    async def refresh(self, loader, client=None):
+        """Check the session still works and save it again if cookies changed"""
+        username = loader.context.username
+        try:
+            alive = await run_blocking(loader.test_login)
+        except Exception as e:
+            print(f"Session check for {username} failed: {e}")
+            return
+        if not alive:
+            print(f"⚠️ Instagram session for {username} has expired, /login again")
+            return
+        if loader.save_session() != self.local.load(username):
+            # Only rotated cookies are worth a new Telegram copy
+            await self.save(loader, client)
+
+    def start_refresh(self, loader, client=None):
+        """Keep refreshing loader's session in the background"""
+        username = loader.context.username
+        if not username or username in self.refreshers:
+            return
+
+        async def refresher():
+            while True:
+                await asyncio.sleep(self.refresh_interval)
+                await self.refresh(loader, client)
+
+        self.refreshers[username] = asyncio.ensure_future(refresher())
+
+
+session_store = SessionStore(
+    SQLiteSessionBackend(Config.SESSION_DB or ":memory:"),
+    TelegramSessionBackend(int(Config.OWNER)),
+    Config.INSTA_SESSIONFILE_ID,
+    Config.SESSION_REFRESH_INTERVAL
+)
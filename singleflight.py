@@ -0,0 +1,22 @@
+"""
+Single-flight de-duplication of concurrent async calls
+While a call for a key is running, later callers with the same key await
+its result instead of starting their own
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await ``fn(*args, **kwargs)``, sharing one call per key at a time"""
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn(*args, **kwargs))
+            self.calls[key] = future
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+        # shield: one impatient caller must not cancel the call for the others
+        return await asyncio.shield(future)
@@ -0,0 +1,204 @@
+"""
+Persistent follower / followee snapshots with delta sync
+Each list is kept per profile id as a packed array of user ids plus an
+append-only log of diffs against it. A sync pages the list newest-first
+and stops as soon as it reaches the known tail and the counts add up, so
+a repeated /followers costs a few pages instead of the whole list. Every
+few syncs the whole list is paged anyway, since an unfollow and a follow
+deep in the list leave the counts unchanged
+"""
+
+import os
+import sqlite3
+import struct
+import threading
+import time
+from array import array
+
+from config import Config
+
+DELTA_HEADER = struct.Struct("<dII")  # timestamp, added count, removed count
+TAIL_MATCH = 3                        # consecutive known ids that mark the tail
+
+
+class SyncResult:
+    def __init__(self, ids, added, removed, first_run, fetched):
+        self.ids = ids              # current list, newest first
+        self.added = added
+        self.removed = removed
+        self.first_run = first_run  # there was no snapshot to diff against
+        self.fetched = fetched      # entries actually paged from Instagram
+
+
+def _apply(ids, added, removed):
+    """New list order: fresh ids on top, the rest as before"""
+    skip = set(removed)
+    skip.update(added)
+    return list(added) + [i for i in ids if i not in skip]
+
+
+class SnapshotStore:
+    """``{userid}_{kind}.ids`` base arrays plus ``.delta`` logs, usernames in SQLite"""
+
+    def __init__(self, directory, compact_after=20, full_sync_every=10):
+        self.directory = directory
+        self.compact_after = compact_after
+        self.full_sync_every = full_sync_every
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "usernames.db"), check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS usernames (id INTEGER PRIMARY KEY, username TEXT NOT NULL)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS partial_syncs "
+            "(userid INTEGER NOT NULL, kind TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (userid, kind))"
+        )
+        self.db.commit()
+
+    def _path(self, userid, kind, ext):
+        return os.path.join(self.directory, f"{userid}_{kind}.{ext}")
+
+    def _read_deltas(self, path):
+        deltas = []
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return deltas
+        offset = 0
+        while offset + DELTA_HEADER.size <= len(data):
+            _, n_added, n_removed = DELTA_HEADER.unpack_from(data, offset)
+            offset += DELTA_HEADER.size
+            ids = array("q")
+            ids.frombytes(data[offset:offset + 8 * (n_added + n_removed)])
+            offset += 8 * (n_added + n_removed)
+            if len(ids) != n_added + n_removed:
+                break  # torn write at the end of the log
+            deltas.append((ids[:n_added], ids[n_added:]))
+        return deltas
+
+    def load(self, userid, kind):
+        """Return the stored id list (newest first), or None"""
+        with self.lock:
+            return self._load(userid, kind)[0]
+
+    def _load(self, userid, kind):
+        base = array("q")
+        try:
+            with open(self._path(userid, kind, "ids"), "rb") as f:
+                base.frombytes(f.read())
+        except OSError:
+            return None, 0
+        deltas = self._read_deltas(self._path(userid, kind, "delta"))
+        ids = list(base)
+        for added, removed in deltas:
+            ids = _apply(ids, added, removed)
+        return ids, len(deltas)
+
+    def _write_base(self, userid, kind, ids):
+        path = self._path(userid, kind, "ids")
+        with open(path + ".tmp", "wb") as f:
+            array("q", ids).tofile(f)
+        os.replace(path + ".tmp", path)
+        try:
+            os.remove(self._path(userid, kind, "delta"))
+        except OSError:
+            pass
+
+    def _append_delta(self, userid, kind, added, removed):
+        with open(self._path(userid, kind, "delta"), "ab") as f:
+            f.write(DELTA_HEADER.pack(time.time(), len(added), len(removed)))
+            array("q", list(added) + list(removed)).tofile(f)
+
+    def _remember_names(self, names):
+        if names:
+            self.db.executemany("INSERT OR REPLACE INTO usernames (id, username) VALUES (?, ?)", names.items())
+            self.db.commit()
+
+    def _partial_syncs(self, userid, kind):
+        row = self.db.execute(
+            "SELECT count FROM partial_syncs WHERE userid = ? AND kind = ?", (userid, kind)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _count_sync(self, userid, kind, complete):
+        count = 0 if complete else self._partial_syncs(userid, kind) + 1
+        self.db.execute(
+            "INSERT OR REPLACE INTO partial_syncs (userid, kind, count) VALUES (?, ?, ?)", (userid, kind, count)
+        )
+        self.db.commit()
+
+    def usernames(self, ids):
+        """Usernames for ids, in order (unknown ids are skipped)"""
+        names = {}
+        with self.lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self.db.execute(
+                    f"SELECT id, username FROM usernames WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                names.update(rows)
+        return [names[i] for i in ids if i in names]
+
+    def iter_usernames(self, ids, chunk_size=500):
+        """usernames() a chunk at a time, for lists too long to hold as strings"""
+        for start in range(0, len(ids), chunk_size):
+            yield from self.usernames(ids[start:start + chunk_size])
+
+    def sync(self, profile, kind):
+        """Page ``profile``'s followers or followees and store the delta (blocking)"""
+        if kind == "followers":
+            nodes, expected = profile.get_followers(), profile.followers
+        else:
+            nodes, expected = profile.get_followees(), profile.followees
+
+        with self.lock:
+            old, log_length = self._load(profile.userid, kind)
+            full_walk = self._partial_syncs(profile.userid, kind) + 1 >= self.full_sync_every
+        position = {uid: i for i, uid in enumerate(old)} if old else {}
+
+        head = []
+        seen = set()
+        names = {}
+        # A due full walk never checks the tail, so it pages the whole list
+        run, last_index, tail_checked = 0, None, full_walk
+        complete = True
+        for node in nodes:
+            uid = node.userid
+            head.append(uid)
+            seen.add(uid)
+            names[uid] = node.username
+            index = position.get(uid)
+            if index is None:
+                run, last_index = 0, None
+                continue
+            run = run + 1 if last_index is not None and index == last_index + 1 else 1
+            last_index = index
+            if run >= TAIL_MATCH and not tail_checked:
+                # Only try once: a mismatch means changes deeper down the list
+                tail_checked = True
+                rest = len(old) - index - 1 - sum(1 for s in seen if position.get(s, -1) > index)
+                if len(head) + rest == expected:
+                    complete = False
+                    break
+
+        if old is None:
+            ids, added, removed = head, head, []
+        else:
+            added = [uid for uid in head if uid not in position]
+            # After an early stop only the paged part of the old list can have gone
+            checked = old if complete else old[:last_index + 1]
+            removed = [uid for uid in checked if uid not in seen]
+            ids = _apply(old, added, removed)
+
+        with self.lock:
+            self._remember_names(names)
+            if old is None or log_length >= self.compact_after:
+                self._write_base(profile.userid, kind, ids)
+            elif added or removed:
+                self._append_delta(profile.userid, kind, added, removed)
+            self._count_sync(profile.userid, kind, complete)
+
+        return SyncResult(ids, added, removed, old is None, len(head))
+
+
+snapshot_store = SnapshotStore(Config.SNAPSHOT_DIR, full_sync_every=Config.SNAPSHOT_FULL_SYNC_EVERY)
@@ -0,0 +1,130 @@
+"""
+Happy-eyeballs style race between media resolution strategies
+Strategies start in adaptive order with staggered starts, the first one
+that returns usable media wins and the rest are cancelled
+"""
+
+import asyncio
+import time
+
+from config import Config
+
+
+class StrategyStats:
+    """Win rate and latency of each strategy, used to order future races"""
+
+    def __init__(self):
+        self.stats = {}
+
+    def _entry(self, name):
+        return self.stats.setdefault(name, {'attempts': 0, 'wins': 0, 'latency': 0.0})
+
+    def record(self, name, won, latency):
+        entry = self._entry(name)
+        entry['attempts'] += 1
+        if won:
+            entry['wins'] += 1
+            # Exponential moving average of time-to-media for winning runs
+            if entry['latency']:
+                entry['latency'] = 0.8 * entry['latency'] + 0.2 * latency
+            else:
+                entry['latency'] = latency
+
+    def win_rate(self, name):
+        entry = self._entry(name)
+        # Laplace smoothing keeps untried strategies in contention
+        return (entry['wins'] + 1) / (entry['attempts'] + 2)
+
+    def order(self, names):
+        """Sort strategy names best-first; ties keep the given order"""
+        return sorted(names, key=lambda n: (-self.win_rate(n), self._entry(n)['latency']))
+
+    def summary(self):
+        return {
+            name: f"{entry['wins']}/{entry['attempts']} wins, {entry['latency']:.2f}s"
+            for name, entry in self.stats.items()
+        }
+
+
+stats = StrategyStats()
+
+
+async def race(strategies, stagger=None, accept=None):
+    """Run (name, coroutine_function) strategies as a staggered race
+
+    Each coroutine function returns ``(result, message)``; the first one
+    with a truthy result wins. The next strategy starts when the stagger
+    delay elapses or as soon as a running one fails.
+    ``accept(result)``, when given, is awaited on each would-be winner
+    (e.g. to download its media) while the others keep running; a falsy
+    answer counts as a failure and the race goes on without it.
+    Returns ``(name, result, message)`` - with ``accept``, the result is
+    what it returned - or ``(None, None, message)`` when every strategy
+    failed.
+    """
+    stagger = Config.RACE_STAGGER if stagger is None else stagger
+    by_name = dict(strategies)
+    pending_names = stats.order(list(by_name))
+    running = {}
+    started = {}
+    last_message = "No strategies available"
+
+    def launch():
+        name = pending_names.pop(0)
+        started[name] = time.monotonic()
+        running[asyncio.ensure_future(by_name[name]())] = name
+
+    try:
+        launch()
+        while running:
+            timeout = stagger if pending_names else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                launch()
+                continue
+
+            for task in done:
+                name = running.pop(task)
+                latency = time.monotonic() - started[name]
+                result, message = _outcome(name, task)
+                if result and accept:
+                    try:
+                        result = await accept(result)
+                    except Exception as e:
+                        result = None
+                        print(f"{name} result rejected: {e}")
+                    if not result:
+                        message = f"{name} found media but could not fetch it"
+                if result:
+                    stats.record(name, True, latency)
+                    return name, result, message
+                stats.record(name, False, latency)
+                last_message = message
+
+            # A failure frees a slot: start the next strategy immediately
+            if pending_names:
+                launch()
+    finally:
+        for task, name in running.items():
+            latency = time.monotonic() - started[name]
+            if task.done() and not task.cancelled():
+                # Finished alongside the winner: record how it really went;
+                # media that accept() never checked is neither win nor loss
+                result, _ = _outcome(name, task)
+                if not result:
+                    stats.record(name, False, latency)
+                elif not accept:
+                    stats.record(name, True, latency)
+            else:
+                # Cut off before it could answer: says nothing about the strategy
+                task.cancel()
+
+    return None, None, last_message
+
+
+def _outcome(name, task):
+    try:
+        return task.result()
+    except Exception as e:
+        return None, f"{name} error: {e}"
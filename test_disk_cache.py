@@ -0,0 +1,74 @@
+"""Tests for disk_cache.MediaCache"""
+
+import os
+import shutil
+import time
+
+from disk_cache import MediaCache, media_key
+
+CDN = "https://scontent.cdninstagram.com/v/t51.2885-15"
+
+
+def _file(directory, name, size=1000):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return path
+
+
+def test_media_key_ignores_signature_not_variant():
+    assert media_key(f"{CDN}/1_n.jpg?stp=s640x640&oe=AAA") == media_key(f"{CDN}/1_n.jpg?stp=s640x640&oe=BBB")
+    assert media_key(f"{CDN}/1_n.jpg?stp=s640x640") != media_key(f"{CDN}/1_n.jpg")
+    assert media_key(f"//scontent.cdninstagram.com/v/t51.2885-15/1_n.jpg") == media_key(f"{CDN}/1_n.jpg")
+
+
+def test_lru_eviction_and_restart(tmp_path):
+    root = str(tmp_path)
+    cache = MediaCache(os.path.join(root, "cache"), 2500)
+    jobs = os.path.join(root, "job")
+    os.makedirs(jobs)
+    for name in ("a", "b"):
+        cache.store(name, _file(jobs, name))
+        time.sleep(0.01)
+
+    # A hit refreshes "a", so "b" is the least recently used entry
+    assert cache.link_into("a", os.path.join(jobs, "a2"))
+    assert cache.link_into("a", os.path.join(jobs, "a2")), "an existing dest must not evict"
+    cache.store("c", _file(jobs, "c"))
+    assert list(cache.entries) == ["a", "c"] and cache.total_bytes == 2000
+    assert not cache.link_into("b", os.path.join(jobs, "b2"))
+
+    # Removing the job directory leaves the cache intact
+    shutil.rmtree(jobs)
+    reopened = MediaCache(os.path.join(root, "cache"), 2500)
+    assert sorted(reopened.entries) == ["a", "c"] and reopened.total_bytes == 2000
+
+
+def test_bad_dest_keeps_entry(tmp_path):
+    cache = MediaCache(str(tmp_path / "cache"), 10000)
+    cache.store("a", _file(str(tmp_path), "a"))
+    assert not cache.link_into("a", str(tmp_path / "missing" / "a2"))
+    assert "a" in cache.entries
+
+
+def test_file_removed_behind_our_back(tmp_path):
+    cache = MediaCache(str(tmp_path / "cache"), 10000)
+    cache.store("a", _file(str(tmp_path), "a"))
+    os.remove(cache._path("a"))
+    assert not cache.link_into("a", str(tmp_path / "a2"))
+    assert "a" not in cache.entries and cache.total_bytes == 0
+
+
+def test_leftover_tmp_files_are_removed(tmp_path):
+    directory = tmp_path / "cache" / "ab"
+    directory.mkdir(parents=True)
+    (directory / "abcdef.123.tmp").write_bytes(b"partial")
+    cache = MediaCache(str(tmp_path / "cache"), 10000)
+    assert not cache.entries
+    assert not os.listdir(directory)
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = MediaCache(str(tmp_path / "cache"), 0)
+    cache.store("a", _file(str(tmp_path), "a"))
+    assert not cache.entries and not os.path.exists(tmp_path / "cache")
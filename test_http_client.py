@@ -0,0 +1,71 @@
+"""Tests for http_client.download_to_file partial-file handling"""
+
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import http_client
+
+URL = "https://scontent.cdninstagram.com/v/t51.2885-15/1_n.jpg"
+
+
+class _Body(httpx.AsyncByteStream):
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+def _download(handler, filename, **kwargs):
+    async def run():
+        http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await http_client.download_to_file(URL, filename, **kwargs)
+        finally:
+            await http_client.close_client()
+    return asyncio.run(run())
+
+
+def test_complete_download_replaces_part(tmp_path):
+    filename = str(tmp_path / "media.jpg")
+    assert _download(lambda request: httpx.Response(200, stream=_Body([b"x" * 10])), filename)
+    assert open(filename, 'rb').read() == b"x" * 10
+    assert not os.path.exists(filename + '.part')
+
+
+def test_stale_part_is_not_resumed(tmp_path):
+    filename = str(tmp_path / "media.jpg")
+    with open(filename + '.part', 'wb') as f:
+        f.write(b"other url")
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get('Range'))
+        return httpx.Response(200, stream=_Body([b"fresh"]))
+
+    assert _download(handler, filename)
+    assert seen == [None]
+    assert open(filename, 'rb').read() == b"fresh"
+
+
+def test_cap_abort_removes_part(tmp_path):
+    filename = str(tmp_path / "media.jpg")
+    handler = lambda request: httpx.Response(200, stream=_Body([b"x" * 8, b"x" * 8]))
+    assert not _download(handler, filename, max_bytes=10)
+    assert not os.path.exists(filename + '.part')
+
+
+def test_unexpected_error_removes_part(tmp_path):
+    filename = str(tmp_path / "media.jpg")
+    handler = lambda request: httpx.Response(200, stream=_Body([b"x" * 8], OSError("disk full")))
+    with pytest.raises(OSError):
+        _download(handler, filename)
+    assert not os.path.exists(filename + '.part')
+    assert not os.path.exists(filename)
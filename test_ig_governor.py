@@ -0,0 +1,92 @@
+"""Tests for ig_governor budgets, backoff and the Instaloader hooks"""
+
+import time
+
+import pytest
+from instaloader import Instaloader
+
+import ig_governor
+from ig_governor import Budget, GovernedRateController, InstagramGovernor, endpoint_class, install, lane
+
+
+def _governor(count=100, window=60, spacing=0, base=0.01, cap=10):
+    budgets = {name: Budget(count, window, spacing) for name in ('graphql', 'web', 'cdn')}
+    return InstagramGovernor(budgets, base, cap)
+
+
+def test_endpoint_classes_and_lanes():
+    assert endpoint_class("https://www.instagram.com/graphql/query/?x=1") == 'graphql'
+    assert endpoint_class("https://i.instagram.com/api/v1/media/1/info/") == 'graphql'
+    assert endpoint_class("https://www.instagram.com/p/ABC123/embed/") == 'web'
+    assert endpoint_class("https://scontent-lhr8-1.cdninstagram.com/v/1_n.jpg") == 'cdn'
+    assert lane('graphql') == lane('web') == 'api' and lane('cdn') == 'cdn'
+
+
+def test_budget_spacing_and_window():
+    governor = _governor(count=3, window=10, spacing=1)
+    delays = [governor.reserve('graphql') for _ in range(4)]
+    assert delays[0] == pytest.approx(0, abs=0.01)
+    assert delays[1] == pytest.approx(1, abs=0.01)
+    assert delays[2] == pytest.approx(2, abs=0.01)
+    # Fourth request: the window is full until the first slot falls out
+    assert delays[3] == pytest.approx(10, abs=0.01)
+    # Budgets are per session and endpoint class
+    assert governor.reserve('graphql', 'someone') == pytest.approx(0, abs=0.01)
+    assert governor.reserve('cdn') == pytest.approx(0, abs=0.01)
+
+
+def test_backoff_escalates_and_decays():
+    governor = _governor()
+    levels = []
+    for _ in range(5):
+        governor.throttled("someone")
+        time.sleep(governor.backing_off("someone") + 0.01)
+        levels.append(governor.backoff[("someone", "api")][1])
+    assert levels == [1, 2, 3, 4, 5], f"backoff did not escalate: {levels}"
+
+    governor.succeeded("someone")
+    assert governor.backoff[("someone", "api")][1] == 4
+
+
+def test_backoff_does_not_stack_and_honours_retry_after():
+    governor = _governor(base=1)
+    first = governor.throttled(retry_after=5)
+    assert first >= 5
+    assert governor.throttled() <= first
+    assert governor.backoff[("anonymous", "api")][1] == 1
+    assert governor.reserve('web') >= 4.9, "slots wait out the backoff"
+
+
+def test_cdn_lane_is_separate():
+    governor = _governor()
+    governor.throttled(endpoint='cdn')
+    assert governor.backing_off(endpoint='cdn') > 0
+    assert governor.backing_off() == 0, "a CDN 429 must not stall page fetches"
+
+
+def test_install_counts_only_outermost_success(monkeypatch):
+    governor = _governor()
+    monkeypatch.setattr(ig_governor, 'governor', governor)
+    loader = Instaloader(quiet=True)
+    calls = []
+
+    def get_json(path, params, _attempt=1):
+        calls.append(_attempt)
+        if _attempt < 3:
+            # Instaloader retries a 429 through context.get_json itself
+            return loader.context.get_json(path, params, _attempt=_attempt + 1)
+        return {}
+
+    loader.context.get_json = get_json
+    install(loader)
+    assert install(loader) is loader
+    assert isinstance(loader.context._rate_controller, GovernedRateController)
+
+    governor.backoff[("anonymous", "api")] = (0, 3)
+    loader.context.get_json("graphql/query", {})
+    assert calls == [1, 2, 3]
+    assert governor.backoff[("anonymous", "api")][1] == 2, "one request, one success"
+
+    # Sending the next query must not count as a success either
+    loader.context._rate_controller.wait_before_query('other')
+    assert governor.backoff[("anonymous", "api")][1] == 2
@@ -0,0 +1,127 @@
+"""Tests for job_queue.JobQueue scheduling"""
+
+import asyncio
+
+import pytest
+
+from job_queue import JobQueue, QueueFull
+
+
+def _job(log, name, result=True):
+    async def download():
+        log.append(('download', name))
+        await asyncio.sleep(0)
+        return result
+
+    async def upload(value):
+        log.append(('upload', name))
+
+    def cleanup():
+        log.append(('cleanup', name))
+
+    return download, upload, cleanup
+
+
+async def _drain(log, count):
+    async def finished():
+        while sum(1 for event, _ in log if event == 'cleanup') < count:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(finished(), 5)
+
+
+def _stop(queue):
+    for worker in queue.workers:
+        worker.cancel()
+
+
+def test_round_robin_between_users():
+    async def run():
+        queue = JobQueue(1, 1, 10, 5)
+        log = []
+        positions = []
+        # One worker: the first job starts, the rest wait their turn
+        positions.append(queue.submit('a', *_job(log, 'a1')))
+        await asyncio.sleep(0)
+        for name in ('a2', 'a3', 'b1', 'c1', 'b2'):
+            positions.append(queue.submit(name[0], *_job(log, name)))
+        await _drain(log, 6)
+        _stop(queue)
+        return positions, [name for event, name in log if event == 'download']
+
+    positions, order = asyncio.run(run())
+    # Positions as of submission: b1 overtakes a3, b2 waits for the next round
+    assert positions == [0, 1, 2, 2, 3, 5]
+    assert order == ['a1', 'a2', 'b1', 'c1', 'a3', 'b2']
+
+
+def test_per_user_and_total_caps():
+    async def run():
+        queue = JobQueue(1, 1, 4, 2)
+        log = []
+        queue.submit('a', *_job(log, 'a1'))
+        queue.submit('a', *_job(log, 'a2'))
+        with pytest.raises(QueueFull):
+            queue.submit('a', *_job(log, 'a3'))
+        queue.submit('b', *_job(log, 'b1'))
+        queue.submit('c', *_job(log, 'c1'))
+        with pytest.raises(QueueFull):
+            queue.submit('d', *_job(log, 'd1'))
+        await _drain(log, 4)
+        # Finished jobs give the user their share back
+        assert not queue.active
+        queue.submit('a', *_job(log, 'a3'))
+        await _drain(log, 5)
+        _stop(queue)
+
+    asyncio.run(run())
+
+
+def test_failed_download_skips_upload_and_cleans_up():
+    async def run():
+        queue = JobQueue(1, 1, 10, 5)
+        log = []
+        errors = []
+
+        async def broken():
+            raise RuntimeError("gone")
+
+        async def on_error(error):
+            errors.append(str(error))
+
+        _, upload, cleanup = _job(log, 'x')
+        queue.submit('a', broken, upload, cleanup, on_error=on_error)
+        queue.submit('a', *_job(log, 'empty', result=None))
+        await _drain(log, 2)
+        _stop(queue)
+        return log, errors
+
+    log, errors = asyncio.run(run())
+    assert ('upload', 'x') not in log and ('upload', 'empty') not in log
+    assert errors == ['gone']
+
+
+def test_submit_when_ready_waits_for_the_users_share():
+    async def run():
+        queue = JobQueue(2, 1, 10, 1)
+        log = []
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return True
+
+        _, upload, cleanup = _job(log, 'first')
+        queue.submit('a', slow, upload, cleanup)
+        with pytest.raises(QueueFull):
+            queue.submit('a', *_job(log, 'second'))
+
+        waiting = asyncio.ensure_future(queue.submit_when_ready('a', *_job(log, 'second')))
+        await asyncio.sleep(0.05)
+        assert not waiting.done(), "must wait while the user's share is taken"
+        release.set()
+        await asyncio.wait_for(waiting, 5)
+        await _drain(log, 2)
+        _stop(queue)
+        return [name for event, name in log if event == 'cleanup']
+
+    assert asyncio.run(run()) == ['first', 'second']
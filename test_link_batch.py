@@ -0,0 +1,99 @@
+"""Tests for link_batch.fetch_links against a local job queue"""
+
+import asyncio
+import os
+
+import link_batch
+from file_id_cache import FileIdIndex
+from job_queue import JobQueue
+from url_router import find_links
+
+
+class _Sent:
+    def __init__(self, file_id):
+        self.photo = type("Photo", (), {"file_id": file_id})()
+
+
+class _Client:
+    async def send_photo(self, chat_id, photo, caption=None):
+        return _Sent(os.path.basename(photo))
+
+
+class _Message:
+    def __init__(self):
+        self.chat = type("Chat", (), {"id": 1})()
+        self.from_user = type("User", (), {"id": 7})()
+        self.text = ""
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+
+
+def _links(count):
+    return find_links(" ".join(f"https://instagram.com/p/LINK{i}x/" for i in range(count)))
+
+
+async def _download(link, temp_dir, say):
+    await asyncio.sleep(0.01)
+    with open(os.path.join(temp_dir, f"{link.shortcode}.jpg"), 'wb') as f:
+        f.write(b"x" * 10)
+    return True
+
+
+def _setup(monkeypatch, per_user):
+    queue = JobQueue(2, 2, 50, per_user)
+    monkeypatch.setattr(link_batch, 'jobs', queue)
+    monkeypatch.setattr(link_batch, 'file_id_index', FileIdIndex(":memory:", 100))
+    return queue
+
+
+def test_links_beyond_the_users_share_wait_instead_of_failing(monkeypatch):
+    queue = _setup(monkeypatch, per_user=2)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def busy():
+            await release.wait()
+
+        # The user already has a job of their own in the queue
+        queue.submit(7, busy, None)
+        batch_task = asyncio.ensure_future(
+            link_batch.fetch_links(_Client(), _Message(), _Message(), _links(5), _download)
+        )
+        await asyncio.sleep(0.1)
+        release.set()
+        batch = await asyncio.wait_for(batch_task, 5)
+        for worker in queue.workers:
+            worker.cancel()
+        return batch
+
+    batch = asyncio.run(run())
+    assert set(batch.states.values()) == {'done'}
+    assert batch.files == 5
+
+
+def test_failing_status_update_does_not_hang_the_batch(monkeypatch):
+    queue = _setup(monkeypatch, per_user=5)
+    update = link_batch.BatchStatus.update
+
+    async def flaky_update(self, link, state, files=0, note=None):
+        await update(self, link, state, files, note)
+        if state == 'failed':
+            raise RuntimeError("message to edit not found")
+
+    monkeypatch.setattr(link_batch.BatchStatus, 'update', flaky_update)
+
+    async def nothing(link, temp_dir, say):
+        return False
+
+    async def run():
+        batch = await asyncio.wait_for(
+            link_batch.fetch_links(_Client(), _Message(), _Message(), _links(2), nothing), 5
+        )
+        for worker in queue.workers:
+            worker.cancel()
+        return batch
+
+    batch = asyncio.run(run())
+    assert set(batch.states.values()) == {'failed'}
@@ -0,0 +1,75 @@
+"""Tests for page_extractor.extract_media on synthetic pages"""
+
+import json
+
+from page_extractor import extract_media
+
+CDN = "https://scontent.cdninstagram.com/v/t51.2885-15"
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def test_shared_data_carousel_with_nulls():
+    media = {
+        "shortcode": "ABC123", "is_video": False, "owner": None,
+        "edge_media_to_caption": {"edges": [{"node": None}]},
+        "edge_sidecar_to_children": {"edges": [
+            {"node": {"id": "1", "is_video": False, "display_url": f"{CDN}/1_n.jpg",
+                      "dimensions": {"width": 1080, "height": 1080},
+                      "display_resources": [{"src": f"{CDN}/1_n.jpg?stp=dst-jpg_s640x640",
+                                             "config_width": 640, "config_height": 640}]}},
+            {"node": {"id": "2", "is_video": True, "video_url": f"{CDN}/2_n.mp4",
+                      "display_url": f"{CDN}/2_n.jpg"}},
+        ]},
+    }
+    page = f"<script>window._sharedData = {_dumps({'entry_data': {'PostPage': [{'graphql': {'shortcode_media': media}}]}})};</script>"
+    result = extract_media(page)
+    assert result.source == 'shared_data'
+    assert result.items == [(f"{CDN}/1_n.jpg", 'image'), (f"{CDN}/2_n.mp4", 'video')]
+    assert result.owner is None and result.caption is None
+    assert len(result.variants) == 3
+
+
+def test_additional_data_single_post_with_caption():
+    media = {"shortcode": "ABC123", "is_video": False, "display_url": f"{CDN}/5_n.jpg",
+             "owner": {"username": "some.creator"},
+             "edge_media_to_caption": {"edges": [{"node": {"text": "a caption; with </script> inside"}}]}}
+    page = f"<script>window.__additionalDataLoaded('/p/ABC123/',{_dumps({'graphql': {'shortcode_media': media}})});</script>"
+    result = extract_media(page)
+    assert result.source == 'additional_data'
+    assert result.items == [(f"{CDN}/5_n.jpg", 'image')]
+    assert result.owner == 'some.creator' and result.caption == "a caption; with </script> inside"
+
+
+def test_xdt_api_picks_largest_candidate():
+    item = {"code": "ABC123", "user": {"username": "some.creator"}, "caption": None,
+            "image_versions2": {"candidates": [{"url": f"{CDN}/3_n.jpg?stp=s640x640", "width": 640, "height": 640},
+                                               {"url": f"{CDN}/3_n.jpg", "width": 1440, "height": 1440}]}}
+    page = f'<script type="application/json">{_dumps({"xdt_api__v1__media__shortcode__web_info": {"items": [item]}})}</script>'
+    result = extract_media(page)
+    assert result.source == 'xdt_api'
+    assert result.items == [(f"{CDN}/3_n.jpg", 'image')] and result.owner == 'some.creator'
+
+
+def test_embed_context_json_string():
+    context = _dumps({"gql_data": {"shortcode_media": {"shortcode": "ABC123", "display_url": f"{CDN}/6_n.jpg",
+                                                      "is_video": False}}})
+    page = f'<script>{{"contextJSON":{json.dumps(context)}}}</script>'
+    result = extract_media(page)
+    assert result.source == 'embed_context'
+    assert result.items == [(f"{CDN}/6_n.jpg", 'image')]
+
+
+def test_embed_image_fallback_uses_srcset():
+    page = (f'<img class="EmbeddedMediaImage" src="{CDN}/4_n.jpg?a=1&amp;b=2" '
+            f'srcset="{CDN}/4_n.jpg?s=640 640w,{CDN}/4_n.jpg?s=1080 1080w">')
+    result = extract_media(page)
+    assert result.source == 'embed_image'
+    assert result.items == [(f"{CDN}/4_n.jpg?s=1080", 'image')]
+
+
+def test_nothing_found():
+    assert extract_media("<html>nothing here</html>") is None
+    assert extract_media('<script>window._sharedData = {"broken": ;</script>') is None
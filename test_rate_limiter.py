@@ -0,0 +1,68 @@
+"""Tests for rate_limiter.TokenBucket and the client wrapper"""
+
+import asyncio
+
+import pytest
+from pyrogram.errors import FloodWait
+
+from rate_limiter import TokenBucket, TelegramRateLimiter, install
+
+
+def test_bucket_burst_then_rate():
+    bucket = TokenBucket(2, 3)
+    now = bucket.updated
+    for _ in range(3):
+        assert bucket.wait_time(now) == 0
+        bucket.take(now)
+    assert bucket.wait_time(now) == pytest.approx(0.5)
+    assert bucket.wait_time(now + 0.5) == pytest.approx(0)
+
+
+def test_flood_blocks_and_slows_down():
+    bucket = TokenBucket(8, 8)
+    now = bucket.updated
+    bucket.flood(5, now)
+    assert bucket.rate == 4 and bucket.tokens == 0
+    assert bucket.wait_time(now + 1) == pytest.approx(4)
+    for _ in range(10):
+        bucket.flood(0, now)
+    assert bucket.rate == 8 / 16, "the rate never drops below 1/16 of the base"
+    for _ in range(100):
+        bucket.succeed()
+    assert bucket.rate == 8
+
+
+class SendMessage:
+    """Shaped like the raw API object the wrapper keys on"""
+    peer = None
+
+
+class _Client:
+    def __init__(self, floods):
+        self.floods = floods
+        self.calls = 0
+
+    async def send(self, data, sleep_threshold=None):
+        self.calls += 1
+        if self.calls <= self.floods:
+            raise FloodWait(0)
+        return "sent"
+
+
+def _limiter():
+    return TelegramRateLimiter(1000, 1000, 1000, {})
+
+
+def test_install_retries_flood_wait():
+    client = install(_Client(floods=2), _limiter())
+    assert asyncio.run(client.send(SendMessage())) == "sent"
+    assert client.calls == 3
+
+
+def test_install_gives_up_after_max_retries():
+    client = _Client(floods=10)
+    install(client, _limiter())
+    install(client, _limiter())  # a second install must not stack retries
+    with pytest.raises(FloodWait):
+        asyncio.run(client.send(SendMessage()))
+    assert client.calls == 4
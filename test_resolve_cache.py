@@ -0,0 +1,70 @@
+"""Tests for resolve_cache.ResolutionCache"""
+
+import time
+
+from resolve_cache import ResolutionCache, media_descriptor, url_expiry
+
+CDN = "https://scontent.cdninstagram.com/v/t51.2885-15"
+
+
+def _descriptor(shortcode, expires=None):
+    descriptor = media_descriptor(shortcode, [(f"{CDN}/{shortcode}_n.jpg", 'image')])
+    if expires is not None:
+        descriptor['expires'] = expires
+    return descriptor
+
+
+def test_url_expiry_reads_hex_oe():
+    assert url_expiry(f"{CDN}/1_n.jpg?oe=65A0B1C2") == 0x65A0B1C2
+    assert url_expiry(f"{CDN}/1_n.jpg") is None
+    assert url_expiry(f"{CDN}/1_n.jpg?oe=zz") is None
+
+
+def test_lru_by_entry_count():
+    cache = ResolutionCache(2, 1 << 20)
+    for shortcode in ("a", "b"):
+        cache.put(shortcode, _descriptor(shortcode))
+    assert cache.get("a")  # refresh "a", so "b" is evicted next
+    cache.put("c", _descriptor("c"))
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("b") is None
+
+
+def test_expired_entries_are_dropped():
+    cache = ResolutionCache(10, 1 << 20)
+    cache.put("old", _descriptor("old", time.time() - 1))
+    assert cache.get("old") is None
+    cache.put("soon", _descriptor("soon", time.time() + 0.05))
+    time.sleep(0.1)
+    assert cache.get("soon") is None and not cache.entries
+
+
+def test_eviction_keeps_database_rows(tmp_path):
+    db = str(tmp_path / "resolve.db")
+    cache = ResolutionCache(1, 1 << 20, db)
+    cache.put("a", _descriptor("a"))
+    cache.put("b", _descriptor("b"))
+    assert list(cache.entries) == ["b"]
+    assert cache.get("a")["shortcode"] == "a"
+
+    reopened = ResolutionCache(10, 1 << 20, db)
+    assert reopened.get("a") and reopened.get("b")
+
+
+def test_invalidate_removes_database_row(tmp_path):
+    db = str(tmp_path / "resolve.db")
+    cache = ResolutionCache(1, 1 << 20, db)
+    cache.put("a", _descriptor("a"))
+    cache.put("b", _descriptor("b"))
+    cache.invalidate("a")
+    cache.invalidate("b")
+    assert cache.get("a") is None and cache.get("b") is None
+    assert ResolutionCache(10, 1 << 20, db).get("a") is None
+
+
+def test_oversized_descriptor_is_not_stored(tmp_path):
+    db = str(tmp_path / "resolve.db")
+    cache = ResolutionCache(10, 64, db)
+    cache.put("big", _descriptor("big"))
+    assert not cache.entries and cache.total_bytes == 0
+    assert ResolutionCache(10, 1 << 20, db).get("big") is None
@@ -0,0 +1,59 @@
+"""Tests for session_pool checkpoint handling"""
+
+import asyncio
+import time
+
+from instaloader import Instaloader
+from instaloader.exceptions import AbortDownloadException, LoginRequiredException
+
+import session_pool as session_pool_module
+from session_pool import SessionPool
+
+
+def _pool():
+    pool = SessionPool()
+    primary = pool.add(Instaloader(quiet=True))
+    spare = pool.add(Instaloader(quiet=True))
+    return pool, primary, spare
+
+
+def test_login_required_is_not_a_checkpoint():
+    pool, primary, _ = _pool()
+    pool.report(primary, LoginRequiredException("Redirected to login page"))
+    pool.report(primary, Exception("profile challenge_accepted is private"))
+    assert primary.healthy()
+
+
+def test_checkpoint_cools_down_then_reverifies(monkeypatch):
+    pool, primary, spare = _pool()
+    pool.pins['someone'] = primary.name
+    pool.report(primary, AbortDownloadException('400 Bad Request - "checkpoint_required"'))
+    assert not primary.healthy() and 'someone' not in pool.pins
+
+    verified = []
+
+    async def verify(loader, username):
+        verified.append(loader)
+        return True
+
+    monkeypatch.setattr(session_pool_module.session_store, 'verify', verify)
+    asyncio.run(pool.pick())
+    assert not verified, "no re-check during the cool-down"
+
+    primary.checkpointed_until = time.monotonic() - 1
+    asyncio.run(pool.pick())
+    assert verified == [primary.loader]
+    assert primary.healthy()
+
+
+def test_failed_recheck_waits_another_cool_down(monkeypatch):
+    pool, primary, _ = _pool()
+    pool.report(primary, AbortDownloadException("Redirected to login page. You've been logged out"))
+    primary.checkpointed_until = time.monotonic() - 1
+
+    async def verify(loader, username):
+        raise AbortDownloadException('400 Bad Request - "challenge_required"')
+
+    monkeypatch.setattr(session_pool_module.session_store, 'verify', verify)
+    asyncio.run(pool.pick())
+    assert primary.checkpointed_until > time.monotonic()
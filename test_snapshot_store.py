@@ -0,0 +1,62 @@
+"""Tests for snapshot_store.SnapshotStore delta sync"""
+
+from snapshot_store import SnapshotStore
+
+
+class _Node:
+    def __init__(self, userid):
+        self.userid = userid
+        self.username = f"user{userid}"
+
+
+class _Profile:
+    """Stand-in for instaloader.Profile that counts the pages it serves"""
+
+    userid = 42
+
+    def __init__(self, followers):
+        self.list = followers
+        self.followers = len(followers)
+        self.served = 0
+
+    def get_followers(self):
+        for uid in self.list:
+            self.served += 1
+            yield _Node(uid)
+
+
+def test_first_sync_then_new_followers(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    first = store.sync(_Profile(list(range(1, 21))), "followers")
+    assert first.first_run and first.ids == list(range(1, 21))
+
+    profile = _Profile([30, 31] + list(range(1, 21)))
+    result = store.sync(profile, "followers")
+    assert result.added == [30, 31] and result.removed == []
+    assert profile.served < len(profile.list), "an unchanged tail should not be paged"
+    assert store.load(42, "followers") == [30, 31] + list(range(1, 21))
+    assert store.usernames([30, 1]) == ["user30", "user1"]
+
+
+def test_unfollow_near_top_is_seen(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.sync(_Profile(list(range(1, 21))), "followers")
+    result = store.sync(_Profile([1] + list(range(3, 21))), "followers")
+    assert result.removed == [2] and result.added == []
+
+
+def test_periodic_full_walk_catches_deep_changes(tmp_path):
+    store = SnapshotStore(str(tmp_path), full_sync_every=2)
+    store.sync(_Profile(list(range(1, 21))), "followers")
+    # 15 unfollowed and 99 followed deep down: the counts still add up
+    changed = list(range(1, 15)) + [99] + list(range(16, 21))
+
+    profile = _Profile(changed)
+    partial = store.sync(profile, "followers")
+    assert profile.served < len(changed) and not partial.added and not partial.removed
+
+    profile = _Profile(changed)
+    full = store.sync(profile, "followers")
+    assert profile.served == len(changed)
+    assert full.added == [99] and full.removed == [15]
+    assert sorted(store.load(42, "followers")) == sorted(changed)
@@ -0,0 +1,60 @@
+"""Tests for strategy_race.race and its win/loss bookkeeping"""
+
+import asyncio
+
+import strategy_race
+from strategy_race import StrategyStats, race
+
+
+def _run(strategies, **kwargs):
+    strategy_race.stats = StrategyStats()
+    return asyncio.run(race(strategies, **kwargs)), strategy_race.stats.stats
+
+
+def _strategy(result, delay=0.0):
+    async def run():
+        await asyncio.sleep(delay)
+        return result, f"done after {delay}"
+    return run
+
+
+def test_first_success_wins():
+    (name, result, _), stats = _run([
+        ('slow', _strategy('slow media', 0.5)),
+        ('fast', _strategy('fast media', 0.01)),
+    ], stagger=0)
+    assert (name, result) == ('fast', 'fast media')
+    assert stats['fast'] == {'attempts': 1, 'wins': 1, 'latency': stats['fast']['latency']}
+
+
+def test_cancelled_runner_is_not_a_loss():
+    _, stats = _run([
+        ('slow', _strategy('slow media', 0.5)),
+        ('fast', _strategy('fast media', 0.01)),
+    ], stagger=0)
+    assert stats.get('slow', {'attempts': 0})['attempts'] == 0
+
+
+def test_failures_fall_through_to_next_strategy():
+    (name, result, _), stats = _run([
+        ('broken', _strategy(None)),
+        ('working', _strategy('media', 0.01)),
+    ], stagger=10)
+    assert (name, result) == ('working', 'media')
+    assert stats['broken']['attempts'] == 1 and stats['broken']['wins'] == 0
+
+
+def test_rejected_result_keeps_racing():
+    async def accept(result):
+        return result if result != 'bad' else None
+
+    (name, result, _), _ = _run([
+        ('first', _strategy('bad')),
+        ('second', _strategy('good', 0.01)),
+    ], stagger=0, accept=accept)
+    assert (name, result) == ('second', 'good')
+
+
+def test_all_failed():
+    (name, result, message), _ = _run([('only', _strategy(None))], stagger=0)
+    assert name is None and result is None and message
@@ -0,0 +1,76 @@
+"""Tests for upload_planner batching and cached re-sends"""
+
+import asyncio
+
+import pytest
+
+from upload_planner import ALBUM_SIZE, media_files, plan_file_ids, plan_uploads, send_file_ids
+
+
+def test_media_files_in_carousel_order(tmp_path):
+    for name, size in (("post_10.jpg", 10), ("post_2.mp4", 10), ("post_1.jpg", 10),
+                       ("notes.txt", 10), ("tiny.jpg", 1)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    files = media_files(str(tmp_path), min_bytes=5)
+    assert [(path.rsplit('/', 1)[1], kind) for path, kind in files] == [
+        ("post_1.jpg", 'photo'), ("post_2.mp4", 'video'), ("post_10.jpg", 'photo'),
+    ]
+
+
+def test_albums_split_at_size_and_around_documents():
+    files = [(f"p{i}", 'photo') for i in range(12)] + [("d", 'document'), ("v", 'video')]
+    batches = plan_uploads(files)
+    assert [len(batch) for batch in batches] == [ALBUM_SIZE, 2, 1, 1]
+    assert batches[2] == [("d", 'document')]
+    assert [item for batch in batches for item in batch] == files
+
+
+def test_plan_file_ids_matches_plan_uploads():
+    entries = [('photo', 'A'), ('video', 'B'), ('document', 'C'), ('photo', 'D')]
+    assert plan_file_ids(entries) == [[('A', 'photo'), ('B', 'video')], [('C', 'document')], [('D', 'photo')]]
+
+
+class _Client:
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    async def _call(self, *call):
+        self.calls.append(call)
+        if len(self.calls) == self.fail_on:
+            raise RuntimeError("file reference expired")
+        return None
+
+    async def send_media_group(self, chat_id, media):
+        await self._call('album', [m.media for m in media], media[0].caption)
+        return []
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        return await self._call('photo', photo, caption)
+
+    async def send_document(self, chat_id, document, caption=None):
+        return await self._call('document', document, caption)
+
+
+ENTRIES = [('photo', f"p{i}") for i in range(11)] + [('document', "d")]
+
+
+def test_send_file_ids_rebuilds_albums():
+    client = _Client()
+    sent = asyncio.run(send_file_ids(client, 1, ENTRIES, {'photo': "caption"}))
+    assert sent == len(ENTRIES)
+    assert client.calls == [
+        ('album', [f"p{i}" for i in range(10)], "caption"),
+        ('photo', "p10", "caption"),
+        ('document', "d", None),
+    ]
+
+
+def test_send_file_ids_partial_count_per_album():
+    client = _Client(fail_on=2)
+    assert asyncio.run(send_file_ids(client, 1, ENTRIES)) == ALBUM_SIZE
+
+
+def test_send_file_ids_raises_when_nothing_went_out():
+    with pytest.raises(RuntimeError):
+        asyncio.run(send_file_ids(_Client(fail_on=1), 1, ENTRIES))
@@ -0,0 +1,53 @@
+"""Tests for url_router.route and find_links"""
+
+import pytest
+
+from url_router import InstagramLink, find_links, route, share_url
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("https://www.instagram.com/p/CxYz123AbC_/", ('post', 'CxYz123AbC_', None)),
+    ("https://instagram.com/reel/C9a-Bc_1dEf/?igsh=NWZm", ('reel', 'C9a-Bc_1dEf', None)),
+    ("https://www.instagram.com/reels/C9a-Bc_1dEf/", ('reel', 'C9a-Bc_1dEf', None)),
+    ("https://www.instagram.com/tv/B8xYz_12345/", ('igtv', 'B8xYz_12345', None)),
+    ("http://instagr.am/p/CxYz123AbC_/", ('post', 'CxYz123AbC_', None)),
+    ("https://m.instagram.com/some.creator/p/CxYz123AbC_/", ('post', 'CxYz123AbC_', None)),
+    ("https://www.instagram.com/stories/some.creator/3412345678/", ('story', None, 'some.creator')),
+    ("https://www.instagram.com/stories/highlights/17912345678901234/", ('highlight', None, None)),
+    ("https://www.instagram.com/share/reel/BAHs8Xyz_Q/", ('share', 'BAHs8Xyz_Q', None)),
+    ("https://www.instagram.com/some.creator/", ('profile', None, 'some.creator')),
+    ("check this https://instagram.com/p/ABC123", ('post', 'ABC123', None)),
+    ("Look at this reel: https://instagram.com/reel/XYZ789/.", ('reel', 'XYZ789', None)),
+    ("(https://www.instagram.com/p/ABC123/) 🔥", ('post', 'ABC123', None)),
+    ("follow instagram.com/some.creator.", ('profile', None, 'some.creator')),
+    ("https://www.instagram.com/explore/tags/python/", None),
+    ("https://www.instagram.com/accounts/login/", None),
+    ("https://notinstagram.com/p/ABC123/", None),
+    ("mail me at foo@instagram.com", None),
+    ("hello there", None),
+    ("", None),
+])
+def test_route(text, expected):
+    link = route(text)
+    assert ((link.kind, link.shortcode, link.username) if link else None) == expected
+
+
+def test_route_picks_first_link_in_message():
+    link = route("profile instagram.com/explore/ then https://instagram.com/p/FIRST1/ and /p/SECOND")
+    assert link.shortcode == 'FIRST1'
+
+
+def test_find_links_in_order():
+    text = ("two posts: https://instagram.com/p/AAA111/, https://www.instagram.com/reel/BBB222/?igsh=x "
+            "and a story https://instagram.com/stories/some.creator/123/")
+    assert [(l.kind, l.shortcode or l.username) for l in find_links(text)] == [
+        ('post', 'AAA111'), ('reel', 'BBB222'), ('story', 'some.creator'),
+    ]
+    assert find_links(None) == []
+
+
+def test_share_url_round_trip():
+    link = route("https://www.instagram.com/share/reel/BAHs8Xyz_Q/")
+    assert link.media_id == 'reel'
+    assert share_url(link) == "https://www.instagram.com/share/reel/BAHs8Xyz_Q/"
+    assert share_url(InstagramLink('share', 'BAHs8Xyz_Q', None, None)) == "https://www.instagram.com/share/BAHs8Xyz_Q/"
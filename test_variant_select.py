@@ -0,0 +1,62 @@
+"""Tests for variant_select ranking and probe fallbacks"""
+
+import asyncio
+
+import variant_select
+from variant_select import best_known, pick_best, size_hint, variant
+
+CDN = "https://scontent.cdninstagram.com/v/t51.2885-15"
+
+
+def test_size_hint():
+    assert size_hint(f"{CDN}/1_n.jpg?stp=dst-jpg_e35_p1080x1080") == (1080, 1080)
+    assert size_hint(f"{CDN}/s640x640/1_n.jpg") == (640, 640)
+    assert size_hint(f"{CDN}/1_n.jpg") is None
+
+
+def test_best_known_per_asset():
+    variants = [
+        variant(f"{CDN}/1_n.jpg?stp=s320x320", 'image'),
+        variant(f"{CDN}/1_n.jpg?stp=s1080x1080", 'image'),
+        variant(f"{CDN}/1_n.jpg?stp=s640x640", 'image'),
+        variant(f"{CDN}/2_n.mp4?a", 'video', 'clip', bitrate=500000),
+        variant(f"{CDN}/2_n.mp4?b", 'video', 'clip', bitrate=2000000),
+    ]
+    assert best_known(variants) == [(f"{CDN}/1_n.jpg?stp=s1080x1080", 'image'), (f"{CDN}/2_n.mp4?b", 'video')]
+
+
+def _pick(monkeypatch, variants, sizes):
+    probed = []
+
+    async def probe(url, headers=None):
+        probed.append(url)
+        return sizes.get(url)
+
+    monkeypatch.setattr(variant_select, 'probe', probe)
+    return asyncio.run(pick_best(variants)), probed
+
+
+HINTED = f"{CDN}/1_n.jpg?stp=s640x640"
+ORIGINAL = f"{CDN}/1_n.jpg"
+
+
+def test_probe_prefers_larger_unhinted_original(monkeypatch):
+    chosen, _ = _pick(monkeypatch, [variant(HINTED, 'image'), variant(ORIGINAL, 'image')],
+                      {HINTED: 50000, ORIGINAL: 200000})
+    assert chosen == [(ORIGINAL, 'image')]
+
+
+def test_unanswered_probes_keep_the_hinted_variant(monkeypatch):
+    chosen, _ = _pick(monkeypatch, [variant(HINTED, 'image'), variant(ORIGINAL, 'image')], {})
+    assert chosen == [(HINTED, 'image')]
+
+
+def test_placeholder_answers_drop_the_asset(monkeypatch):
+    chosen, _ = _pick(monkeypatch, [variant(HINTED, 'image'), variant(ORIGINAL, 'image')],
+                      {HINTED: 100, ORIGINAL: 100})
+    assert chosen == []
+
+
+def test_single_candidate_is_not_probed(monkeypatch):
+    chosen, probed = _pick(monkeypatch, [variant(ORIGINAL, 'image')], {})
+    assert chosen == [(ORIGINAL, 'image')] and probed == []
@@ -10,9 +10,21 @@ import tempfile
 import shutil
 import glob
 import uuid
-import requests
-import json
-from pyrogram import Client, filters
+from http_client import fetch, close_client
+from disk_cache import cached_download
+from strategy_race import race
+from resolve_cache import resolution_cache, media_descriptor
+from file_id_cache import file_id_index
+from inflight import inflight
+from upload_planner import media_files, send_planned, send_file_ids, report_upload
+from progress import ProgressReporter
+from link_batch import message_links, resolve_links, start_batch, has_links
+from page_extractor import extract_media
+from variant_select import pick_best
+from job_queue import jobs, QueueFull
+from rate_limiter import install as install_rate_limiter
+from ig_governor import install as install_governor
+from pyrogram import Client, filters, idle
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
 from config import Config
 import time
@@ -29,6 +41,7 @@ app = Client(
     sleep_threshold=60,  # Add sleep threshold
     max_concurrent_transmissions=1  # Reduce concurrent connections
 )
+install_rate_limiter(app)
 
 # Global instances
 L = Instaloader(
@@ -42,35 +55,41 @@ L = Instaloader(
     dirname_pattern="{target}",
     filename_pattern="{date_utc}_UTC"
 )
+install_governor(L)
 
 # User sessions storage
 user_sessions = {}
 
-def extract_content_info(url):
-    """Extract content type and identifier from Instagram URL"""
-    patterns = {
-        'post': r'instagram\.com/p/([A-Za-z0-9_-]+)',
-        'reel': r'instagram\.com/reel/([A-Za-z0-9_-]+)', 
-        'igtv': r'instagram\.com/tv/([A-Za-z0-9_-]+)',
-        'story': r'instagram\.com/stories/([A-Za-z0-9_.]+)/([0-9]+)',
-        'profile': r'instagram\.com/([A-Za-z0-9_.]+)/?$',
-        'highlight': r'instagram\.com/stories/highlights/([0-9]+)'
-    }
-    
-    for content_type, pattern in patterns.items():
-        match = re.search(pattern, url)
-        if match:
-            if content_type == 'story':
-                return content_type, (match.group(1), match.group(2))  # (username, story_id)
-            elif content_type == 'profile':
-                # Check if it's just profile or profile with specific content
-                if '/p/' in url or '/reel/' in url or '/tv/' in url:
-                    continue
-                return content_type, match.group(1)
-            else:
-                return content_type, match.group(1)
-    
-    return None, None
+UPLOAD_CAPTIONS = {
+    'photo': "📸 Downloaded from Instagram",
+    'video': "🎥 Downloaded from Instagram",
+}
+
+# Headers used when fetching resolved media from the CDN
+MEDIA_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
+    'Accept': '*/*',
+}
+
+def content_info(link):
+    """Content type and identifier of a routed Instagram link"""
+    if not link or link.kind == 'share':
+        return None, None
+    if link.kind == 'story':
+        return 'story', (link.username, link.media_id)  # (username, story_id)
+    if link.kind == 'profile':
+        return 'profile', link.username
+    if link.kind == 'highlight':
+        return 'highlight', link.media_id
+    return link.kind, link.shortcode
+
+async def download_link(link, temp_dir, say):
+    """Download one link of a multi-link message; ``say`` gets the failure reason"""
+    content_type, identifier = content_info(link)
+    success, message_text = await try_anonymous_download(content_type, identifier, temp_dir)
+    if not success:
+        await say(message_text)
+    return success
 
 async def try_anonymous_download(content_type, identifier, temp_dir):
     """Attempt to download content without authentication"""
@@ -90,31 +109,44 @@ async def try_anonymous_download(content_type, identifier, temp_dir):
 
 async def download_post_anonymous(shortcode, temp_dir):
     """Download post/reel/IGTV without authentication using multiple methods"""
-    success_methods = []
-    
-    # Method 1: Try Instagram embed page
-    success, message = await try_embed_download(shortcode, temp_dir)
-    if success:
-        success_methods.append("embed")
-        return True, f"Downloaded via embed method - {message}"
+    descriptor = resolution_cache.get(shortcode)
+    if descriptor:
+        downloaded = await download_media_items(descriptor['items'], temp_dir)
+        if downloaded > 0:
+            return True, f"Downloaded via cache - {downloaded} files"
+        # URLs revoked before their oe= expiry: resolve once more
+        resolution_cache.invalidate(shortcode)
+
+    async def fetch_items(descriptor):
+        downloaded = await download_media_items(descriptor['items'], temp_dir)
+        if downloaded:
+            resolution_cache.put(shortcode, descriptor)
+        return downloaded
+
+    # Race the resolvers; the first one whose media URLs actually download
+    # wins, so a winner with dead URLs falls back to the others
+    method, downloaded, message = await race([
+        ("embed", lambda: try_embed_download(shortcode)),
+        ("scraping", lambda: try_page_scraping(shortcode)),
+        ("oembed", lambda: try_oembed_method(shortcode)),
+    ], accept=fetch_items)
     
-    # Method 2: Try direct page scraping
-    success, message = await try_page_scraping(shortcode, temp_dir)
-    if success:
-        success_methods.append("scraping")
-        return True, f"Downloaded via scraping - {message}"
-    
-    # Method 3: Try oEmbed API for metadata
-    success, message = await try_oembed_method(shortcode, temp_dir)
-    if success:
-        success_methods.append("oembed")
-        return True, f"Downloaded via oEmbed - {message}"
-    
-    # All methods failed
-    return False, "All anonymous methods failed. This content may require login or be restricted."
-
-async def try_embed_download(shortcode, temp_dir):
-    """Try downloading from Instagram embed page"""
+    if not method:
+        # All methods failed
+        return False, f"All anonymous methods failed ({message}). This content may require login or be restricted."
+    return True, f"Downloaded via {method} - {downloaded} files"
+
+async def download_media_items(media_items, temp_dir):
+    """Download resolved (url, kind) items in order, returning the number saved"""
+    downloaded = 0
+    for url, kind in media_items:
+        ext = 'mp4' if kind == 'video' else 'jpg'
+        if await download_media_file(url, f"{temp_dir}/media_{downloaded+1:02d}.{ext}", MEDIA_HEADERS):
+            downloaded += 1
+    return downloaded
+
+async def try_embed_download(shortcode):
+    """Resolve a media descriptor from the Instagram embed page"""
     try:
         embed_url = f"https://www.instagram.com/p/{shortcode}/embed/"
         
@@ -126,53 +158,25 @@ async def try_embed_download(shortcode, temp_dir):
             'Connection': 'keep-alive',
         }
         
-        response = requests.get(embed_url, headers=headers, timeout=15)
+        response = await fetch(embed_url, headers=headers, timeout=15)
         
         if response.status_code == 200:
-            content = response.text
-            downloaded = 0
-            
-            # Extract high-quality images
-            img_patterns = [
-                r'"display_src":"([^"]+)"',
-                r'"src":"([^"]*\.cdninstagram[^"]*\.jpg[^"]*)"',
-                r'content="([^"]*scontent[^"]*\.jpg[^"]*)"'
-            ]
-            
-            for pattern in img_patterns:
-                matches = re.findall(pattern, content)
-                for i, img_url in enumerate(set(matches)):
-                    if 'instagram' in img_url or 'cdninstagram' in img_url:
-                        img_url = img_url.replace('\\u0026', '&')
-                        if await download_media_file(img_url, f"{temp_dir}/image_{downloaded+1}.jpg", headers):
-                            downloaded += 1
-            
-            # Extract videos
-            video_patterns = [
-                r'"video_url":"([^"]+)"',
-                r'"src":"([^"]*\.cdninstagram[^"]*\.mp4[^"]*)"'
-            ]
-            
-            for pattern in video_patterns:
-                matches = re.findall(pattern, content)
-                for i, video_url in enumerate(set(matches)):
-                    if 'instagram' in video_url or 'cdninstagram' in video_url:
-                        video_url = video_url.replace('\\u0026', '&')
-                        if await download_media_file(video_url, f"{temp_dir}/video_{downloaded+1}.mp4", headers):
-                            downloaded += 1
-            
-            if downloaded > 0:
-                return True, f"Downloaded {downloaded} files"
+            media = extract_media(response.text)
+            if media:
+                # One URL per asset: the best variant, probing only where hints are missing
+                items = await pick_best(media.variants, MEDIA_HEADERS)
+                descriptor = media_descriptor(shortcode, items, owner=media.owner, caption=media.caption)
+                return descriptor, f"Found {len(items)} media URLs ({media.source})"
             else:
-                return False, "No media found in embed page"
+                return None, "No media found in embed page"
         else:
-            return False, f"Embed page returned {response.status_code}"
+            return None, f"Embed page returned {response.status_code}"
             
     except Exception as e:
-        return False, f"Embed download error: {str(e)}"
+        return None, f"Embed download error: {str(e)}"
 
-async def try_page_scraping(shortcode, temp_dir):
-    """Try downloading by scraping main Instagram page"""
+async def try_page_scraping(shortcode):
+    """Resolve a media descriptor by scraping the main Instagram page"""
     try:
         page_url = f"https://www.instagram.com/p/{shortcode}/"
         
@@ -184,59 +188,24 @@ async def try_page_scraping(shortcode, temp_dir):
             'Connection': 'keep-alive',
         }
         
-        response = requests.get(page_url, headers=headers, timeout=15)
+        response = await fetch(page_url, headers=headers, timeout=15)
         
         if response.status_code == 200:
-            content = response.text
-            downloaded = 0
-            
-            # Look for JSON data in script tags
-            json_pattern = r'window\._sharedData\s*=\s*({.*?});'
-            json_match = re.search(json_pattern, content)
-            
-            if json_match:
-                try:
-                    data = json.loads(json_match.group(1))
-                    entry_data = data.get('entry_data', {})
-                    posts = entry_data.get('PostPage', [])
-                    
-                    if posts:
-                        media = posts[0].get('graphql', {}).get('shortcode_media', {})
-                        
-                        # Single image/video
-                        if media.get('display_url'):
-                            if await download_media_file(media['display_url'], f"{temp_dir}/media_1.jpg", headers):
-                                downloaded += 1
-                        
-                        if media.get('video_url'):
-                            if await download_media_file(media['video_url'], f"{temp_dir}/video_1.mp4", headers):
-                                downloaded += 1
-                        
-                        # Carousel posts (multiple images/videos)
-                        carousel = media.get('edge_sidecar_to_children', {}).get('edges', [])
-                        for i, item in enumerate(carousel):
-                            node = item.get('node', {})
-                            if node.get('display_url'):
-                                if await download_media_file(node['display_url'], f"{temp_dir}/carousel_{i+1}.jpg", headers):
-                                    downloaded += 1
-                            if node.get('video_url'):
-                                if await download_media_file(node['video_url'], f"{temp_dir}/carousel_video_{i+1}.mp4", headers):
-                                    downloaded += 1
-                                
-                except Exception as e:
-                    print(f"JSON parsing error: {e}")
-            
-            if downloaded > 0:
-                return True, f"Downloaded {downloaded} files"
+            media = extract_media(response.text)
+            if media:
+                # One URL per asset: the best variant, probing only where hints are missing
+                items = await pick_best(media.variants, MEDIA_HEADERS)
+                descriptor = media_descriptor(shortcode, items, owner=media.owner, caption=media.caption)
+                return descriptor, f"Found {len(items)} media URLs ({media.source})"
             else:
-                return False, "No media found via page scraping"
+                return None, "No media found via page scraping"
         else:
-            return False, f"Page returned {response.status_code}"
+            return None, f"Page returned {response.status_code}"
             
     except Exception as e:
-        return False, f"Page scraping error: {str(e)}"
+        return None, f"Page scraping error: {str(e)}"
 
-async def try_oembed_method(shortcode, temp_dir):
+async def try_oembed_method(shortcode):
     """Try using Instagram's oEmbed API"""
     try:
         post_url = f"https://www.instagram.com/p/{shortcode}/"
@@ -246,18 +215,18 @@ async def try_oembed_method(shortcode, temp_dir):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(oembed_url, headers=headers, timeout=10)
+        response = await fetch(oembed_url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
             # oEmbed gives us metadata but limited media access
             # This is mainly for getting post info
-            return False, "oEmbed provides metadata only, no direct media access"
+            return None, "oEmbed provides metadata only, no direct media access"
         else:
-            return False, f"oEmbed API returned {response.status_code}"
+            return None, f"oEmbed API returned {response.status_code}"
             
     except Exception as e:
-        return False, f"oEmbed error: {str(e)}"
+        return None, f"oEmbed error: {str(e)}"
 
 async def download_profile_pic_anonymous(username, temp_dir):
     """Download profile picture without authentication"""
@@ -270,7 +239,7 @@ async def download_profile_pic_anonymous(username, temp_dir):
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         }
         
-        response = requests.get(profile_url, headers=headers, timeout=15)
+        response = await fetch(profile_url, headers=headers, timeout=15)
         
         if response.status_code == 200:
             content = response.text
@@ -300,14 +269,8 @@ async def download_profile_pic_anonymous(username, temp_dir):
 async def download_media_file(url, filename, headers):
     """Download a single media file"""
     try:
-        if url.startswith('//'):
-            url = 'https:' + url
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200 and len(response.content) > 1000:  # At least 1KB
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-            return True
+        # Streamed to disk (or linked from the media cache); files under 1KB are discarded
+        return await cached_download(url, filename, headers, timeout=30, min_bytes=1000)
     except Exception as e:
         print(f"Failed to download {url}: {e}")
     return False
@@ -318,40 +281,21 @@ async def try_authenticated_download(content_type, identifier, temp_dir, user_id
     # For now, return guidance message
     return False, "Authentication feature coming soon - each user will be able to login with their own account"
 
-async def upload_files(client, chat_id, temp_dir, status_msg):
-    """Upload downloaded files to Telegram"""
+async def upload_files(client, chat_id, temp_dir, status_msg, shortcode=None):
+    """Upload downloaded files to Telegram as carousel-ordered albums"""
     try:
-        images = glob.glob(f"{temp_dir}/*.jpg") + glob.glob(f"{temp_dir}/*.jpeg")
-        videos = glob.glob(f"{temp_dir}/*.mp4")
-        
-        # Filter valid files
-        valid_images = [img for img in images if os.path.getsize(img) > 1000]
-        valid_videos = [vid for vid in videos if os.path.getsize(vid) > 1000]
-        
-        total = len(valid_images) + len(valid_videos)
-        if total == 0:
+        # Tiny files are error pages or placeholders, not media
+        files = media_files(temp_dir, min_bytes=1000)
+        if not files:
             await status_msg.edit_text("❌ No valid media files found to upload.")
             return
-            
-        uploaded = 0
         
-        # Upload images
-        for image in valid_images:
-            try:
-                await client.send_photo(chat_id, image, caption="📸 Downloaded from Instagram")
-                uploaded += 1
-                await asyncio.sleep(0.5)
-            except Exception as e:
-                print(f"Failed to upload image {image}: {e}")
-                
-        # Upload videos
-        for video in valid_videos:
-            try:
-                await client.send_video(chat_id, video, caption="🎥 Downloaded from Instagram")
-                uploaded += 1
-                await asyncio.sleep(0.5)
-            except Exception as e:
-                print(f"Failed to upload video {video}: {e}")
+        sent_file_ids = await send_planned(client, chat_id, files, UPLOAD_CAPTIONS, on_progress=report_upload(status_msg))
+        uploaded = sum(1 for f in sent_file_ids if f)
+        
+        # Only index complete uploads so a re-send never comes out partial
+        if all(sent_file_ids):
+            file_id_index.put(shortcode, sent_file_ids)
             
         if uploaded > 0:
             await status_msg.edit_text(f"✅ Successfully downloaded and sent {uploaded} files!")
@@ -487,17 +431,36 @@ async def types_cmd(client, message):
 """
     await message.reply_text(text)
 
-@app.on_message(filters.regex(r'instagram\.com|instagr\.am'))
+def unexpected_error_text(e):
+    """User-facing message for errors the handler did not anticipate"""
+    return f"""❌ **Unexpected Error**
+
+Something went wrong while processing your request.
+
+**Error details:** `{str(e)}`
+
+**Please try:**
+1. **Check URL**: Make sure it's a valid Instagram link
+2. **Try Again**: Wait a moment and resend the link
+3. **Different Content**: Try a different Instagram post
+4. **Report Issue**: If this keeps happening, let us know
+
+**Need help?** Send /help for complete usage guide! 🆘"""
+
+@app.on_message(filters.regex(r'instagram\.com|instagr\.am') | has_links)
 async def handle_instagram_url(client, message):
-    url = message.text.strip()
-    status = await message.reply_text("🔍 **Analyzing Instagram URL...**")
-    
-    temp_dir = f"/tmp/ig_{message.from_user.id}_{uuid.uuid4().hex[:8]}"
-    os.makedirs(temp_dir, exist_ok=True)
+    status = ProgressReporter(await message.reply_text("🔍 **Analyzing Instagram URL...**"))
     
     try:
+        # Every Instagram link in the text, caption and entities
+        links = await resolve_links(message_links(message))
+        if len(links) > 1:
+            # Runs in the background so this update worker is free again
+            start_batch(client, message, status.message, links, download_link, UPLOAD_CAPTIONS)
+            return
+        
         # Extract content type and identifier
-        content_type, identifier = extract_content_info(url)
+        content_type, identifier = content_info(links[0] if links else None)
         
         if not content_type:
             await status.edit_text("""❌ **Invalid Instagram URL**
@@ -520,12 +483,42 @@ Copy the link from Instagram and send it here! 📱""")
         
         await status.edit_text(f"📥 **Downloading {content_names.get(content_type, 'Content')}...**\n\n🔗 Type: `{content_type.upper()}`")
         
+        shortcode = identifier if content_type in ['post', 'reel', 'igtv'] else None
+        
+        # Same post already being fetched for someone else: wait and share its upload
+        if inflight.waiting(shortcode):
+            await status.edit_text("⏳ **This post is already being downloaded** - sharing it with you...")
+        leading = await inflight.wait_or_lead(shortcode)
+    except Exception as e:
+        await status.edit_text(unexpected_error_text(e))
+        return
+    
+    # Already uploaded once: re-send by file_id without touching Instagram
+    cached = file_id_index.get(shortcode)
+    if cached:
+        try:
+            sent = await send_file_ids(client, message.chat.id, cached, UPLOAD_CAPTIONS)
+        except Exception as e:
+            print(f"Cached re-send failed, downloading again: {e}")
+            file_id_index.forget(shortcode)
+        else:
+            if sent < len(cached):
+                file_id_index.forget(shortcode)  # a stale file_id: the next request re-uploads
+            if leading:
+                inflight.land(shortcode, True)
+            await status.edit_text(f"✅ Successfully downloaded and sent {sent} files!")
+            return
+    
+    temp_dir = f"/tmp/ig_{message.from_user.id}_{uuid.uuid4().hex[:8]}"
+    
+    async def download():
+        os.makedirs(temp_dir, exist_ok=True)
+        
         # Try anonymous download first
         success, message_text = await try_anonymous_download(content_type, identifier, temp_dir)
         
         if success:
             await status.edit_text("📤 **Uploading files...**")
-            await upload_files(client, message.chat.id, temp_dir, status)
         else:
             # Provide specific guidance based on content type
             if content_type in ['story', 'highlight']:
@@ -593,24 +586,33 @@ Copy the link from Instagram and send it here! 📱""")
 • Recent public reels
 
 Want to try another link? Send me a different Instagram URL! 🎯""")
-        
-    except Exception as e:
-        await status.edit_text(f"""❌ **Unexpected Error**
-
-Something went wrong while processing your request.
-
-**Error details:** `{str(e)}`
-
-**Please try:**
-1. **Check URL**: Make sure it's a valid Instagram link
-2. **Try Again**: Wait a moment and resend the link
-3. **Different Content**: Try a different Instagram post
-4. **Report Issue**: If this keeps happening, let us know
-
-**Need help?** Send /help for complete usage guide! 🆘""")
-    finally:
+        return success
+    
+    async def upload(success):
+        await upload_files(client, message.chat.id, temp_dir, status, shortcode)
+    
+    async def on_error(e):
+        await status.edit_text(unexpected_error_text(e))
+    
+    async def cleanup():
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
+        if leading:
+            inflight.land(shortcode, bool(file_id_index.get(shortcode)))
+        await status.finish()
+    
+    async def on_position(position):
+        await status.edit_text(f"⏳ **Queued** - position {position}\n\nYour download starts as soon as a worker is free.")
+    
+    try:
+        position = jobs.submit(message.from_user.id, download, upload, cleanup, on_position, on_error)
+    except QueueFull as e:
+        if leading:
+            inflight.land(shortcode, False)
+        await status.edit_text(f"⏳ **Bot is busy**\n\n{e}. Please try again in a few minutes.")
+        return
+    if position:
+        await on_position(position)
 
 @app.on_message(filters.command("status"))
 async def status_cmd(client, message):
@@ -645,6 +647,13 @@ async def status_cmd(client, message):
 """
     await message.reply_text(text)
 
+async def run():
+    await app.start()
+    await idle()
+    await app.stop()
+    # Release the pooled Instagram connections on shutdown
+    await close_client()
+
 if __name__ == "__main__":
     print("🚀 Starting Ultimate Instagram Content Downloader...")
     print("✅ All content types supported!")
@@ -653,4 +662,4 @@ if __name__ == "__main__":
     print("🎯 Bot is ready to handle any Instagram URL!")
     
     # Simple polling mode start
-    app.run()
\ No newline at end of file
+    app.run(run())
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Upload planner: carousel-ordered Telegram albums
+Downloaded files (and cached file_ids on re-sends) are grouped into mixed
+photo/video albums of up to 10 items in their original order, oversized
+photos fall back to documents. FloodWait is left to the rate limiter
+that main, ultimate_bot and working_simple_bot install on their client
+"""
+
+import glob
+import os
+import re
+
+from pyrogram.types import InputMediaPhoto, InputMediaVideo
+
+from utils import message_file_id
+
+ALBUM_SIZE = 10
+PHOTO_MAX_BYTES = 10 * 1024 * 1024      # larger photos are rejected, send as document
+FILE_MAX_BYTES = 2000 * 1024 * 1024     # hard limit for any upload
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+
+
+def _natural_key(path):
+    # media_2 before media_10, 2021-01-01_UTC_2 before ..._10
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+def media_files(temp_dir, min_bytes=0):
+    """(path, kind) for every photo/video in temp_dir, in carousel order"""
+    files = []
+    for path in sorted(glob.glob(f"{temp_dir}/*"), key=_natural_key):
+        name = path.lower()
+        if name.endswith(PHOTO_EXTENSIONS):
+            kind = 'photo'
+        elif name.endswith(VIDEO_EXTENSIONS):
+            kind = 'video'
+        else:
+            continue
+        size = os.path.getsize(path)
+        if size < min_bytes:
+            continue
+        if size > FILE_MAX_BYTES:
+            print(f"Skipping {path}: {size} bytes is over Telegram's upload limit")
+            continue
+        if kind == 'photo' and size > PHOTO_MAX_BYTES:
+            kind = 'document'
+        files.append((path, kind))
+    return files
+
+
+def plan_uploads(files):
+    """Split (path, kind) files into batches sent with one API call each
+
+    Photos and videos share albums of up to ALBUM_SIZE items; documents
+    can't be mixed with them and go on their own, keeping the order.
+    """
+    batches = []
+    album = []
+    for path, kind in files:
+        if kind == 'document':
+            if album:
+                batches.append(album)
+                album = []
+            batches.append([(path, kind)])
+            continue
+        album.append((path, kind))
+        if len(album) == ALBUM_SIZE:
+            batches.append(album)
+            album = []
+    if album:
+        batches.append(album)
+    return batches
+
+
+def plan_file_ids(entries):
+    """plan_uploads() for cached ``(kind, file_id)`` entries
+
+    Telegram takes a file_id wherever it takes a path, so the batches
+    can be sent exactly like freshly downloaded files.
+    """
+    return plan_uploads([(file_id, kind) for kind, file_id in entries])
+
+
+async def _send_batch(client, chat_id, batch, captions):
+    path, kind = batch[0]
+    caption = captions.get(kind)
+    if len(batch) == 1:
+        if kind == 'photo':
+            sent = await client.send_photo(chat_id, path, caption=caption)
+        elif kind == 'video':
+            sent = await client.send_video(chat_id, path, caption=caption)
+        else:
+            sent = await client.send_document(chat_id, path, caption=caption)
+        return [message_file_id(sent)]
+
+    media = [
+        InputMediaPhoto(p) if k == 'photo' else InputMediaVideo(p)
+        for p, k in batch
+    ]
+    if caption:
+        media[0].caption = caption
+    album = await client.send_media_group(chat_id, media)
+    return [message_file_id(sent) for sent in album]
+
+
+async def send_file_ids(client, chat_id, entries, captions=None):
+    """Re-send previously uploaded (kind, file_id) entries as albums
+
+    Returns how many were sent. A failure before anything went out is
+    raised; after that the count of the albums already delivered is
+    returned, so callers never send the first files twice.
+    """
+    captions = captions or {}
+    sent = 0
+    for batch in plan_file_ids(entries):
+        try:
+            await _send_batch(client, chat_id, batch, captions)
+        except Exception as e:
+            if not sent:
+                raise
+            print(f"Cached re-send stopped after {sent}/{len(entries)} files: {e}")
+            break
+        sent += len(batch)
+    return sent
+
+
+def report_upload(status_msg):
+    """on_progress callback that shows upload progress on a status message"""
+    async def on_progress(sent, total):
+        if sent < total:
+            await status_msg.edit_text(f"📤 Uploaded {sent}/{total} files...")
+    return on_progress
+
+
+async def send_planned(client, chat_id, files, captions=None, on_progress=None):
+    """Upload files batch by batch; returns their (kind, file_id) list
+
+    A failed batch leaves None entries in its place so callers can tell
+    a complete upload from a partial one. ``on_progress(sent, total)`` is
+    awaited after every batch.
+    """
+    captions = captions or {}
+    file_ids = []
+    for batch in plan_uploads(files):
+        try:
+            file_ids.extend(await _send_batch(client, chat_id, batch, captions))
+        except Exception as e:
+            print(f"Failed to upload {len(batch)} files: {e}")
+            file_ids.extend([None] * len(batch))
+        if on_progress:
+            await on_progress(sum(1 for f in file_ids if f), len(files))
+    return file_ids
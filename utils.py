@@ -8,10 +8,13 @@ import shutil
 from pyrogram.types import InputMediaPhoto, InputMediaVideo
 from pyrogram.errors import FloodWait
 import asyncio
+from progress import ProgressReporter
 
 async def download_and_upload_content(client, chat_id, temp_dir, status_msg):
     """Download and upload Instagram content to Telegram"""
     
+    # Per-album progress edits are debounced; the final state is always shown
+    status_msg = ProgressReporter(status_msg)
     try:
         # Find all downloaded files
         images = glob.glob(f"{temp_dir}/*.jpg") + glob.glob(f"{temp_dir}/*.jpeg")
@@ -79,6 +82,7 @@ async def download_and_upload_content(client, chat_id, temp_dir, status_msg):
         await status_msg.edit_text(f"❌ Upload failed: {str(e)}")
         
     finally:
+        await status_msg.finish()
         # Clean up temporary directory
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
@@ -116,4 +120,12 @@ async def send_content_info(client, chat_id, info):
 {info['caption']}
 """
     
-    await client.send_message(chat_id, info_text)
\ No newline at end of file
+    await client.send_message(chat_id, info_text)
+
+def message_file_id(message):
+    """Return (kind, file_id) for a sent media message, or None"""
+    for kind in ('photo', 'video', 'document'):
+        media = getattr(message, kind, None)
+        if media:
+            return kind, media.file_id
+    return None
@@ -0,0 +1,102 @@
+"""
+Best-variant selection for Instagram media
+Pages list the same picture or video several times: resized copies,
+thumbnails, different bitrates. Candidates are grouped by asset, ranked
+by the width/height/bitrate hints in the JSON or the CDN URL, and only
+the single best variant of each asset is downloaded. Assets whose
+variants carry no hints at all are settled with Range probes.
+"""
+
+import asyncio
+import os
+import re
+from collections import namedtuple, OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+from http_client import probe
+
+# asset: key shared by every variant of one picture/video (None = derive from URL)
+Variant = namedtuple('Variant', ['url', 'kind', 'asset', 'width', 'height', 'bitrate'])
+
+MIN_BYTES = 1000  # smaller files are placeholders, not media
+
+# s640x640, p1080x1080, e35 ... in the path or the stp= parameter
+SIZE_HINT = re.compile(r'(?:^|[_/.-])[sp](\d{2,5})x(\d{2,5})(?=$|[_/.-])')
+
+
+def variant(url, kind, asset=None, width=None, height=None, bitrate=None):
+    """A Variant, with missing dimensions filled in from the URL's size hint"""
+    if not width or not height:
+        width, height = size_hint(url) or (width, height)
+    return Variant(url, kind, asset or asset_id(url), width, height, bitrate)
+
+
+def size_hint(url):
+    """(width, height) encoded in a CDN URL, or None"""
+    parsed = urlparse(url)
+    for text in (parse_qs(parsed.query).get('stp', [''])[0], parsed.path):
+        match = SIZE_HINT.search(text)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+    return None
+
+
+def asset_id(url):
+    """File name of a CDN URL - the same for every resized copy of an asset"""
+    return os.path.splitext(os.path.basename(urlparse(url).path))[0]
+
+
+def _rank(v):
+    area = (v.width or 0) * (v.height or 0)
+    return (area, v.bitrate or 0)
+
+
+def group_variants(variants):
+    """Variants grouped by asset, in order of first appearance"""
+    groups = OrderedDict()
+    for v in variants:
+        groups.setdefault((v.kind, v.asset), []).append(v)
+    return groups
+
+
+async def _probed_best(candidates, headers, fallback):
+    sizes = await asyncio.gather(*(probe(v.url, headers) for v in candidates))
+    probed = [(size, v) for size, v in zip(sizes, candidates) if size and size >= MIN_BYTES]
+    if probed:
+        return max(probed, key=lambda pair: pair[0])[1]
+    # An unanswered probe (no Range support, timeout) is no evidence against
+    # a variant; only drop the asset when every answer says placeholder
+    unknown = [v for size, v in zip(sizes, candidates) if size is None]
+    if not unknown:
+        return None
+    return fallback if fallback in unknown else unknown[0]
+
+
+def best_known(variants):
+    """(url, kind) of the best hinted variant of every asset, without probing"""
+    return [(max(candidates, key=_rank).url, kind) for (kind, _), candidates in group_variants(variants).items()]
+
+
+async def pick_best(variants, headers=None):
+    """(url, kind) of the best variant of every asset, in carousel order
+
+    Hinted variants are ranked by area, then bitrate. A variant without
+    hints may well be the original, so it is compared with the best
+    hinted one by Range probes. An asset with a single candidate is
+    never probed; if no probe gets an answer the best hinted (or first)
+    candidate is kept rather than dropping the asset.
+    """
+    groups = list(group_variants(variants).values())
+
+    async def best_of(candidates):
+        if len(candidates) == 1:
+            return candidates[0]
+        hinted = [v for v in candidates if v.width or v.bitrate]
+        unhinted = [v for v in candidates if not (v.width or v.bitrate)]
+        best = max(hinted, key=_rank) if hinted else None
+        if not unhinted:
+            return best
+        return await _probed_best(unhinted + ([best] if best else []), headers, best or unhinted[0])
+
+    chosen = await asyncio.gather(*(best_of(candidates) for candidates in groups))
+    return [(v.url, v.kind) for v in chosen if v]
@@ -8,6 +8,7 @@ import requests
 import json
 from flask import Flask, request, jsonify
 from config import Config
+from url_router import route
 import tempfile
 import shutil
 import glob
@@ -61,17 +62,8 @@ def send_telegram_video(chat_id, video_path):
 
 def extract_shortcode(url):
     """Extract shortcode from Instagram URL"""
-    patterns = [
-        r'instagram\.com/p/([A-Za-z0-9_-]+)',
-        r'instagram\.com/reel/([A-Za-z0-9_-]+)',
-        r'instagram\.com/tv/([A-Za-z0-9_-]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
+    link = route(url)
+    return link.shortcode if link else None
 
 def download_instagram_content(url, temp_dir):
     """Simple Instagram content downloader"""
@@ -10,7 +10,7 @@ import tempfile
 import shutil
 import glob
 import uuid
-import requests
+from http_client import fetch, download_to_file
 import json
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
@@ -49,7 +49,7 @@ async def get_instagram_info(url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(oembed_url, headers=headers, timeout=10)
+        response = await fetch(oembed_url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -85,12 +85,12 @@ async def download_instagram_content(url, temp_dir):
         }
         
         page_url = f"https://www.instagram.com/p/{shortcode}/"
-        response = requests.get(page_url, headers=headers, timeout=15)
+        response = await fetch(page_url, headers=headers, timeout=15)
         
         if response.status_code != 200:
             # Try with different URL format
             page_url = f"https://www.instagram.com/reel/{shortcode}/"
-            response = requests.get(page_url, headers=headers, timeout=15)
+            response = await fetch(page_url, headers=headers, timeout=15)
         
         if response.status_code == 200:
             content = response.text
@@ -183,11 +183,7 @@ async def download_instagram_content(url, temp_dir):
 async def download_media(url, filename, headers):
     """Download a single media file"""
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-            return True
+        return await download_to_file(url, filename, headers, timeout=30)
     except Exception as e:
         print(f"Failed to download media: {e}")
     return False
@@ -4,13 +4,23 @@ Handles time sync issues and webhook problems properly
 """
 
 import os
-import re
 import asyncio
 import tempfile
 import shutil
 import glob
 import uuid
-import requests
+from http_client import fetch, get_client, close_client
+from disk_cache import cached_download
+from resolve_cache import resolution_cache, media_descriptor
+from file_id_cache import file_id_index
+from inflight import inflight
+from upload_planner import media_files, send_planned, send_file_ids, report_upload
+from progress import ProgressReporter
+from url_router import route
+from page_extractor import extract_media
+from link_batch import message_links, resolve_links, start_batch, has_links
+from job_queue import jobs, QueueFull
+from rate_limiter import install as install_rate_limiter
 from pyrogram import Client, filters, idle
 from pyrogram.types import InputMediaPhoto, InputMediaVideo
 from pyrogram.errors import BadMsgNotification, FloodWait
@@ -52,89 +62,65 @@ app = Client(
     bot_token=Config.BOT_TOKEN,
     sleep_threshold=60
 )
+install_rate_limiter(app)
 
 def extract_shortcode(url):
     """Extract shortcode from Instagram URL"""
-    patterns = [
-        r'instagram\.com/p/([A-Za-z0-9_-]+)',
-        r'instagram\.com/reel/([A-Za-z0-9_-]+)',
-        r'instagram\.com/tv/([A-Za-z0-9_-]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
+    link = route(url)
+    return link.shortcode if link else None
 
 def extract_username(url):
     """Extract username from Instagram profile URL"""
-    match = re.search(r'instagram\.com/([A-Za-z0-9_.]+)/?$', url)
-    return match.group(1) if match else None
+    link = route(url)
+    return link.username if link and link.kind == 'profile' else None
+
+EMBED_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+async def resolve_embed_media(shortcode):
+    """Scrape the embed page for media URLs, returning a descriptor or None"""
+    embed_url = f"https://www.instagram.com/p/{shortcode}/embed/"
+    response = await fetch(embed_url, headers=EMBED_HEADERS, timeout=10)
+    if response.status_code != 200:
+        return None
+    
+    media = extract_media(response.text)
+    if not media:
+        return None
+    return media_descriptor(shortcode, media.items, owner=media.owner, caption=media.caption)
+
+async def download_descriptor(descriptor, temp_dir):
+    """Download a resolved post's items; True if any file was saved"""
+    media_found = False
+    for n, (media_url, kind) in enumerate(descriptor['items'], 1):
+        ext, timeout = ('mp4', 30) if kind == 'video' else ('jpg', 15)
+        # Numbered in carousel order so uploads keep the original order
+        filename = f"{temp_dir}/media_{n:02d}.{ext}"
+        try:
+            if await cached_download(media_url, filename, EMBED_HEADERS, timeout=timeout):
+                media_found = True
+        except Exception as e:
+            print(f"Failed to download {kind} {n}: {e}")
+    return media_found
 
-async def download_instagram_content(url, temp_dir):
+async def download_instagram_content(shortcode, temp_dir):
     """Simple Instagram content downloader using web scraping"""
     try:
-        # Method 1: Try embed page
-        shortcode = extract_shortcode(url)
+        # Method 1: Try embed page (skipped while a cached resolution is still valid)
         if shortcode:
-            embed_url = f"https://www.instagram.com/p/{shortcode}/embed/"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
+            descriptor = resolution_cache.get(shortcode)
+            if descriptor:
+                if await download_descriptor(descriptor, temp_dir):
+                    return True
+                # URLs revoked before their oe= expiry: resolve once more
+                resolution_cache.invalidate(shortcode)
             
-            response = requests.get(embed_url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                # Simple regex to find image/video URLs in the embed page
-                content = response.text
-                
-                # Look for image URLs
-                image_patterns = [
-                    r'"display_url":"([^"]+)"',
-                    r'"url":"([^"]+\.jpg[^"]*)"',
-                    r'src="([^"]+\.jpg[^"]*)"'
-                ]
-                
-                video_patterns = [
-                    r'"video_url":"([^"]+)"',
-                    r'"url":"([^"]+\.mp4[^"]*)"'
-                ]
-                
-                media_found = False
-                
-                # Try to find and download images
-                for pattern in image_patterns:
-                    matches = re.findall(pattern, content)
-                    for i, match in enumerate(matches[:3]):  # Limit to 3 images
-                        try:
-                            media_url = match.replace('\\u0026', '&')
-                            media_response = requests.get(media_url, headers=headers, timeout=15)
-                            if media_response.status_code == 200:
-                                filename = f"{temp_dir}/image_{i+1}.jpg"
-                                with open(filename, 'wb') as f:
-                                    f.write(media_response.content)
-                                media_found = True
-                        except Exception as e:
-                            print(f"Failed to download image {i+1}: {e}")
-                            continue
-                
-                # Try to find and download videos
-                for pattern in video_patterns:
-                    matches = re.findall(pattern, content)
-                    for i, match in enumerate(matches[:2]):  # Limit to 2 videos
-                        try:
-                            media_url = match.replace('\\u0026', '&')
-                            media_response = requests.get(media_url, headers=headers, timeout=30)
-                            if media_response.status_code == 200:
-                                filename = f"{temp_dir}/video_{i+1}.mp4"
-                                with open(filename, 'wb') as f:
-                                    f.write(media_response.content)
-                                media_found = True
-                        except Exception as e:
-                            print(f"Failed to download video {i+1}: {e}")
-                            continue
-                
-                return media_found
+            descriptor = await resolve_embed_media(shortcode)
+            if not descriptor:
+                return False
+            resolution_cache.put(shortcode, descriptor)
+            return await download_descriptor(descriptor, temp_dir)
         
         return False
         
@@ -142,36 +128,20 @@ async def download_instagram_content(url, temp_dir):
         print(f"Download error: {e}")
         return False
 
-async def upload_files(client, chat_id, temp_dir, status_msg):
-    """Upload downloaded files to Telegram"""
+async def upload_files(client, chat_id, temp_dir, status_msg, shortcode=None):
+    """Upload downloaded files to Telegram as carousel-ordered albums"""
     try:
-        images = glob.glob(f"{temp_dir}/*.jpg") + glob.glob(f"{temp_dir}/*.jpeg")
-        videos = glob.glob(f"{temp_dir}/*.mp4")
-        
-        total = len(images) + len(videos)
-        if total == 0:
+        files = media_files(temp_dir)
+        if not files:
             await status_msg.edit_text("❌ No files found to upload.")
             return
-            
-        uploaded = 0
         
-        # Upload images
-        for image in images:
-            try:
-                await client.send_photo(chat_id, image)
-                uploaded += 1
-                await asyncio.sleep(1)  # Rate limiting
-            except Exception as e:
-                print(f"Failed to upload image: {e}")
-                
-        # Upload videos
-        for video in videos:
-            try:
-                await client.send_video(chat_id, video)
-                uploaded += 1
-                await asyncio.sleep(1)  # Rate limiting
-            except Exception as e:
-                print(f"Failed to upload video: {e}")
+        sent_file_ids = await send_planned(client, chat_id, files, on_progress=report_upload(status_msg))
+        uploaded = sum(1 for f in sent_file_ids if f)
+        
+        # Only index complete uploads so a re-send never comes out partial
+        if all(sent_file_ids):
+            file_id_index.put(shortcode, sent_file_ids)
                 
         await status_msg.edit_text(f"✅ Successfully uploaded {uploaded} files!")
         
@@ -381,54 +351,113 @@ Your bot is ready for service! 🚀"""
     
     await message.reply_text(text)
 
-@app.on_message(filters.regex(r'instagram\.com'))
+DOWNLOAD_FAILED_TEXT = """❌ **Download Failed**
+
+This could be because:
+• Content is private or restricted
+• Instagram is blocking requests
+• Invalid URL format
+
+**What you can try:**
+1. Make sure the Instagram account is public
+2. Try a different post URL
+3. Wait a few minutes and try again
+
+**Supported formats:**
+✅ https://instagram.com/p/ABC123/
+✅ https://instagram.com/reel/XYZ789/
+✅ https://instagram.com/tv/ABC123/"""
+
+async def download_link(link, temp_dir, say):
+    """Download one post/reel/IGTV link into temp_dir; ``say`` reports failures"""
+    success = await download_instagram_content(link.shortcode, temp_dir)
+    if not success:
+        await say(DOWNLOAD_FAILED_TEXT)
+    return success
+
+@app.on_message(filters.regex(r'instagram\.com|instagr\.am') | has_links)
 async def handle_url(client, message):
-    url = message.text.strip()
     user_id = message.from_user.id
     username = message.from_user.username or "Unknown"
+    links = [link for link in await resolve_links(message_links(message)) if link.shortcode]
+    url = (message.text or message.caption or "").strip()
     
     # Log the download attempt
     log_activity("DOWNLOAD_REQUEST", user_id, username, f"Instagram URL: {url}")
     
-    status = await message.reply_text("🔄 Processing Instagram URL...")
+    status = ProgressReporter(await message.reply_text("🔄 Processing Instagram URL..."))
+    
+    if len(links) > 1:
+        # Runs in the background so this update worker is free again
+        start_batch(client, message, status.message, links, download_link)
+        return
+    shortcode = links[0].shortcode if links else None
+    
+    # Same link already being fetched for someone else: wait and share its upload
+    if inflight.waiting(shortcode):
+        await status.edit_text("⏳ This post is already being downloaded, sharing it with you...")
+    leading = await inflight.wait_or_lead(shortcode)
+    
+    # Already uploaded once: re-send by file_id, no download or upload needed
+    cached = file_id_index.get(shortcode)
+    if cached:
+        try:
+            sent = await send_file_ids(client, message.chat.id, cached)
+        except Exception as e:
+            print(f"Cached re-send failed, downloading again: {e}")
+            file_id_index.forget(shortcode)
+        else:
+            if sent < len(cached):
+                file_id_index.forget(shortcode)  # a stale file_id: the next request re-uploads
+            if leading:
+                inflight.land(shortcode, True)
+            log_activity("CACHE_HIT", user_id, username, f"Re-sent {sent} cached files for: {url}")
+            await status.edit_text(f"✅ Successfully uploaded {sent} files!")
+            return
     
     temp_dir = f"/tmp/{message.from_user.id}_{uuid.uuid4().hex[:8]}"
-    os.makedirs(temp_dir, exist_ok=True)
     
-    try:
+    async def download():
+        os.makedirs(temp_dir, exist_ok=True)
         await status.edit_text("📥 Attempting to download content...")
         
-        success = await download_instagram_content(url, temp_dir)
+        success = await download_instagram_content(shortcode, temp_dir)
         
         if success:
             log_activity("DOWNLOAD_SUCCESS", user_id, username, f"Successfully downloaded from: {url}")
             await status.edit_text("📤 Uploading files...")
-            await upload_files(client, message.chat.id, temp_dir, status)
         else:
             log_activity("DOWNLOAD_FAILED", user_id, username, f"Failed to download from: {url}")
-            await status.edit_text("""❌ **Download Failed**
-
-This could be because:
-• Content is private or restricted
-• Instagram is blocking requests
-• Invalid URL format
-
-**What you can try:**
-1. Make sure the Instagram account is public
-2. Try a different post URL
-3. Wait a few minutes and try again
-
-**Supported formats:**
-✅ https://instagram.com/p/ABC123/
-✅ https://instagram.com/reel/XYZ789/
-✅ https://instagram.com/tv/ABC123/""")
-        
-    except Exception as e:
+            await status.edit_text(DOWNLOAD_FAILED_TEXT)
+        return success
+    
+    async def upload(success):
+        await upload_files(client, message.chat.id, temp_dir, status, shortcode)
+    
+    async def on_error(e):
         log_activity("ERROR", user_id, username, f"Exception during download: {str(e)}")
         await status.edit_text(f"❌ Unexpected error: {str(e)}")
-    finally:
+    
+    async def cleanup():
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
+        if leading:
+            inflight.land(shortcode, bool(file_id_index.get(shortcode)))
+        await status.finish()
+    
+    async def on_position(position):
+        await status.edit_text(f"⏳ Queued for download - position {position}")
+    
+    try:
+        position = jobs.submit(user_id, download, upload, cleanup, on_position, on_error)
+    except QueueFull as e:
+        if leading:
+            inflight.land(shortcode, False)
+        log_activity("REJECTED", user_id, username, f"Queue full: {url}")
+        await status.edit_text(f"⏳ **Bot is busy**\n\n{e}. Please try again in a few minutes.")
+        return
+    if position:
+        await on_position(position)
 
 async def main():
     """Main function optimized for Heroku deployment"""
@@ -438,7 +467,7 @@ async def main():
     try:
         token = Config.BOT_TOKEN
         clear_url = f"https://api.telegram.org/bot{token}/deleteWebhook"
-        response = requests.post(clear_url, timeout=10)
+        response = await get_client().post(clear_url, timeout=10)
         if response.json().get('ok'):
             print("✅ Webhook cleared successfully")
     except Exception as e:
@@ -456,6 +485,7 @@ async def main():
             
             # Start polling and stay active
             await idle()
+            await close_client()
             return  # Exit function after idle() completes
             
         except BadMsgNotification as e: